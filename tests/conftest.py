@@ -0,0 +1,19 @@
+import os
+import tempfile
+from pathlib import Path
+
+try:
+    import nonebot
+except ImportError:
+    # 未安装 NoneBot 时只运行不依赖插件的测试，依赖插件的测试模块会通过 pytest.importorskip 跳过
+    nonebot = None
+
+PLUGIN_DIR = Path(__file__).parent.parent / "tgbot" / "plugins"
+
+
+def pytest_configure(config):
+    # 插件数据目录位于工作目录下，测试时使用临时目录，避免写入真实的插件数据
+    os.chdir(tempfile.mkdtemp(prefix="mystool-test-"))
+    if nonebot is not None:
+        nonebot.init()
+        nonebot.load_plugins(str(PLUGIN_DIR))
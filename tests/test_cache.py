@@ -0,0 +1,107 @@
+import asyncio
+import importlib.util
+from pathlib import Path
+
+# cache 模块不依赖 NoneBot，直接从文件加载，未安装 NoneBot 时也能运行
+_spec = importlib.util.spec_from_file_location(
+    "mystool_cache",
+    Path(__file__).parent.parent / "tgbot" / "plugins" / "nonebot_plugin_mystool" / "utils" / "cache.py"
+)
+_cache_module = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(_cache_module)
+AsyncTTLCache = _cache_module.AsyncTTLCache
+
+
+def test_single_flight():
+    calls = 0
+
+    async def main():
+        cache = AsyncTTLCache(ttl=60)
+        release = asyncio.Event()
+
+        async def loader():
+            nonlocal calls
+            calls += 1
+            await release.wait()
+            return "value"
+
+        tasks = [asyncio.create_task(cache.get("key", loader)) for _ in range(5)]
+        await asyncio.sleep(0)
+        release.set()
+        return await asyncio.gather(*tasks)
+
+    assert asyncio.run(main()) == ["value"] * 5
+    assert calls == 1
+
+
+def test_expiry():
+    async def main():
+        cache = AsyncTTLCache(ttl=0.01)
+        values = iter(range(10))
+
+        async def loader():
+            return next(values)
+
+        first = await cache.get("key", loader)
+        cached = await cache.get("key", loader)
+        await asyncio.sleep(0.02)
+        expired = await cache.get("key", loader)
+        return first, cached, expired
+
+    assert asyncio.run(main()) == (0, 0, 1)
+
+
+def test_uncacheable_result_is_reloaded():
+    async def main():
+        cache = AsyncTTLCache(ttl=60)
+        values = iter(range(10))
+
+        async def loader():
+            return next(values)
+
+        return [await cache.get("key", loader, cacheable=lambda value: value >= 2) for _ in range(4)]
+
+    assert asyncio.run(main()) == [0, 1, 2, 2]
+
+
+def test_maxsize_evicts_least_recently_used():
+    async def main():
+        cache = AsyncTTLCache(ttl=60, maxsize=2)
+        calls = []
+
+        def loader(key):
+            async def load():
+                calls.append(key)
+                return key
+            return load
+
+        for key in "a", "b", "a", "c", "a", "b":
+            await cache.get(key, loader(key))
+        return calls
+
+    # "b" 在放入 "c" 时被淘汰，"a" 最近使用过而保留
+    assert asyncio.run(main()) == ["a", "b", "c", "b"]
+
+
+def test_cancelled_loader_does_not_cancel_waiters():
+    async def main():
+        cache = AsyncTTLCache(ttl=60)
+        started = asyncio.Event()
+        calls = 0
+
+        async def loader():
+            nonlocal calls
+            calls += 1
+            if calls == 1:
+                started.set()
+                await asyncio.sleep(3600)
+            return "reloaded"
+
+        leader = asyncio.create_task(cache.get("key", loader))
+        await started.wait()
+        waiter = asyncio.create_task(cache.get("key", loader))
+        await asyncio.sleep(0)
+        leader.cancel()
+        return await waiter, calls
+
+    assert asyncio.run(main()) == ("reloaded", 2)
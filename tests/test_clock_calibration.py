@@ -0,0 +1,68 @@
+import asyncio
+import math
+from email.utils import formatdate
+
+import pytest
+
+pytest.importorskip("nonebot")
+
+import httpx
+
+from nonebot_plugin_mystool.api import common
+
+RTT = 0.05
+
+
+class FakeServer:
+    """
+    模拟时钟偏差为 ``offset`` 的服务器，本地时间由测试控制
+    """
+
+    def __init__(self, offset: float, start: float, fail: bool = False):
+        self.offset = offset
+        self.now = start
+        self.fail = fail
+
+    def time(self) -> float:
+        return self.now
+
+    async def sleep(self, delay: float):
+        self.now += delay
+
+    async def head(self, url: str, **kwargs) -> httpx.Response:
+        if self.fail:
+            raise httpx.ConnectError("connection failed")
+        # 服务器在往返时延的中点生成响应，Date 头只精确到秒
+        server_time = math.floor(self.now + RTT / 2 + self.offset)
+        self.now += RTT
+        return httpx.Response(200, headers={"Date": formatdate(server_time, usegmt=True)})
+
+
+@pytest.fixture
+def patch_server(monkeypatch):
+    def patch(server: FakeServer):
+        monkeypatch.setattr(common, "get_client", lambda: server)
+        monkeypatch.setattr(common.time, "time", server.time)
+        monkeypatch.setattr(common.asyncio, "sleep", server.sleep)
+
+    return patch
+
+
+@pytest.mark.parametrize("offset", [10.3, -2.75, 0.0])
+@pytest.mark.parametrize("start", [1_700_000_000.0, 1_700_000_000.37, 1_700_000_000.81])
+def test_interval_intersection(patch_server, offset, start):
+    patch_server(FakeServer(offset, start))
+    status, calibration = asyncio.run(common.calibrate_server_clock("https://example.com"))
+    assert status
+    assert calibration.samples == 8
+    assert abs(calibration.offset - offset) <= calibration.error + 1e-6
+    # 每次采样的相位不同，交集远小于 Date 头一秒的精度
+    assert calibration.error < 0.15
+    assert calibration.rtt == pytest.approx(RTT)
+
+
+def test_all_samples_failed(patch_server):
+    patch_server(FakeServer(0, 1_700_000_000.0, fail=True))
+    status, calibration = asyncio.run(common.calibrate_server_clock("https://example.com", samples=3))
+    assert status.network_error
+    assert calibration is None
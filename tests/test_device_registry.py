@@ -0,0 +1,100 @@
+import asyncio
+from datetime import date
+
+import pytest
+
+pytest.importorskip("nonebot")
+
+from nonebot_plugin_mystool.api import common
+from nonebot_plugin_mystool.api.common import AndroidDeviceRegistry
+from nonebot_plugin_mystool.model import BaseApiStatus, BBSCookies, UserAccount
+
+
+class FakeDevice:
+    """
+    记录设备登录和设备保存的请求次数
+    """
+
+    def __init__(self):
+        self.today = date(2024, 1, 1)
+        self.logins = 0
+        self.saved = 0
+        self.success = True
+
+    async def login(self, account: UserAccount, retry: bool = True):
+        self.logins += 1
+        # 等待一次，使并发的注册请求有机会同时进行
+        await asyncio.sleep(0)
+        return BaseApiStatus(success=self.success)
+
+    async def save(self, account: UserAccount, retry: bool = True):
+        self.saved += 1
+        return BaseApiStatus(success=self.success)
+
+
+@pytest.fixture
+def device(monkeypatch):
+    fake = FakeDevice()
+
+    class FakeDate(date):
+        @classmethod
+        def today(cls):
+            return fake.today
+
+    monkeypatch.setattr(common, "device_login", fake.login)
+    monkeypatch.setattr(common, "device_save", fake.save)
+    monkeypatch.setattr(common, "date", FakeDate)
+    monkeypatch.setattr(AndroidDeviceRegistry, "_registered_date", {})
+    monkeypatch.setattr(AndroidDeviceRegistry, "_pruned_date", None)
+    monkeypatch.setattr(AndroidDeviceRegistry, "_locks", {})
+    monkeypatch.setattr(AndroidDeviceRegistry, "_lock_users", {})
+    return fake
+
+
+def make_account(device_id: str = "device-1") -> UserAccount:
+    return UserAccount(cookies=BBSCookies(stuid="100"), device_id_android=device_id)
+
+
+def test_register_once_per_day(device):
+    account = make_account()
+
+    async def main():
+        results = await asyncio.gather(*(AndroidDeviceRegistry.register(account) for _ in range(3)))
+        # 并发的注册请求只有一个会发起请求
+        assert sorted(results) == [False, False, True]
+        assert await AndroidDeviceRegistry.register(account) is False
+        assert await AndroidDeviceRegistry.register(account, force=True) is True
+        device.today = date(2024, 1, 2)
+        assert await AndroidDeviceRegistry.register(account) is True
+
+    asyncio.run(main())
+    assert device.logins == device.saved == 3
+
+
+def test_failed_registration_is_retried(device):
+    account = make_account()
+    device.success = False
+
+    async def main():
+        assert await AndroidDeviceRegistry.register(account) is True
+        device.success = True
+        assert await AndroidDeviceRegistry.register(account) is True
+        assert await AndroidDeviceRegistry.register(account) is False
+        AndroidDeviceRegistry.invalidate(account)
+        assert await AndroidDeviceRegistry.register(account) is True
+
+    asyncio.run(main())
+    assert device.logins == 3
+
+
+def test_registry_does_not_grow(device):
+    async def main():
+        await asyncio.gather(*(AndroidDeviceRegistry.register(make_account(f"device-{i}")) for i in range(3)))
+        device.today = date(2024, 1, 2)
+        await AndroidDeviceRegistry.register(make_account("device-0"))
+
+    asyncio.run(main())
+    # 前一天的注册记录已被清除，没有在使用的注册锁也已释放
+    assert AndroidDeviceRegistry._registered_date == {"device-0": date(2024, 1, 2)}
+    assert AndroidDeviceRegistry._locks == {}
+    assert AndroidDeviceRegistry._lock_users == {}
@@ -0,0 +1,95 @@
+import asyncio
+
+import pytest
+
+pytest.importorskip("nonebot")
+
+from nonebot_plugin_mystool.api import good_catalogue
+from nonebot_plugin_mystool.api.good_catalogue import GOOD_PARTITIONS, GoodCatalogue
+from nonebot_plugin_mystool.model import BaseApiStatus, Good
+
+
+def make_good(goods_id: str, next_time: int = 1_700_000_000, unlimit: bool = False) -> Good:
+    return Good(
+        type=1,
+        next_time=next_time,
+        account_exchange_num=0,
+        account_cycle_limit=1,
+        account_cycle_type="month",
+        unlimit=unlimit,
+        goods_name=f"商品{goods_id}",
+        goods_id=goods_id,
+        price=100,
+        icon=f"https://example.com/{goods_id}.png"
+    )
+
+
+class FakeShop:
+    """
+    返回预设商品列表的 ``get_good_list``，未设置的分区返回空列表，``failed`` 中的分区获取失败
+    """
+
+    def __init__(self, **partitions):
+        self.partitions = partitions
+        self.failed = set()
+        self.requested = []
+
+    async def get_good_list(self, game: str):
+        self.requested.append(game)
+        if game in self.failed:
+            return BaseApiStatus(network_error=True), None
+        return BaseApiStatus(success=True), self.partitions.get(game, [])
+
+
+@pytest.fixture
+def shop(monkeypatch):
+    monkeypatch.setattr(GoodCatalogue, "_partitions", {})
+    monkeypatch.setattr(GoodCatalogue, "_updated_at", {})
+    monkeypatch.setattr(GoodCatalogue, "_goods", {})
+    monkeypatch.setattr(GoodCatalogue, "_goods_partition", {})
+    fake = FakeShop(hk4e=[make_good("1"), make_good("2", next_time=0)], hkrpg=[make_good("3", unlimit=True)])
+    monkeypatch.setattr(good_catalogue, "get_good_list", fake.get_good_list)
+    return fake
+
+
+def test_refresh_builds_index(shop):
+    status = asyncio.run(GoodCatalogue.refresh())
+    assert status
+    assert sorted(shop.requested) == sorted(GOOD_PARTITIONS)
+    assert GoodCatalogue.get("1").goods_name == "商品1"
+    assert GoodCatalogue.get_partition_name("3") == "hkrpg"
+    assert [good.goods_id for good in GoodCatalogue.partition("hk4e")] == ["1", "2"]
+    assert GoodCatalogue.partition("bbs") == []
+
+
+def test_get_exchangeable(shop):
+    asyncio.run(GoodCatalogue.refresh())
+    assert GoodCatalogue.get_exchangeable("1").goods_id == "1"
+    # 兑换已结束的商品和不限时商品不能添加兑换计划
+    assert GoodCatalogue.get_exchangeable("2") is None
+    assert GoodCatalogue.get_exchangeable("3") is None
+    assert GoodCatalogue.get_exchangeable("unknown") is None
+
+
+def test_failed_partition_keeps_previous_goods(shop):
+    asyncio.run(GoodCatalogue.refresh())
+    shop.failed.add("hk4e")
+    shop.partitions["hkrpg"] = []
+    status = asyncio.run(GoodCatalogue.refresh())
+    # 有分区更新失败时返回该分区的失败状态
+    assert not status
+    assert status.network_error
+    assert GoodCatalogue.get("1") is not None
+    assert GoodCatalogue.get("3") is None
+
+
+def test_ensure_loaded_only_fetches_missing_partitions(shop):
+    shop.failed.add("bbs")
+    asyncio.run(GoodCatalogue.ensure_loaded())
+    shop.requested.clear()
+    shop.failed.clear()
+    assert asyncio.run(GoodCatalogue.ensure_loaded())
+    assert shop.requested == ["bbs"]
+    shop.requested.clear()
+    assert asyncio.run(GoodCatalogue.ensure_loaded())
+    assert shop.requested == []
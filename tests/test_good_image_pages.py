@@ -0,0 +1,79 @@
+import asyncio
+import time
+
+import pytest
+
+pytest.importorskip("nonebot")
+
+from nonebot_plugin_mystool.command import exchange
+from nonebot_plugin_mystool.model import Good, plugin_config
+from nonebot_plugin_mystool.utils import good_image
+
+
+def make_good(goods_id: str) -> Good:
+    return Good(
+        type=1,
+        next_time=int(time.time()) + 86400,
+        account_exchange_num=0,
+        account_cycle_limit=1,
+        account_cycle_type="month",
+        unlimit=False,
+        goods_name=f"商品{goods_id}",
+        goods_id=goods_id,
+        price=100,
+        icon=f"https://example.com/{goods_id}.png"
+    )
+
+
+@pytest.fixture
+def save_path(tmp_path, monkeypatch):
+    monkeypatch.setattr(plugin_config.good_list_image_config, "SAVE_PATH", tmp_path)
+    return tmp_path
+
+
+def test_partition_pages_sorted_by_page_number(save_path):
+    for name in "01-01-hk4e-p10.jpg", "01-01-hk4e-p2.webp", "01-01-hk4e-p1.jpg", "01-01-hk4e-p3.tmp", \
+            "01-01-hk4e.fingerprint", "01-02-hk4e-p1.jpg", "01-01-hkrpg-p1.jpg":
+        (save_path / name).write_bytes(b"")
+    assert [path.name for path in exchange._partition_pages("01-01", "hk4e")] == [
+        "01-01-hk4e-p1.jpg", "01-01-hk4e-p2.webp", "01-01-hk4e-p10.jpg"
+    ]
+
+
+def test_remove_partition_images(save_path):
+    # 旧版本生成的单张图片也会被删除
+    for name in "01-01-hk4e.jpg", "01-01-hk4e-p1.jpg", "01-01-hk4e.fingerprint", "01-02-hk4e-p1.jpg", \
+            "01-01-hkrpg-p1.jpg":
+        (save_path / name).write_bytes(b"")
+    exchange._remove_partition_images("hk4e", keep=[save_path / "01-02-hk4e-p1.jpg"])
+    assert sorted(path.name for path in save_path.iterdir()) == ["01-01-hkrpg-p1.jpg", "01-02-hk4e-p1.jpg"]
+
+
+def test_game_list_to_image_renders_pages(monkeypatch):
+    rendered = []
+
+    async def get_font_path():
+        return "font.otf"
+
+    async def get_good_detail(good):
+        return None
+
+    async def get_good_icon(url, retry=True, executor=None):
+        return url.encode()
+
+    def render_good_list_page(texts, icons, font_path, encoding, config):
+        rendered.append((len(texts), icons))
+        return f"page{len(rendered)}".encode()
+
+    monkeypatch.setattr(good_image, "get_font_path", get_font_path)
+    monkeypatch.setattr(good_image, "get_good_detail", get_good_detail)
+    monkeypatch.setattr(good_image, "get_good_icon", get_good_icon)
+    monkeypatch.setattr(good_image.image_worker, "render_good_list_page", render_good_list_page)
+    monkeypatch.setattr(plugin_config.good_list_image_config, "PAGE_SIZE", 2)
+
+    goods = [make_good(str(index)) for index in range(5)]
+    pages = asyncio.run(good_image.game_list_to_image(goods))
+    # 每页最多 PAGE_SIZE 个商品
+    assert pages == [b"page1", b"page2", b"page3"]
+    assert [count for count, _ in rendered] == [2, 2, 1]
+    assert rendered[2][1] == [b"https://example.com/4.png"]
@@ -0,0 +1,99 @@
+import asyncio
+import time
+
+import pytest
+
+pytest.importorskip("nonebot")
+
+from nonebot_plugin_mystool.command import exchange
+from nonebot_plugin_mystool.model import Good, plugin_config
+from nonebot_plugin_mystool.utils import good_list_fingerprint
+
+TODAY = time.strftime('%m-%d', time.localtime())
+YESTERDAY = time.strftime('%m-%d', time.localtime(time.time() - 86400))
+
+
+def make_good(goods_id: str, price: int = 100) -> Good:
+    return Good(
+        type=1,
+        next_time=int(time.time()) + 86400,
+        account_exchange_num=0,
+        account_cycle_limit=1,
+        account_cycle_type="month",
+        unlimit=False,
+        goods_name=f"商品{goods_id}",
+        goods_id=goods_id,
+        price=price,
+        icon=f"https://example.com/{goods_id}.png"
+    )
+
+
+class FakeRenderer:
+    """
+    代替 ``game_list_to_image``，记录生成次数
+    """
+
+    def __init__(self):
+        self.rendered = 0
+
+    async def __call__(self, good_list, executor=None, retry: bool = True):
+        self.rendered += 1
+        return [f"page{index}".encode() for index in range(1, len(good_list) + 1)]
+
+
+@pytest.fixture
+def renderer(tmp_path, monkeypatch):
+    monkeypatch.setattr(plugin_config.good_list_image_config, "SAVE_PATH", tmp_path)
+    monkeypatch.setattr(plugin_config.good_list_image_config, "IMAGE_FORMAT", "JPEG")
+    fake = FakeRenderer()
+    monkeypatch.setattr(exchange, "game_list_to_image", fake)
+    return fake
+
+
+def test_fingerprint_tracks_displayed_fields():
+    goods = [make_good("1"), make_good("2")]
+    assert good_list_fingerprint(goods) == good_list_fingerprint([make_good("1"), make_good("2")])
+    assert good_list_fingerprint(goods) != good_list_fingerprint([make_good("1"), make_good("2", price=200)])
+    assert good_list_fingerprint(goods) != good_list_fingerprint(goods[::-1])
+
+
+def test_unchanged_partition_reuses_images(renderer, tmp_path):
+    goods = [make_good("1"), make_good("2")]
+    # 前一天生成的图片
+    (tmp_path / f"{YESTERDAY}-hk4e-p1.jpg").write_bytes(b"old1")
+    (tmp_path / f"{YESTERDAY}-hk4e-p2.jpg").write_bytes(b"old2")
+    (tmp_path / f"{YESTERDAY}-hk4e.fingerprint").write_text(good_list_fingerprint(goods))
+
+    assert asyncio.run(exchange.image_process("hk4e", goods))
+    assert renderer.rendered == 0
+    # 沿用原有图片，只更新文件名中的日期
+    assert sorted(path.name for path in tmp_path.iterdir()) == [
+        f"{TODAY}-hk4e-p1.jpg", f"{TODAY}-hk4e-p2.jpg", f"{TODAY}-hk4e.fingerprint"
+    ]
+    assert [page.read_bytes() for page in exchange._partition_pages(TODAY, "hk4e")] == [b"old1", b"old2"]
+
+
+def test_changed_partition_is_regenerated(renderer, tmp_path):
+    old_goods = [make_good("1"), make_good("2")]
+    (tmp_path / f"{YESTERDAY}-hk4e-p1.jpg").write_bytes(b"old1")
+    (tmp_path / f"{YESTERDAY}-hk4e-p2.jpg").write_bytes(b"old2")
+    (tmp_path / f"{YESTERDAY}-hk4e.fingerprint").write_text(good_list_fingerprint(old_goods))
+
+    new_goods = [make_good("1"), make_good("3")]
+    assert asyncio.run(exchange.image_process("hk4e", new_goods))
+    assert renderer.rendered == 1
+    assert [page.read_bytes() for page in exchange._partition_pages(TODAY, "hk4e")] == [b"page1", b"page2"]
+    assert (tmp_path / f"{TODAY}-hk4e.fingerprint").read_text() == good_list_fingerprint(new_goods)
+    assert not list(tmp_path.glob(f"{YESTERDAY}-*"))
+
+    # 再次生成时商品列表没有变化
+    assert asyncio.run(exchange.image_process("hk4e", new_goods))
+    assert renderer.rendered == 1
+
+
+def test_partition_without_goods_removes_images(renderer, tmp_path):
+    (tmp_path / f"{YESTERDAY}-hk4e-p1.jpg").write_bytes(b"old1")
+    (tmp_path / f"{YESTERDAY}-hk4e.fingerprint").write_text("fingerprint")
+    (tmp_path / f"{YESTERDAY}-hkrpg-p1.jpg").write_bytes(b"other")
+    assert asyncio.run(exchange.image_process("hk4e", []))
+    assert [path.name for path in tmp_path.iterdir()] == [f"{YESTERDAY}-hkrpg-p1.jpg"]
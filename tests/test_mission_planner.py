@@ -0,0 +1,46 @@
+import pytest
+
+pytest.importorskip("nonebot")
+
+from nonebot_plugin_mystool.api.myb_missions_api import BaseMission, MissionPlanner
+from nonebot_plugin_mystool.model import MissionData, MissionState, MissionStatus
+
+
+def make_planner(**progress: int) -> MissionPlanner:
+    thresholds = {BaseMission.SIGN: 1, BaseMission.VIEW: 3, BaseMission.LIKE: 5, BaseMission.SHARE: 1}
+    state_dict = {
+        key: (MissionData(points=0, name=key, mission_key=key, threshold=threshold), progress.get(key, 0))
+        for key, threshold in thresholds.items()
+    }
+    return MissionPlanner(MissionState(current_myb=0, state_dict=state_dict))
+
+
+def test_remaining_counts():
+    planner = make_planner(**{BaseMission.SIGN: 1, BaseMission.VIEW: 1, BaseMission.LIKE: 7})
+    assert planner.remaining == {BaseMission.SIGN: 0, BaseMission.VIEW: 2, BaseMission.LIKE: 0, BaseMission.SHARE: 1}
+    assert not planner.finished
+
+
+def test_next_forum_splits_remaining_across_forums():
+    planner = make_planner()
+    assert planner.next_forum(2) == {BaseMission.SIGN: 1, BaseMission.VIEW: 2, BaseMission.LIKE: 3, BaseMission.SHARE: 1}
+    for key, times in planner.next_forum(2).items():
+        planner.report(key, times, MissionStatus(success=True))
+    assert planner.next_forum(1) == {BaseMission.VIEW: 1, BaseMission.LIKE: 2}
+
+
+def test_failed_missions_carry_over():
+    planner = make_planner()
+    plan = planner.next_forum(1)
+    planner.report(BaseMission.VIEW, plan[BaseMission.VIEW], MissionStatus(network_error=True))
+    for key in BaseMission.SIGN, BaseMission.LIKE, BaseMission.SHARE:
+        planner.report(key, plan[key], MissionStatus(success=True))
+    assert planner.next_forum(1) == {BaseMission.VIEW: 3}
+    planner.report(BaseMission.VIEW, 3, MissionStatus(success=True))
+    assert planner.finished
+    assert planner.next_forum(1) == {}
+
+
+def test_next_forum_with_no_forums_left():
+    planner = make_planner()
+    assert planner.next_forum(0) == planner.next_forum(1)
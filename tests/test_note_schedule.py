@@ -0,0 +1,115 @@
+import time
+from datetime import datetime
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("nonebot")
+
+from nonebot_plugin_mystool.model import GenshinNote, StarRailNote, plugin_config
+from nonebot_plugin_mystool.utils import note_schedule
+from nonebot_plugin_mystool.utils.note_schedule import NotePollScheduler, predict_genshin_note_delay, \
+    predict_starrail_note_delay
+
+
+@pytest.fixture(autouse=True)
+def scheduler(monkeypatch):
+    monkeypatch.setattr(NotePollScheduler, "_heap", [])
+    monkeypatch.setattr(NotePollScheduler, "_due_time", {})
+    return NotePollScheduler
+
+
+def test_pop_due(scheduler):
+    now = time.time()
+    scheduler.schedule(("1", "genshin"), 60)
+    scheduler.schedule(("1", "starrail"), 600)
+    scheduler.schedule(("2", "genshin"), 0)
+    assert scheduler.pop_due(now + 1) == {("2", "genshin")}
+    assert scheduler.pop_due(now + 120) == {("1", "genshin")}
+    assert scheduler.is_scheduled(("1", "starrail"))
+    assert not scheduler.is_scheduled(("1", "genshin"))
+    assert scheduler.pop_due(now + 3600) == {("1", "starrail")}
+    assert scheduler.pop_due(now + 3600) == set()
+
+
+def test_pop_due_skips_stale_entries(scheduler):
+    now = time.time()
+    scheduler.schedule(("1", "genshin"), 60)
+    # 重新安排后，旧的到期时间不再有效
+    scheduler.schedule(("1", "genshin"), 600)
+    assert scheduler.pop_due(now + 120) == set()
+    assert scheduler.pop_due(now + 3600) == {("1", "genshin")}
+
+    scheduler.schedule(("2", "starrail"), 60)
+    scheduler.remove("2")
+    assert not scheduler.is_scheduled(("2", "starrail"))
+    assert scheduler.pop_due(now + 3600) == set()
+
+
+def fixed_now(hour: int, minute: int = 0):
+    class FixedDatetime(datetime):
+        @classmethod
+        def now(cls, tz=None):
+            return cls(2024, 1, 1, hour, minute)
+
+    return FixedDatetime
+
+
+@pytest.fixture
+def preference(monkeypatch):
+    preference = plugin_config.preference
+    monkeypatch.setattr(preference, "note_max_interval", 24 * 60)
+    monkeypatch.setattr(preference, "note_poll_lead", 0)
+    monkeypatch.setattr(preference, "note_check_tick", 5)
+    monkeypatch.setattr(preference, "resin_interval", 60)
+    # 提醒时间段从 19:00 开始
+    monkeypatch.setattr(note_schedule, "datetime", fixed_now(8))
+    return preference
+
+
+ACCOUNT = SimpleNamespace(user_resin_threshold=195, user_stamina_threshold=230)
+
+
+def test_predict_genshin_resin_threshold(preference, monkeypatch):
+    # 190 树脂，达到阈值 195 需要 5 * 8 分钟
+    note = GenshinNote(current_resin=190, resin_recovery_time=10 * 8 * 60)
+    assert predict_genshin_note_delay(ACCOUNT, note) == 5 * 8 * 60
+    monkeypatch.setattr(preference, "note_poll_lead", 10)
+    assert predict_genshin_note_delay(ACCOUNT, note) == 5 * 8 * 60 - 10 * 60
+
+
+def test_predict_genshin_transformer(preference):
+    note = GenshinNote(
+        current_resin=200,
+        resin_recovery_time=0,
+        transformer={"obtained": True, "recovery_time": {"Day": 0, "Hour": 1, "Minute": 30, "reached": False}}
+    )
+    assert predict_genshin_note_delay(ACCOUNT, note) == 90 * 60
+
+
+def test_predict_genshin_limits(preference, monkeypatch):
+    full = GenshinNote(current_resin=200, resin_recovery_time=0)
+    monkeypatch.setattr(preference, "note_max_interval", 60)
+    assert predict_genshin_note_delay(ACCOUNT, full) == 60 * 60
+
+    # 不会早于定时任务的检查间隔
+    almost = GenshinNote(current_resin=199, resin_recovery_time=10)
+    assert predict_genshin_note_delay(ACCOUNT, almost) == 5 * 60
+
+
+def test_predict_checks_before_notice_window(preference, monkeypatch):
+    full = GenshinNote(current_resin=200, resin_recovery_time=0)
+    monkeypatch.setattr(note_schedule, "datetime", fixed_now(18, 30))
+    assert predict_genshin_note_delay(ACCOUNT, full) == 30 * 60
+    # 已进入当天的提醒时间段，则只需保证在第二天的时间段前检查
+    monkeypatch.setattr(note_schedule, "datetime", fixed_now(19, 30))
+    assert predict_genshin_note_delay(ACCOUNT, full) == 23.5 * 60 * 60
+
+
+def test_predict_starrail_stamina_threshold(preference):
+    # 200 开拓力，达到阈值 230 需要 30 * 6 分钟
+    note = StarRailNote(current_stamina=200, max_stamina=240, stamina_recover_time=40 * 6 * 60)
+    assert predict_starrail_note_delay(ACCOUNT, note) == 30 * 6 * 60
+
+    full = StarRailNote(current_stamina=240, max_stamina=240, stamina_recover_time=0)
+    assert predict_starrail_note_delay(ACCOUNT, full) == 11 * 60 * 60
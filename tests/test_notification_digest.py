@@ -0,0 +1,55 @@
+import pytest
+
+pytest.importorskip("nonebot")
+
+from nonebot_plugin_saa import AggregatedMessageFactory, MessageFactory, Text
+
+from nonebot_plugin_mystool.utils.outbox import MessagePriority, NotificationDigest, _OutboxItem
+
+
+def make_item(message, priority: MessagePriority = MessagePriority.NORMAL) -> _OutboxItem:
+    return _OutboxItem("10001", message, None, None, priority, 0)
+
+
+def texts(message: MessageFactory):
+    return [segment.data["text"] for segment in message]
+
+
+def test_merge_messages_of_one_recipient():
+    merged = NotificationDigest.merge([
+        make_item("签到完成", MessagePriority.NORMAL),
+        make_item(Text("树脂即将回满"), MessagePriority.LOW),
+        make_item(MessageFactory([Text("兑换成功"), Text("！")]), MessagePriority.HIGH),
+    ])
+    assert len(merged) == 1
+    item = merged[0]
+    assert item.user_id == "10001"
+    # 合并后的消息使用其中最高的优先级
+    assert item.priority == MessagePriority.HIGH
+    assert texts(item.message) == ["签到完成", "\n\n", "树脂即将回满", "\n\n", "兑换成功", "！"]
+
+
+def test_merge_keeps_aggregated_messages_separate():
+    aggregated = AggregatedMessageFactory([MessageFactory("兑换码")])
+    merged = NotificationDigest.merge([
+        make_item("签到完成"),
+        make_item(aggregated, MessagePriority.HIGH),
+        make_item("任务完成"),
+    ])
+    assert len(merged) == 2
+    assert texts(merged[0].message) == ["签到完成", "\n\n", "任务完成"]
+    assert merged[0].priority == MessagePriority.NORMAL
+    assert merged[1].message is aggregated
+
+
+def test_single_message_is_not_wrapped():
+    item = make_item("签到完成")
+    assert NotificationDigest.merge([item]) == [item]
+
+
+def test_digest_groups_by_recipient():
+    digest = NotificationDigest()
+    digest.add(make_item("a"))
+    digest.add(make_item("b"))
+    digest.add(make_item("c")._replace(user_id="10002"))
+    assert [len(items) for items in digest.items.values()] == [2, 1]
@@ -0,0 +1,146 @@
+import asyncio
+from datetime import datetime
+
+import pytest
+
+pytest.importorskip("nonebot")
+
+from nonebot_plugin_mystool.model import plugin_config
+from nonebot_plugin_mystool.utils import outbox
+from nonebot_plugin_mystool.utils.outbox import MessagePriority, NotificationOutbox, QQ_QUOTA_EXCEEDED_CODE, \
+    TokenBucket, _OutboxItem
+
+
+class QuotaExceeded(Exception):
+    code = QQ_QUOTA_EXCEEDED_CODE
+
+
+class FakeSender:
+    """
+    按顺序返回预设结果的 ``send_private_msg``
+    """
+
+    def __init__(self, *results):
+        self.results = list(results)
+        self.sent = []
+
+    async def __call__(self, user_id, message, use=None, guild_id=None):
+        self.sent.append((user_id, message))
+        return self.results.pop(0) if self.results else (True, None)
+
+
+@pytest.fixture
+def outbox_state(monkeypatch):
+    monkeypatch.setattr(NotificationOutbox, "_queue", None)
+    monkeypatch.setattr(NotificationOutbox, "_loop", None)
+    monkeypatch.setattr(NotificationOutbox, "_workers", [])
+    monkeypatch.setattr(NotificationOutbox, "_adapter_buckets", {})
+    monkeypatch.setattr(NotificationOutbox, "_recipient_buckets", {})
+    monkeypatch.setattr(NotificationOutbox, "_quota_exhausted_until", {})
+    monkeypatch.setattr(NotificationOutbox, "_deferred", {})
+    monkeypatch.setattr(NotificationOutbox, "_get_adapter_name", staticmethod(lambda use: "QQ"))
+    preference = plugin_config.preference
+    monkeypatch.setattr(preference, "outbox_recipient_rate", 1)
+    monkeypatch.setattr(preference, "outbox_recipient_burst", 100)
+    monkeypatch.setattr(preference, "outbox_adapter_rate", 100)
+    monkeypatch.setattr(preference, "outbox_adapter_burst", 100)
+    monkeypatch.setattr(preference, "outbox_max_retries", 2)
+    monkeypatch.setattr(preference, "outbox_retry_delay", 10)
+
+
+@pytest.fixture
+def deferred(outbox_state, monkeypatch):
+    """
+    记录延后重新入队的消息，而不真正安排定时器
+    """
+    calls = []
+
+    def put_later(cls, delay, item):
+        calls.append((delay, item))
+
+    monkeypatch.setattr(NotificationOutbox, "_put_later", classmethod(put_later))
+    return calls
+
+
+def deliver(monkeypatch, item: _OutboxItem, *results) -> FakeSender:
+    sender = FakeSender(*results)
+    monkeypatch.setattr(outbox, "send_private_msg", sender)
+    asyncio.run(NotificationOutbox._deliver(item))
+    return sender
+
+
+def make_item(priority: MessagePriority = MessagePriority.NORMAL, attempt: int = 0) -> _OutboxItem:
+    return _OutboxItem("10001", "签到完成", None, None, priority, attempt)
+
+
+def test_token_bucket(monkeypatch):
+    now = 100.0
+    monkeypatch.setattr(outbox.time, "monotonic", lambda: now)
+    bucket = TokenBucket(rate=0.5, capacity=2)
+    assert bucket.try_acquire() == 0
+    assert bucket.try_acquire() == 0
+    assert bucket.try_acquire() == pytest.approx(2)
+    now += 1
+    assert bucket.try_acquire() == pytest.approx(1)
+    now += 1
+    assert bucket.try_acquire() == 0
+
+
+def test_retry_with_backoff(monkeypatch, deferred):
+    item = make_item(attempt=1)
+    deliver(monkeypatch, item, (False, ConnectionError()))
+    assert deferred == [(20, item._replace(attempt=2))]
+
+    deferred.clear()
+    deliver(monkeypatch, item._replace(attempt=2), (False, ConnectionError()))
+    assert deferred == []
+
+
+def test_permanent_failure_is_not_retried(monkeypatch, deferred):
+    sender = deliver(monkeypatch, make_item(), (False, None))
+    assert len(sender.sent) == 1
+    assert deferred == []
+
+
+def test_quota_exhausted(monkeypatch, deferred):
+    item = make_item(MessagePriority.HIGH)
+    deliver(monkeypatch, item, (False, QuotaExceeded()))
+    assert "QQ" in NotificationOutbox._quota_exhausted_until
+    # 配额恢复后再发送，不消耗重试次数
+    (delay, deferred_item), = deferred
+    assert deferred_item == item
+    assert delay == pytest.approx((NotificationOutbox._quota_exhausted_until["QQ"] - datetime.now()).total_seconds(),
+                                  abs=1)
+
+    deferred.clear()
+    # 配额用尽期间不再尝试发送：低优先级消息被丢弃，其他消息延后
+    assert deliver(monkeypatch, make_item(MessagePriority.LOW)).sent == []
+    assert deferred == []
+    assert deliver(monkeypatch, make_item(MessagePriority.NORMAL)).sent == []
+    assert len(deferred) == 1
+
+
+def test_recipient_rate_limit(monkeypatch, deferred):
+    monkeypatch.setattr(plugin_config.preference, "outbox_recipient_burst", 1)
+    assert len(deliver(monkeypatch, make_item()).sent) == 1
+    # 接收用户的令牌不足时延后重新入队
+    assert deliver(monkeypatch, make_item()).sent == []
+    (delay, _), = deferred
+    assert 0 < delay <= 1
+
+
+def test_close_sends_queued_messages(monkeypatch, outbox_state):
+    sender = FakeSender()
+    monkeypatch.setattr(outbox, "send_private_msg", sender)
+
+    async def main():
+        NotificationOutbox.put("10001", "便笺提醒", priority=MessagePriority.LOW)
+        NotificationOutbox.put("10002", "兑换成功", priority=MessagePriority.HIGH)
+        async with NotificationOutbox.digest():
+            NotificationOutbox.put("10003", "签到完成")
+            NotificationOutbox.put("10003", "任务完成")
+        await NotificationOutbox.close()
+
+    asyncio.run(main())
+    assert sorted(user_id for user_id, _ in sender.sent) == ["10001", "10002", "10003"]
+    assert NotificationOutbox._queue is None
@@ -0,0 +1,104 @@
+import asyncio
+import json
+from typing import Optional
+
+import pytest
+
+pytest.importorskip("nonebot")
+
+import nonebot_plugin_mystool.model.data as data_module
+from nonebot_plugin_mystool.model import PluginData, PluginDataManager, UserData
+
+
+@pytest.fixture
+def log_path(tmp_path, monkeypatch):
+    path = tmp_path / "dataV2.log"
+    monkeypatch.setattr(data_module, "plugin_data_log_path", path)
+    monkeypatch.setattr(data_module, "plugin_data_compacting_log_path", tmp_path / "dataV2.log.compacting")
+    monkeypatch.setattr(data_module, "plugin_data_path", tmp_path / "dataV2.json")
+    monkeypatch.setattr(PluginDataManager, "plugin_data", PluginData())
+    monkeypatch.setattr(PluginDataManager, "_storage", None)
+    monkeypatch.setattr(PluginDataManager, "_compacting", False)
+    monkeypatch.setattr(PluginDataManager, "_log_records", 0)
+    return path
+
+
+def record(user_id: str, user: Optional[UserData]) -> str:
+    user_json = user.json() if user is not None else "null"
+    return f'{{"user_id": "{user_id}", "user": {user_json}}}\n'
+
+
+def test_replay_log(log_path):
+    PluginDataManager.plugin_data.users["removed"] = UserData()
+    log_path.write_text(
+        record("1", UserData(enable_notice=False))
+        + "\n"
+        + record("2", UserData())
+        + record("1", UserData(enable_notice=True))
+        + record("removed", None),
+        encoding="utf-8"
+    )
+    assert PluginDataManager._replay_log() == 4
+    users = PluginDataManager.plugin_data.users
+    assert set(users) == {"1", "2"}
+    assert users["1"].enable_notice is True
+
+
+def test_replay_log_ignores_half_written_last_line(log_path):
+    complete = record("1", UserData(enable_notice=False))
+    half_written = record("2", UserData())[:20]
+    log_path.write_text(complete + half_written, encoding="utf-8")
+    assert PluginDataManager._replay_log() == 1
+    users = PluginDataManager.plugin_data.users
+    assert set(users) == {"1"}
+    assert users["1"].enable_notice is False
+
+
+def snapshot_users():
+    with open(data_module.plugin_data_path, "r", encoding="utf-8") as f:
+        return json.load(f)["users"]
+
+
+def test_compact_merges_log_into_snapshot(log_path):
+    users = PluginDataManager.plugin_data.users
+    users["1"] = UserData(enable_notice=False)
+    users["removed"] = UserData()
+    assert PluginDataManager._write_snapshot()
+
+    users["1"].enable_notice = True
+    users["2"] = UserData()
+    users.pop("removed")
+    for user_id in "1", "2", "removed":
+        PluginDataManager._append_log(user_id)
+
+    # 没有运行中的事件循环时在当前线程合并
+    assert PluginDataManager.compact() is None
+    assert not log_path.exists()
+    assert not data_module.plugin_data_compacting_log_path.exists()
+    snapshot = snapshot_users()
+    assert set(snapshot) == {"1", "2"}
+    assert snapshot["1"]["enable_notice"] is True
+
+
+def test_compact_off_the_event_loop_keeps_new_records(log_path):
+    users = PluginDataManager.plugin_data.users
+    users["1"] = UserData()
+    assert PluginDataManager._write_snapshot()
+    PluginDataManager._append_log("1")
+
+    async def main():
+        future = PluginDataManager.compact()
+        assert future is not None
+        # 合并期间的新记录写入新的日志
+        users["2"] = UserData()
+        PluginDataManager._append_log("2")
+        await future
+
+    asyncio.run(main())
+    assert set(snapshot_users()) == {"1"}
+    assert [user_id for user_id, _ in PluginDataManager._read_log(log_path)] == ["2"]
+
+
+def test_compact_without_log(log_path):
+    assert PluginDataManager.compact() is None
+    assert not data_module.plugin_data_path.exists()
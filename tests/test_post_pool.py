@@ -0,0 +1,89 @@
+import asyncio
+
+import pytest
+
+pytest.importorskip("nonebot")
+
+from nonebot_plugin_mystool.api import myb_missions_api
+from nonebot_plugin_mystool.api.myb_missions_api import GenshinImpactMission
+from nonebot_plugin_mystool.model import BaseApiStatus, BBSCookies, UserAccount
+from nonebot_plugin_mystool.utils.cache import AsyncTTLCache
+
+
+class FakeForum:
+    """
+    按顺序返回预设的文章列表，记录请求次数
+    """
+
+    def __init__(self, *pages):
+        self.pages = list(pages)
+        self.fetched = 0
+
+    async def fetch(self, retry: bool = True):
+        self.fetched += 1
+        if not self.pages:
+            return BaseApiStatus(network_error=True), None
+        return BaseApiStatus(success=True), self.pages.pop(0)
+
+
+@pytest.fixture
+def forum(monkeypatch):
+    def patch(*pages) -> FakeForum:
+        fake = FakeForum(*pages)
+        monkeypatch.setattr(myb_missions_api, "_post_pool", AsyncTTLCache(ttl=300))
+        monkeypatch.setattr(GenshinImpactMission, "_fetch_posts", fake.fetch)
+        return fake
+
+    return patch
+
+
+def make_mission() -> GenshinImpactMission:
+    return GenshinImpactMission(UserAccount(cookies=BBSCookies(stuid="100")))
+
+
+def test_posts_are_shared_between_accounts(forum):
+    fake = forum(["1", "2", "3"])
+
+    async def main():
+        first, second = make_mission(), make_mission()
+        first.liked_posts.add("2")
+        results = await asyncio.gather(first.get_posts(), second.get_posts())
+        return [posts for _, posts in results]
+
+    # 已点赞的文章只对该账户去除
+    assert asyncio.run(main()) == [["1", "3"], ["1", "2", "3"]]
+    assert fake.fetched == 1
+
+
+def test_next_posts_refetches_only_when_exhausted(forum):
+    fake = forum(["1", "2"], ["2", "3"])
+
+    async def main():
+        mission = make_mission()
+        mission.liked_posts.add("1")
+        assert await mission._next_posts() == ["2"]
+        assert fake.fetched == 1
+        mission.liked_posts.add("2")
+        # 共享的文章都已点赞过，重新获取
+        assert await mission._next_posts() == ["3"]
+        assert fake.fetched == 2
+        mission.liked_posts.add("3")
+        # 重新获取也失败时没有可用的文章
+        assert await mission._next_posts() is None
+
+    asyncio.run(main())
+
+
+def test_failed_fetch_is_not_cached(forum):
+    fake = forum()
+
+    async def main():
+        mission = make_mission()
+        status, posts = await mission.get_posts()
+        assert not status and posts is None
+        fake.pages.append(["1"])
+        status, posts = await mission.get_posts()
+        assert status and posts == ["1"]
+
+    asyncio.run(main())
+    assert fake.fetched == 2
@@ -0,0 +1,110 @@
+import asyncio
+import functools
+import json
+import uuid
+
+import pytest
+
+pytest.importorskip("nonebot")
+
+import nonebot_plugin_mystool.model.data as data_module
+import nonebot_plugin_mystool.model.sqlite_storage as sqlite_module
+from nonebot_plugin_mystool.model import BBSCookies, PluginData, PluginDataManager, UserAccount, UserData, \
+    plugin_config
+from nonebot_plugin_mystool.model.sqlite_storage import SqliteStorage, SqliteUserDict
+
+USER_UUID = str(uuid.uuid4())
+
+
+def make_plugin_data() -> PluginData:
+    account = UserAccount(cookies=BBSCookies(stuid="100"), phone_number="12345678901")
+    user = UserData(uuid=USER_UUID, accounts={"100": account})
+    plugin_data = PluginData(users={"1": user, "3": UserData(enable_notice=False)})
+    # 用户 2 绑定到用户 1
+    plugin_data.do_user_bind("2", "1")
+    return plugin_data
+
+
+@pytest.fixture
+def storage(tmp_path):
+    storage = SqliteStorage(tmp_path / "dataV2.db")
+    storage.import_plugin_data(make_plugin_data())
+    return storage
+
+
+def test_import_plugin_data(storage):
+    user = storage.load_user("1")
+    assert user.uuid == USER_UUID
+    assert user.accounts["100"].phone_number == "12345678901"
+    # 被绑定的用户没有单独的数据
+    assert storage.load_user("2") is None
+    assert storage.load_bindings() == {"2": "1"}
+    assert sorted(storage.list_user_ids()) == ["1", "3"]
+    assert storage.count_users() == 2
+    assert storage.count_users({"3"}) == 1
+    assert storage.find_user_ids_by_uuid(USER_UUID) == ["1"]
+    assert storage.find_user_ids_by_bbs_uid("100") == ["1"]
+
+
+def make_user_dict(storage: SqliteStorage) -> SqliteUserDict:
+    plugin_data = PluginData()
+    plugin_data.user_bind = storage.load_bindings()
+    return SqliteUserDict(storage, plugin_data)
+
+
+def test_user_dict_get_async(storage):
+    users = make_user_dict(storage)
+
+    async def main():
+        user, bound_user = await asyncio.gather(users.get_async("1"), users.get_async("2"))
+        # 被绑定的用户与目标用户使用同一个数据对象
+        assert user is bound_user
+        assert await users.get_async("1") is user
+        assert await users.get_async("unknown") is None
+
+    asyncio.run(main())
+
+
+def test_user_dict_len_and_iter(storage):
+    users = make_user_dict(storage)
+    users["4"] = UserData()
+    # 已加载但尚未写入的用户只计数一次
+    loaded = users["1"]
+    assert len(users) == 4
+    assert sorted(users) == ["1", "2", "3", "4"]
+    assert loaded.uuid == USER_UUID
+
+
+def test_user_dict_delete_and_write(storage):
+    users = make_user_dict(storage)
+    del users["3"]
+    assert "3" not in users
+    assert len(users) == 2
+    users.write_user("3")
+    users["1"].enable_notice = False
+    users.write_user("1")
+    assert asyncio.run(storage.count_users_async()) == 1
+    assert storage.load_user("1").enable_notice is False
+
+
+def test_migrate_from_json(tmp_path, monkeypatch):
+    json_path = tmp_path / "dataV2.json"
+    json_path.write_text(make_plugin_data().json(), encoding="utf-8")
+    db_path = tmp_path / "dataV2.db"
+    monkeypatch.setattr(data_module, "plugin_data_path", json_path)
+    monkeypatch.setattr(data_module, "plugin_data_log_path", tmp_path / "dataV2.log")
+    monkeypatch.setattr(data_module, "plugin_data_compacting_log_path", tmp_path / "dataV2.log.compacting")
+    monkeypatch.setattr(sqlite_module, "plugin_data_db_path", db_path)
+    monkeypatch.setattr(sqlite_module, "SqliteStorage", functools.partial(SqliteStorage, db_path))
+    monkeypatch.setattr(plugin_config.preference, "storage_backend", "sqlite")
+    monkeypatch.setattr(PluginDataManager, "plugin_data", PluginData())
+    monkeypatch.setattr(PluginDataManager, "_storage", None)
+
+    PluginDataManager.load_plugin_data()
+    assert db_path.is_file()
+    # 原文件保留作为备份
+    assert json.loads(json_path.read_text(encoding="utf-8"))["users"]["1"]["uuid"] == USER_UUID
+    assert isinstance(PluginDataManager.plugin_data.users, SqliteUserDict)
+    user = asyncio.run(PluginDataManager.get_user_async("2"))
+    assert user.uuid == USER_UUID
+    assert asyncio.run(PluginDataManager.count_users_async()) == 2
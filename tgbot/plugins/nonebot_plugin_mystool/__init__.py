@@ -48,9 +48,14 @@ __plugin_meta__ = PluginMetadata(
 
 # 防止多进程生成图片时反复调用
 
-from .utils import CommandBegin
+from .model import NoteNoticeStore
+from .utils import CommandBegin, HttpClientManager, ImageProcessPool, NotificationOutbox
 
 _driver.on_startup(CommandBegin.set_command_begin)
+_driver.on_shutdown(HttpClientManager.close_all)
+_driver.on_shutdown(NoteNoticeStore.flush)
+_driver.on_shutdown(NotificationOutbox.close)
+_driver.on_shutdown(ImageProcessPool.shutdown)
 
 # 加载命令
 
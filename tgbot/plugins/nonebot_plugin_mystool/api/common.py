@@ -1,6 +1,11 @@
+import asyncio
 import json
+import statistics
 import time
-from typing import List, Optional, Tuple, Dict, Any, Union, Type
+from datetime import date
+from email.utils import parsedate_to_datetime
+from types import MappingProxyType
+from typing import List, Optional, Tuple, Dict, Any, Union, Type, AsyncIterator
 from urllib.parse import urlencode, urlparse, parse_qs
 
 import httpx
@@ -12,9 +17,9 @@ from ..model import GameRecord, GameInfo, Good, Address, BaseApiStatus, MmtData,
     GetCookieStatus, \
     CreateMobileCaptchaStatus, GetGoodDetailStatus, ExchangeStatus, GeetestResultV4, GenshinNote, GenshinNoteStatus, \
     GetFpStatus, StarRailNoteStatus, StarRailNote, UserAccount, BBSCookies, ExchangePlan, ExchangeResult, plugin_env, \
-    plugin_config, QueryGameTokenQrCodeStatus
+    plugin_config, QueryGameTokenQrCodeStatus, ClockCalibration
 from ..utils import generate_device_id, logger, generate_ds, \
-    get_async_retry, generate_seed_id, generate_fp_locally
+    get_async_retry, generate_seed_id, generate_fp_locally, get_client, AsyncTTLCache, BYPASS_HOST_LIMIT
 
 URL_LOGIN_TICKET_BY_CAPTCHA = "https://webapi.account.mihoyo.com/Api/login_by_mobilecaptcha"
 URL_LOGIN_TICKET_BY_PASSWORD = "https://webapi.account.mihoyo.com/Api/login_by_password"
@@ -33,6 +38,8 @@ URL_DEVICE_LOGIN = "https://bbs-api.mihoyo.com/apihub/api/deviceLogin"
 URL_DEVICE_SAVE = "https://bbs-api.mihoyo.com/apihub/api/saveDevice"
 URL_GOOD_LIST = "https://api-takumi.mihoyo.com/mall/v1/web/goods/list?app_id=1&point_sn=myb&page_size=20&page={" \
                 "page}&game={game} "
+GOOD_LIST_PAGE_SIZE = 20
+"""商品信息列表每页的商品数，与 URL_GOOD_LIST 中的 page_size 一致"""
 URL_CHECK_GOOD = "https://api-takumi.mihoyo.com/mall/v1/web/goods/detail?app_id=1&point_sn=myb&goods_id={}"
 URL_EXCHANGE = "https://api-takumi.miyoushe.com/mall/v1/web/goods/exchange"
 URL_ADDRESS = "https://api-takumi.mihoyo.com/account/address/list?t={}"
@@ -202,7 +209,7 @@ HEADERS_GOOD_LIST = {
     "Accept-Encoding":
         "gzip, deflate, br"
 }
-HEADERS_EXCHANGE = {
+HEADERS_EXCHANGE = MappingProxyType({
     "Accept":
         "application/json, text/plain, */*",
     "Accept-Encoding":
@@ -237,7 +244,8 @@ HEADERS_EXCHANGE = {
         plugin_env.device_config.X_RPC_DEVICE_NAME_MOBILE,
     "x-rpc-sys_version":
         plugin_env.device_config.X_RPC_SYS_VERSION
-}
+})
+"""兑换请求的请求头模板（只读），每次请求需通过 _build_exchange_request 生成新的请求头"""
 HEADERS_ADDRESS = {
     "Host": "api-takumi.mihoyo.com",
     "Accept": "application/json, text/plain, */*",
@@ -385,7 +393,47 @@ class ApiResultHandler(BaseModel):
         return self.message in ["invalid request"]
 
 
-async def get_game_record(account: UserAccount, retry: bool = True) -> Tuple[BaseApiStatus, Optional[List[GameRecord]]]:
+_game_record_cache: AsyncTTLCache[str, Tuple[BaseApiStatus, Optional[List[GameRecord]]]] = AsyncTTLCache(
+    plugin_config.preference.game_record_cache_ttl, maxsize=4096)
+"""用户绑定的游戏账户信息缓存 {米游社UID: 请求结果}"""
+_game_list_cache: AsyncTTLCache[None, Tuple[BaseApiStatus, Optional[List[GameInfo]]]] = AsyncTTLCache(
+    plugin_config.preference.game_list_cache_ttl)
+"""米哈游游戏信息缓存"""
+
+
+def invalidate_game_record_cache(bbs_uid: Optional[str] = None):
+    """
+    使用户绑定的游戏账户信息缓存失效，应在登录或账户 Cookies 变化后调用
+
+    :param bbs_uid: 米游社UID，为空则清空全部缓存
+    """
+    _game_record_cache.invalidate(bbs_uid)
+
+
+async def get_game_record(
+        account: UserAccount,
+        retry: bool = True,
+        use_cache: bool = True
+) -> Tuple[BaseApiStatus, Optional[List[GameRecord]]]:
+    """
+    获取用户绑定的游戏账户信息，返回一个GameRecord对象的列表
+
+    成功的结果会按账户缓存 ``game_record_cache_ttl`` 秒，同一账户的并发调用只会发送一次请求
+
+    :param account: 用户账户数据
+    :param retry: 是否允许重试
+    :param use_cache: 是否使用缓存
+    """
+    if not use_cache:
+        return await _get_game_record(account, retry)
+    return await _game_record_cache.get(
+        account.bbs_uid,
+        lambda: _get_game_record(account, retry),
+        lambda result: bool(result[0])
+    )
+
+
+async def _get_game_record(account: UserAccount, retry: bool = True) -> Tuple[BaseApiStatus, Optional[List[GameRecord]]]:
     """
     获取用户绑定的游戏账户信息，返回一个GameRecord对象的列表
 
@@ -395,10 +443,10 @@ async def get_game_record(account: UserAccount, retry: bool = True) -> Tuple[Bas
     try:
         async for attempt in get_async_retry(retry):
             with attempt:
-                async with httpx.AsyncClient() as client:
-                    res = await client.get(URL_GAME_RECORD.format(account.bbs_uid), headers=HEADERS_GAME_RECORD,
-                                           cookies=account.cookies.dict(v2_stoken=True, cookie_type=True),
-                                           timeout=plugin_config.preference.timeout)
+                client = get_client()
+                res = await client.get(URL_GAME_RECORD.format(account.bbs_uid), headers=HEADERS_GAME_RECORD,
+                                       cookies=account.cookies.dict(v2_stoken=True, cookie_type=True),
+                                       timeout=plugin_config.preference.timeout)
                 api_result = ApiResultHandler(res.json())
                 if api_result.login_expired:
                     logger.info(
@@ -417,7 +465,21 @@ async def get_game_record(account: UserAccount, retry: bool = True) -> Tuple[Bas
             return BaseApiStatus(network_error=True), None
 
 
-async def get_game_list(retry: bool = True) -> Tuple[BaseApiStatus, Optional[List[GameInfo]]]:
+async def get_game_list(retry: bool = True, use_cache: bool = True) -> Tuple[BaseApiStatus, Optional[List[GameInfo]]]:
+    """
+    获取米哈游游戏的详细信息，若返回`None`说明获取失败
+
+    成功的结果会缓存 ``game_list_cache_ttl`` 秒，并发调用只会发送一次请求
+
+    :param retry: 是否允许重试
+    :param use_cache: 是否使用缓存
+    """
+    if not use_cache:
+        return await _get_game_list(retry)
+    return await _game_list_cache.get(None, lambda: _get_game_list(retry), lambda result: bool(result[0]))
+
+
+async def _get_game_list(retry: bool = True) -> Tuple[BaseApiStatus, Optional[List[GameInfo]]]:
     """
     获取米哈游游戏的详细信息，若返回`None`说明获取失败
 
@@ -428,8 +490,8 @@ async def get_game_list(retry: bool = True) -> Tuple[BaseApiStatus, Optional[Lis
         async for attempt in get_async_retry(retry):
             with attempt:
                 headers["DS"] = generate_ds()
-                async with httpx.AsyncClient() as client:
-                    res = await client.get(URL_GAME_LIST, headers=headers, timeout=plugin_config.preference.timeout)
+                client = get_client()
+                res = await client.get(URL_GAME_LIST, headers=headers, timeout=plugin_config.preference.timeout)
                 api_result = ApiResultHandler(res.json())
                 return BaseApiStatus(success=True), list(
                     map(GameInfo.parse_obj, api_result.data["list"]))
@@ -453,10 +515,10 @@ async def get_user_myb(account: UserAccount, retry: bool = True) -> Tuple[BaseAp
     try:
         async for attempt in get_async_retry(retry):
             with attempt:
-                async with httpx.AsyncClient() as client:
-                    res = await client.get(URL_MYB, headers=HEADERS_MYB,
-                                           cookies=account.cookies.dict(v2_stoken=True, cookie_type=True),
-                                           timeout=plugin_config.preference.timeout)
+                client = get_client()
+                res = await client.get(URL_MYB, headers=HEADERS_MYB,
+                                       cookies=account.cookies.dict(v2_stoken=True, cookie_type=True),
+                                       timeout=plugin_config.preference.timeout)
                 api_result = ApiResultHandler(res.json())
                 if api_result.login_expired:
                     logger.info(
@@ -495,10 +557,10 @@ async def device_login(account: UserAccount, retry: bool = True):
         async for attempt in get_async_retry(retry):
             with attempt:
                 headers["DS"] = generate_ds(data)
-                async with httpx.AsyncClient() as client:
-                    res = await client.post(URL_DEVICE_LOGIN, headers=headers, json=data,
-                                            cookies=account.cookies.dict(v2_stoken=True, cookie_type=True),
-                                            timeout=plugin_config.preference.timeout)
+                client = get_client()
+                res = await client.post(URL_DEVICE_LOGIN, headers=headers, json=data,
+                                        cookies=account.cookies.dict(v2_stoken=True, cookie_type=True),
+                                        timeout=plugin_config.preference.timeout)
                 api_result = ApiResultHandler(res.json())
                 if api_result.login_expired:
                     logger.info(
@@ -540,10 +602,10 @@ async def device_save(account: UserAccount, retry: bool = True):
         async for attempt in get_async_retry(retry):
             with attempt:
                 headers["DS"] = generate_ds(data)
-                async with httpx.AsyncClient() as client:
-                    res = await client.post(URL_DEVICE_SAVE, headers=headers, json=data,
-                                            cookies=account.cookies.dict(v2_stoken=True, cookie_type=True),
-                                            timeout=plugin_config.preference.timeout)
+                client = get_client()
+                res = await client.post(URL_DEVICE_SAVE, headers=headers, json=data,
+                                        cookies=account.cookies.dict(v2_stoken=True, cookie_type=True),
+                                        timeout=plugin_config.preference.timeout)
                 api_result = ApiResultHandler(res.json())
                 if api_result.login_expired:
                     logger.info(
@@ -564,6 +626,74 @@ async def device_save(account: UserAccount, retry: bool = True):
             return BaseApiStatus(network_error=True)
 
 
+class AndroidDeviceRegistry:
+    """
+    安卓设备注册记录
+
+    记录每个 ``device_id_android`` 当天是否已完成设备登录(deviceLogin)和设备保存(saveDevice)，
+    当天已注册的设备在签到前不再重复请求。
+    """
+    _registered_date: Dict[str, date] = {}
+    """安卓设备ID与最近一次注册成功的日期（只保留当天的记录）"""
+    _pruned_date: Optional[date] = None
+    """最近一次清理注册记录的日期"""
+    _locks: Dict[str, asyncio.Lock] = {}
+    """安卓设备ID与对应的注册锁（只保留正在使用的锁）"""
+    _lock_users: Dict[str, int] = {}
+    """安卓设备ID与正在使用或等待注册锁的协程数量"""
+
+    @classmethod
+    def _prune(cls, today: date):
+        """
+        日期变化后清除之前日期的注册记录
+        """
+        if cls._pruned_date != today:
+            cls._registered_date = {
+                device_id: registered_date for device_id, registered_date in cls._registered_date.items()
+                if registered_date == today
+            }
+            cls._pruned_date = today
+
+    @classmethod
+    async def register(cls, account: UserAccount, force: bool = False) -> bool:
+        """
+        在设备当天未注册时进行设备登录和设备保存
+
+        :param account: 用户账户数据
+        :param force: 是否忽略注册记录，强制重新注册
+        :return: 是否发起了注册请求
+        """
+        device_id = account.device_id_android
+        lock = cls._locks.setdefault(device_id, asyncio.Lock())
+        cls._lock_users[device_id] = cls._lock_users.get(device_id, 0) + 1
+        try:
+            async with lock:
+                today = date.today()
+                cls._prune(today)
+                if not force and cls._registered_date.get(device_id) == today:
+                    return False
+                if await device_login(account) and await device_save(account):
+                    cls._registered_date[device_id] = date.today()
+                else:
+                    cls._registered_date.pop(device_id, None)
+                return True
+        finally:
+            cls._lock_users[device_id] -= 1
+            if not cls._lock_users[device_id]:
+                # 没有其他协程在使用该锁，释放以免随设备数量无限增长
+                del cls._lock_users[device_id]
+                del cls._locks[device_id]
+
+    @classmethod
+    def invalidate(cls, account: UserAccount):
+        """
+        清除设备的注册记录，下次签到前将重新注册
+
+        :param account: 用户账户数据
+        """
+        cls._registered_date.pop(account.device_id_android, None)
+
+
 async def get_good_detail(good: Union[Good, str], retry: bool = True) -> Tuple[GetGoodDetailStatus, Optional[Good]]:
     """
     获取某商品的详细信息
@@ -576,8 +706,8 @@ async def get_good_detail(good: Union[Good, str], retry: bool = True) -> Tuple[G
     try:
         async for attempt in get_async_retry(retry):
             with attempt:
-                async with httpx.AsyncClient() as client:
-                    res = await client.get(URL_CHECK_GOOD.format(good_id), timeout=plugin_config.preference.timeout)
+                client = get_client()
+                res = await client.get(URL_CHECK_GOOD.format(good_id), timeout=plugin_config.preference.timeout)
                 api_result = ApiResultHandler(res.json())
                 # -2109 商品不存在；-2105 商品已下架
                 if api_result.retcode == -2109 or api_result.message == -2105:
@@ -606,11 +736,11 @@ async def get_good_games(retry: bool = True) -> Tuple[BaseApiStatus, Optional[Li
     try:
         async for attempt in get_async_retry(retry):
             with attempt:
-                async with httpx.AsyncClient() as client:
-                    res = await client.get(URL_GOOD_LIST.format(page=1,
-                                                                game=""),
-                                           headers=HEADERS_GOOD_LIST,
-                                           timeout=plugin_config.preference.timeout)
+                client = get_client()
+                res = await client.get(URL_GOOD_LIST.format(page=1,
+                                                            game=""),
+                                       headers=HEADERS_GOOD_LIST,
+                                       timeout=plugin_config.preference.timeout)
                 api_result = ApiResultHandler(res.json())
                 return BaseApiStatus(success=True), list(map(lambda x: (x["name"], x["key"]), api_result.data["games"]))
     except tenacity.RetryError as e:
@@ -623,44 +753,109 @@ async def get_good_games(retry: bool = True) -> Tuple[BaseApiStatus, Optional[Li
             return BaseApiStatus(network_error=True), None
 
 
-async def get_good_list(game: str = "", retry: bool = True) -> Tuple[
+async def _get_good_page(game: str, page: int, retry: bool = True) -> Tuple[
     BaseApiStatus,
-    Optional[List[Good]]
+    Optional[List[Good]],
+    Optional[int]
 ]:
     """
-    获取商品信息列表
+    获取商品信息列表的某一页
 
-    :param game: 游戏简称（默认为空，即获取所有游戏的商品）
+    :param game: 游戏简称
+    :param page: 页码（从1开始）
     :param retry: 是否允许重试
-    :return: 商品信息列表
+    :return: (BaseApiStatus, 该页的商品信息列表, 商品总数)
     """
-    good_list = []
-    page = 1
-
     try:
         async for attempt in get_async_retry(retry):
             with attempt:
-                async with httpx.AsyncClient() as client:
-                    res = await client.get(URL_GOOD_LIST.format(page=page,
-                                                                game=game), headers=HEADERS_GOOD_LIST,
-                                           timeout=plugin_config.preference.timeout)
+                client = get_client()
+                res = await client.get(URL_GOOD_LIST.format(page=page,
+                                                            game=game), headers=HEADERS_GOOD_LIST,
+                                       timeout=plugin_config.preference.timeout)
                 api_result = ApiResultHandler(res.json())
-                goods = map(Good.parse_obj, api_result.data["list"])
-                # 判断是否已经读完所有商品
-                if not goods:
-                    break
-                else:
-                    good_list += goods
-                page += 1
+                goods = [Good.parse_obj(good) for good in api_result.data["list"]]
+                total = api_result.data.get("total")
+                return BaseApiStatus(success=True), goods, total if isinstance(total, int) else None
     except tenacity.RetryError as e:
         if is_incorrect_return(e):
-            logger.exception("获取商品信息列表 - 获取商品列表: 服务器没有正确返回")
+            logger.exception(f"获取商品信息列表 - 获取第 {page} 页商品列表: 服务器没有正确返回")
             logger.debug(f"网络请求返回: {res.text}")
-            return BaseApiStatus(incorrect_return=True), None
+            return BaseApiStatus(incorrect_return=True), None, None
         else:
-            logger.exception("获取商品信息列表 - 获取商品列表: 网络请求失败")
-            return BaseApiStatus(network_error=True), None
+            logger.exception(f"获取商品信息列表 - 获取第 {page} 页商品列表: 网络请求失败")
+            return BaseApiStatus(network_error=True), None, None
+
+
+async def iter_good_list(game: str = "", retry: bool = True) -> AsyncIterator[Tuple[
+    BaseApiStatus,
+    Optional[List[Good]]
+]]:
+    """
+    按页获取商品信息列表
+
+    先获取第一页并根据其中的商品总数计算总页数，其余页面并发获取（同时进行的请求数不超过
+    ``Preference.good_list_concurrency``），并按页码顺序逐页返回。获取失败时返回失败状态并停止。
 
+    :param game: 游戏简称（默认为空，即获取所有游戏的商品）
+    :param retry: 是否允许重试
+    :return: 每一页的 (BaseApiStatus, 商品信息列表)
+    """
+    status, goods, total = await _get_good_page(game, 1, retry)
+    if not status:
+        yield status, None
+        return
+    yield status, goods
+
+    if total is None:
+        # 没有商品总数时，逐页获取直到返回空页
+        page = 2
+        while goods:
+            status, goods, _ = await _get_good_page(game, page, retry)
+            if not status:
+                yield status, None
+                return
+            if goods:
+                yield status, goods
+            page += 1
+        return
+
+    semaphore = asyncio.Semaphore(max(1, plugin_config.preference.good_list_concurrency))
+
+    async def get_page(page: int):
+        async with semaphore:
+            return await _get_good_page(game, page, retry)
+
+    page_count = -(-total // GOOD_LIST_PAGE_SIZE)
+    tasks = [asyncio.create_task(get_page(page)) for page in range(2, page_count + 1)]
+    try:
+        for task in tasks:
+            status, goods, _ = await task
+            if not status:
+                yield status, None
+                return
+            yield status, goods
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+async def get_good_list(game: str = "", retry: bool = True) -> Tuple[
+    BaseApiStatus,
+    Optional[List[Good]]
+]:
+    """
+    获取商品信息列表
+
+    :param game: 游戏简称（默认为空，即获取所有游戏的商品）
+    :param retry: 是否允许重试
+    :return: 商品信息列表
+    """
+    good_list = []
+    async for status, goods in iter_good_list(game, retry):
+        if not status:
+            return status, None
+        good_list += goods
     return BaseApiStatus(success=True), good_list
 
 
@@ -676,17 +871,17 @@ async def get_address(account: UserAccount, retry: bool = True) -> Tuple[BaseApi
     try:
         async for attempt in get_async_retry(retry):
             with attempt:
-                async with httpx.AsyncClient() as client:
-                    res = await client.get(URL_ADDRESS.format(
-                        round(time.time() * 1000)), headers=headers,
-                        cookies=account.cookies.dict(v2_stoken=True, cookie_type=True),
-                        timeout=plugin_config.preference.timeout)
-                    api_result = ApiResultHandler(res.json())
-                    if api_result.login_expired:
-                        logger.info(
-                            f"获取地址数据 - 用户 {account.display_name} 登录失效")
-                        logger.debug(f"网络请求返回: {res.text}")
-                        return BaseApiStatus(login_expired=True), None
+                client = get_client()
+                res = await client.get(URL_ADDRESS.format(
+                    round(time.time() * 1000)), headers=headers,
+                    cookies=account.cookies.dict(v2_stoken=True, cookie_type=True),
+                    timeout=plugin_config.preference.timeout)
+                api_result = ApiResultHandler(res.json())
+                if api_result.login_expired:
+                    logger.info(
+                        f"获取地址数据 - 用户 {account.display_name} 登录失效")
+                    logger.debug(f"网络请求返回: {res.text}")
+                    return BaseApiStatus(login_expired=True), None
                 address_list = list(map(Address.parse_obj, api_result.data["list"]))
     except tenacity.RetryError as e:
         if is_incorrect_return(e):
@@ -699,6 +894,16 @@ async def get_address(account: UserAccount, retry: bool = True) -> Tuple[BaseApi
     return BaseApiStatus(success=True), address_list
 
 
+async def _close_private_client(client: Optional[httpx.AsyncClient]):
+    """
+    关闭登录流程中单独创建的 httpx.AsyncClient，共享的客户端（``get_client()``）不会被关闭
+
+    :param client: httpx.AsyncClient 连接
+    """
+    if client is not None and client is not get_client() and not client.is_closed:
+        await client.aclose()
+
+
 async def check_registrable(phone_number: int, keep_client: bool = False, retry: bool = True) -> Tuple[
     BaseApiStatus,
     Optional[bool],
@@ -733,14 +938,12 @@ async def check_registrable(phone_number: int, keep_client: bool = False, retry:
                 if keep_client:
                     client = httpx.AsyncClient()
                 else:
-                    async with httpx.AsyncClient() as client:
-                        res = await request()
+                    client = get_client()
                 res = await request()
                 api_result = ApiResultHandler(res.json())
                 return BaseApiStatus(success=True), bool(api_result.data["is_registable"]), device_id, client
     except tenacity.RetryError as e:
-        if keep_client:
-            await client.aclose()
+        await _close_private_client(client)
         if is_incorrect_return(e):
             logger.exception(f"检查用户 {phone_number} 是否可以注册 - 服务器没有正确返回")
             logger.debug(f"网络请求返回: {res.text}")
@@ -790,13 +993,12 @@ async def create_mmt(client: Optional[httpx.AsyncClient] = None,
                 if client:
                     res = await request()
                 else:
-                    async with httpx.AsyncClient() as client:
-                        res = await request()
+                    client = get_client()
+                    res = await request()
                 api_result = ApiResultHandler(res.json())
                 return BaseApiStatus(success=True), MmtData.parse_obj(api_result.data["mmt_data"]), device_id, client
     except tenacity.RetryError as e:
-        if client:
-            await client.aclose()
+        await _close_private_client(client)
         if is_incorrect_return(e):
             logger.exception("获取短信验证-人机验证任务(create_mmt) - 服务器没有正确返回")
             logger.debug(f"网络请求返回: {res.text}")
@@ -868,8 +1070,8 @@ async def create_mobile_captcha(phone_number: str,
                 if client and not client.is_closed:
                     res = await request()
                 else:
-                    async with httpx.AsyncClient() as client:
-                        res = await request()
+                    client = get_client()
+                    res = await request()
                 api_result = ApiResultHandler(res.json())
                 if api_result.success:
                     return CreateMobileCaptchaStatus(success=True), client
@@ -884,8 +1086,7 @@ async def create_mobile_captcha(phone_number: str,
                 else:
                     return CreateMobileCaptchaStatus(), client
     except tenacity.RetryError as e:
-        if client:
-            await client.aclose()
+        await _close_private_client(client)
         if is_incorrect_return(e):
             logger.exception("发送短信验证码 - 服务器没有正确返回")
             logger.debug(f"网络请求返回: {res.text}")
@@ -943,8 +1144,8 @@ async def get_login_ticket_by_captcha(phone_number: str,
                 if client is not None:
                     res = await request()
                 else:
-                    async with httpx.AsyncClient() as client:
-                        res = await request()
+                    client = get_client()
+                    res = await request()
                 api_result = ApiResultHandler(res.json())
                 if api_result.success:
                     cookies = BBSCookies.parse_obj(dict_from_cookiejar(
@@ -952,8 +1153,7 @@ async def get_login_ticket_by_captcha(phone_number: str,
                     if not cookies.login_ticket:
                         return GetCookieStatus(missing_login_ticket=True), None
                     else:
-                        if client:
-                            await client.aclose()
+                        await _close_private_client(client)
                         return GetCookieStatus(success=True), cookies
                 elif api_result.wrong_captcha:
                     logger.info(
@@ -988,11 +1188,11 @@ async def get_multi_token_by_login_ticket(cookies: BBSCookies, retry: bool = Tru
     try:
         async for attempt in get_async_retry(retry):
             with attempt:
-                async with httpx.AsyncClient() as client:
-                    res = await client.get(
-                        URL_MULTI_TOKEN_BY_LOGIN_TICKET.format(cookies.login_ticket, cookies.bbs_uid),
-                        headers=HEADERS_API_TAKUMI_PC,
-                        timeout=plugin_config.preference.timeout)
+                client = get_client()
+                res = await client.get(
+                    URL_MULTI_TOKEN_BY_LOGIN_TICKET.format(cookies.login_ticket, cookies.bbs_uid),
+                    headers=HEADERS_API_TAKUMI_PC,
+                    timeout=plugin_config.preference.timeout)
                 api_result = ApiResultHandler(res.json())
                 if api_result.login_expired:
                     logger.warning(f"通过 login_ticket 获取 stoken: 登录失效")
@@ -1031,18 +1231,18 @@ async def get_cookie_token_by_captcha(phone_number: str, captcha: int, retry: bo
     try:
         async for attempt in get_async_retry(retry):
             with attempt:
-                async with httpx.AsyncClient() as client:
-                    res = await client.post(URL_COOKIE_TOKEN_BY_CAPTCHA,
-                                            headers=HEADERS_API_TAKUMI_PC,
-                                            json={
-                                                "is_bh2": False,
-                                                "mobile": phone_number,
-                                                "captcha": str(captcha),
-                                                "action_type": "login",
-                                                "token_type": 6
-                                            },
-                                            timeout=plugin_config.preference.timeout
-                                            )
+                client = get_client()
+                res = await client.post(URL_COOKIE_TOKEN_BY_CAPTCHA,
+                                        headers=HEADERS_API_TAKUMI_PC,
+                                        json={
+                                            "is_bh2": False,
+                                            "mobile": phone_number,
+                                            "captcha": str(captcha),
+                                            "action_type": "login",
+                                            "token_type": 6
+                                        },
+                                        timeout=plugin_config.preference.timeout
+                                        )
                 api_result = ApiResultHandler(res.json())
                 if api_result.wrong_captcha:
                     logger.info(f"登录米哈游账号 - 验证码错误")
@@ -1093,13 +1293,13 @@ async def get_login_ticket_by_password(account: str, password: str, mmt_data: Mm
     try:
         async for attempt in get_async_retry(retry):
             with attempt:
-                async with httpx.AsyncClient() as client:
-                    res = await client.post(
-                        URL_LOGIN_TICKET_BY_PASSWORD,
-                        content=encoded_params,
-                        headers=headers,
-                        timeout=plugin_config.preference.timeout
-                    )
+                client = get_client()
+                res = await client.post(
+                    URL_LOGIN_TICKET_BY_PASSWORD,
+                    content=encoded_params,
+                    headers=headers,
+                    timeout=plugin_config.preference.timeout
+                )
                 cookies = BBSCookies.parse_obj(dict_from_cookiejar(res.cookies.jar))
                 api_result = ApiResultHandler(res.json())
                 if api_result.success:
@@ -1139,13 +1339,13 @@ async def get_cookie_token_by_stoken(cookies: BBSCookies, device_id: str = None,
     try:
         async for attempt in get_async_retry(retry):
             with attempt:
-                async with httpx.AsyncClient() as client:
-                    res = await client.get(
-                        URL_COOKIE_TOKEN_BY_STOKEN,
-                        cookies=cookies.dict(v2_stoken=True, cookie_type=True),
-                        headers=headers,
-                        timeout=plugin_config.preference.timeout
-                    )
+                client = get_client()
+                res = await client.get(
+                    URL_COOKIE_TOKEN_BY_STOKEN,
+                    cookies=cookies.dict(v2_stoken=True, cookie_type=True),
+                    headers=headers,
+                    timeout=plugin_config.preference.timeout
+                )
                 api_result = ApiResultHandler(res.json())
                 if api_result.success:
                     cookies.cookie_token = api_result.data["cookie_token"]
@@ -1193,14 +1393,14 @@ async def get_stoken_v2_by_v1(cookies: BBSCookies, device_id: str = None, retry:
     try:
         async for attempt in get_async_retry(retry):
             with attempt:
-                async with httpx.AsyncClient() as client:
-                    headers.setdefault("DS", generate_ds(salt=plugin_env.salt_config.SALT_PROD))
-                    res = await client.post(
-                        URL_STOKEN_V2_BY_V1,
-                        cookies={"stoken": cookies.stoken_v1, "stuid": cookies.bbs_uid},
-                        headers=headers,
-                        timeout=plugin_config.preference.timeout
-                    )
+                client = get_client()
+                headers.setdefault("DS", generate_ds(salt=plugin_env.salt_config.SALT_PROD))
+                res = await client.post(
+                    URL_STOKEN_V2_BY_V1,
+                    cookies={"stoken": cookies.stoken_v1, "stuid": cookies.bbs_uid},
+                    headers=headers,
+                    timeout=plugin_config.preference.timeout
+                )
                 api_result = ApiResultHandler(res.json())
                 if api_result.success:
                     cookies.stoken_v2 = api_result.data["token"]["token"]
@@ -1248,13 +1448,13 @@ async def get_ltoken_by_stoken(cookies: BBSCookies, device_id: str = None, retry
     try:
         async for attempt in get_async_retry(retry):
             with attempt:
-                async with httpx.AsyncClient() as client:
-                    res = await client.get(
-                        URL_LTOKEN_BY_STOKEN,
-                        cookies=cookies.dict(v2_stoken=True, cookie_type=True),
-                        headers=headers,
-                        timeout=plugin_config.preference.timeout
-                    )
+                client = get_client()
+                res = await client.get(
+                    URL_LTOKEN_BY_STOKEN,
+                    cookies=cookies.dict(v2_stoken=True, cookie_type=True),
+                    headers=headers,
+                    timeout=plugin_config.preference.timeout
+                )
                 api_result = ApiResultHandler(res.json())
                 if api_result.success:
                     cookies.ltoken = api_result.data["ltoken"]
@@ -1306,12 +1506,12 @@ async def get_device_fp(device_id: str, retry: bool = True) -> Tuple[GetFpStatus
     try:
         async for attempt in get_async_retry(retry):
             with attempt:
-                async with httpx.AsyncClient() as client:
-                    res = await client.post(
-                        URL_GET_DEVICE_FP,
-                        json=content,
-                        timeout=plugin_config.preference.timeout
-                    )
+                client = get_client()
+                res = await client.post(
+                    URL_GET_DEVICE_FP,
+                    json=content,
+                    timeout=plugin_config.preference.timeout
+                )
                 api_result = ApiResultHandler(res.json())
                 if api_result.data["code"] == 403 or api_result.data["msg"] == "传入的参数有误":
                     logger.error("传入的参数有误")
@@ -1333,15 +1533,86 @@ async def get_device_fp(device_id: str, retry: bool = True) -> Tuple[GetFpStatus
             return GetFpStatus(network_error=True), None
 
 
-async def good_exchange(plan: ExchangePlan) -> Tuple[ExchangeStatus, Optional[ExchangeResult]]:
+async def warm_up_connections(url: str, count: int = 1):
     """
-    执行米游币商品兑换
+    预先建立到目标主机的连接并保存在共享连接池中，之后的请求无需再进行 TCP 连接和 TLS 握手
+
+    :param url: 目标主机上的任意URL
+    :param count: 需要建立的连接数（同时发出的请求会各自占用一个连接）
+    """
+    client = get_client()
+
+    async def request():
+        try:
+            await client.head(url, timeout=plugin_config.preference.timeout, extensions=BYPASS_HOST_LIMIT)
+        except httpx.HTTPError:
+            logger.debug(f"预热网络连接 - 请求 {url} 失败")
+
+    await asyncio.gather(*(request() for _ in range(count)))
+
+
+async def calibrate_server_clock(url: str, samples: int = 8) -> Tuple[BaseApiStatus, Optional[ClockCalibration]]:
+    """
+    通过响应头中的 Date 与网络往返时延测量服务器时钟与本地时钟的偏差
+
+    Date 头只精确到秒，因此采样时刻会分散在一秒内的不同相位，
+    每次采样都能确定一个偏差范围，取所有范围的交集即可将误差收紧到远小于一秒。
+
+    :param url: 目标服务器上的任意URL
+    :param samples: 采样次数
+    """
+    client = get_client()
+    lower, upper = float("-inf"), float("inf")
+    midpoints: List[float] = []
+    rtts: List[float] = []
+    for i in range(samples):
+        if i:
+            await asyncio.sleep(1 / samples + 0.01)
+        try:
+            send_time = time.time()
+            # 不在主机并发限制的队列中等待，以免排队时间被计入往返时延
+            res = await client.head(url, timeout=plugin_config.preference.timeout, extensions=BYPASS_HOST_LIMIT)
+            receive_time = time.time()
+            server_time = parsedate_to_datetime(res.headers["Date"]).timestamp()
+        except (httpx.HTTPError, KeyError, TypeError, ValueError):
+            logger.debug(f"校准服务器时间 - 第 {i + 1} 次采样失败")
+            continue
+        # 服务器时间位于 [Date, Date + 1) 内，且是在 [send_time, receive_time] 期间的某一刻生成的
+        lower = max(lower, server_time - receive_time)
+        upper = min(upper, server_time + 1 - send_time)
+        midpoints.append(server_time + 0.5 - (send_time + receive_time) / 2)
+        rtts.append(receive_time - send_time)
+
+    if not rtts:
+        logger.error(f"校准服务器时间 - 请求 {url} 全部失败")
+        return BaseApiStatus(network_error=True), None
+    if lower <= upper:
+        offset, error = (lower + upper) / 2, (upper - lower) / 2
+    else:
+        # 网络抖动导致范围没有交集时，退而使用各次采样的中位数
+        offset, error = statistics.median(midpoints), 0.5 + max(rtts) / 2
+    return BaseApiStatus(success=True), ClockCalibration(
+        offset=offset,
+        error=error,
+        rtt=statistics.mean(rtts),
+        samples=len(rtts)
+    )
+
+
+def _build_exchange_request(plan: ExchangePlan) -> Tuple[Dict[str, str], Dict[str, Any]]:
+    """
+    根据兑换计划生成兑换请求的请求头和请求体
+
+    每次调用都会基于只读的请求头模板生成新的字典，多个兑换协程或线程同时兑换不同账户的商品时不会互相影响
 
     :param plan: 兑换计划
+    :return: (请求头, 请求体)
     """
-    headers = HEADERS_EXCHANGE
-    headers["x-rpc-device_id"] = plan.account.device_id_ios
-    headers["x-rpc-device_fp"] = plan.account.device_fp or generate_fp_locally()
+    headers = {
+        **HEADERS_EXCHANGE,
+        "x-rpc-device_id": plan.account.device_id_ios,
+        "x-rpc-device_fp": plan.account.device_fp or generate_fp_locally()
+    }
     content = {
         "app_id": 1,
         "point_sn": "myb",
@@ -1356,73 +1627,26 @@ async def good_exchange(plan: ExchangePlan) -> Tuple[ExchangeStatus, Optional[Ex
         content.setdefault("region", plan.game_record.region)
         # 例: hk4e_cn
         content.setdefault("game_biz", plan.good.game_biz)
-    start_time = 0
-    try:
-        start_time = time.time()
-        async with httpx.AsyncClient() as client:
-            res = await client.post(
-                URL_EXCHANGE, headers=headers, json=content,
-                cookies=plan.account.cookies.dict(cookie_type=True),
-                timeout=plugin_config.preference.timeout)
-        api_result = ApiResultHandler(res.json())
-        if api_result.login_expired:
-            logger.info(
-                f"米游币商品兑换 - 执行兑换: 用户 {plan.account.display_name} 登录失效 - 请求发送时间: {start_time}")
-            logger.debug(f"网络请求返回: {res.text}")
-            return ExchangeStatus(login_expired=True), None
-        if api_result.success:
-            logger.info(
-                f"米游币商品兑换: 用户 {plan.account.display_name} 商品 {plan.good.goods_id} 兑换成功！可以自行确认 - 请求发送时间: {start_time}")
-            logger.debug(f"网络请求返回: {res.text}")
-            return ExchangeStatus(success=True), ExchangeResult(result=True, return_data=res.json(), plan=plan)
-        else:
-            logger.info(
-                f"米游币商品兑换: 用户 {plan.account.display_name} 商品 {plan.good.goods_id} 兑换失败，可以自行确认 - 请求发送时间: {start_time}")
-            logger.debug(f"网络请求返回: {res.text}")
-            return ExchangeStatus(success=True), ExchangeResult(result=False, return_data=res.json(), plan=plan)
-    except Exception as e:
-        if is_incorrect_return(e):
-            logger.error(
-                f"米游币商品兑换: 用户 {plan.account.display_name} 商品 {plan.good.goods_id} 服务器没有正确返回 - 请求发送时间: {start_time}")
-            logger.debug(f"网络请求返回: {res.text}")
-            return ExchangeStatus(incorrect_return=True), None
-        else:
-            logger.exception(
-                f"米游币商品兑换: 用户 {plan.account.display_name} 商品 {plan.good.goods_id} 请求失败 - 请求发送时间: {start_time}")
-            return ExchangeStatus(network_error=True), None
+    return headers, content
 
 
-def good_exchange_sync(plan: ExchangePlan) -> Tuple[ExchangeStatus, Optional[ExchangeResult]]:
+async def good_exchange(plan: ExchangePlan) -> Tuple[ExchangeStatus, Optional[ExchangeResult]]:
     """
     执行米游币商品兑换
 
     :param plan: 兑换计划
     """
-    headers = HEADERS_EXCHANGE
-    headers["x-rpc-device_id"] = plan.account.device_id_ios
-    headers["x-rpc-device_fp"] = plan.account.device_fp or generate_fp_locally()
-    content = {
-        "app_id": 1,
-        "point_sn": "myb",
-        "goods_id": plan.good.goods_id,
-        "exchange_num": 1
-    }
-    if plan.address is not None:
-        content.setdefault("address_id", plan.address.id)
-    if plan.game_record is not None:
-        content.setdefault("uid", plan.game_record.game_role_id)
-        # 例: cn_gf01
-        content.setdefault("region", plan.game_record.region)
-        # 例: hk4e_cn
-        content.setdefault("game_biz", plan.good.game_biz)
+    headers, content = _build_exchange_request(plan)
     start_time = 0
     try:
         start_time = time.time()
-        with httpx.Client() as client:
-            res = client.post(
-                URL_EXCHANGE, headers=headers, json=content,
-                cookies=plan.account.cookies.dict(cookie_type=True),
-                timeout=plugin_config.preference.timeout)
+        client = get_client()
+        # 兑换请求不在主机并发限制的队列中等待，以免错过兑换时间
+        res = await client.post(
+            URL_EXCHANGE, headers=headers, json=content,
+            cookies=plan.account.cookies.dict(cookie_type=True),
+            timeout=plugin_config.preference.timeout,
+            extensions=BYPASS_HOST_LIMIT)
         api_result = ApiResultHandler(res.json())
         if api_result.login_expired:
             logger.info(
@@ -1451,7 +1675,11 @@ def good_exchange_sync(plan: ExchangePlan) -> Tuple[ExchangeStatus, Optional[Exc
             return ExchangeStatus(network_error=True), None
 
 
-async def genshin_note(account: UserAccount) -> Tuple[
+async def genshin_note(
+        account: UserAccount,
+        records: Optional[List[GameRecord]] = None,
+        game_list: Optional[List[GameInfo]] = None
+) -> Tuple[
     Union[BaseApiStatus, GenshinNoteStatus],
     Optional[GenshinNote]
 ]:
@@ -1459,13 +1687,17 @@ async def genshin_note(account: UserAccount) -> Tuple[
     获取原神实时便笺
 
     :param account: 用户账户数据
-    """
-    game_record_status, records = await get_game_record(account)
-    if not game_record_status:
-        return GenshinNoteStatus(game_record_failed=True), None
-    game_list_status, game_list = await get_game_list()
-    if not game_list_status:
-        return GenshinNoteStatus(game_list_failed=True), None
+    :param records: 已获取的用户游戏账户信息，为空则自动获取
+    :param game_list: 已获取的米哈游游戏信息，为空则自动获取
+    """
+    if records is None:
+        game_record_status, records = await get_game_record(account)
+        if not game_record_status:
+            return GenshinNoteStatus(game_record_failed=True), None
+    if game_list is None:
+        game_list_status, game_list = await get_game_list()
+        if not game_list_status:
+            return GenshinNoteStatus(game_list_failed=True), None
     game_filter = filter(lambda x: x.en_name == 'ys', game_list)
     game_info = next(game_filter, None)
     if not game_info:
@@ -1485,14 +1717,14 @@ async def genshin_note(account: UserAccount) -> Tuple[
                     with attempt:
                         headers["DS"] = generate_ds(
                             params={"role_id": record.game_role_id, "server": record.region})
-                        async with httpx.AsyncClient() as client:
-                            res = await client.get(
-                                URL_GENSHEN_NOTE_BBS,
-                                headers=headers,
-                                cookies=account.cookies.dict(v2_stoken=True, cookie_type=True),
-                                params=params,
-                                timeout=plugin_config.preference.timeout
-                            )
+                        client = get_client()
+                        res = await client.get(
+                            URL_GENSHEN_NOTE_BBS,
+                            headers=headers,
+                            cookies=account.cookies.dict(v2_stoken=True, cookie_type=True),
+                            params=params,
+                            timeout=plugin_config.preference.timeout
+                        )
                         api_result = ApiResultHandler(res.json())
                         if api_result.login_expired:
                             logger.info(
@@ -1511,13 +1743,13 @@ async def genshin_note(account: UserAccount) -> Tuple[
                         if not api_result.success:
                             headers["DS"] = generate_ds()
                             headers["x-rpc-device_id"] = account.device_id_ios
-                            async with httpx.AsyncClient() as client:
-                                res = await client.get(
-                                    URL_GENSHEN_NOTE_WIDGET,
-                                    headers=headers,
-                                    cookies=account.cookies.dict(v2_stoken=True, cookie_type=True),
-                                    timeout=plugin_config.preference.timeout
-                                )
+                            client = get_client()
+                            res = await client.get(
+                                URL_GENSHEN_NOTE_WIDGET,
+                                headers=headers,
+                                cookies=account.cookies.dict(v2_stoken=True, cookie_type=True),
+                                timeout=plugin_config.preference.timeout
+                            )
                             api_result = ApiResultHandler(res.json())
                             return GenshinNoteStatus(success=True), \
                                 GenshinNote.parse_obj(api_result.data)
@@ -1534,7 +1766,11 @@ async def genshin_note(account: UserAccount) -> Tuple[
         return GenshinNoteStatus(no_genshin_account=True), None
 
 
-async def starrail_note(account: UserAccount) -> Tuple[
+async def starrail_note(
+        account: UserAccount,
+        records: Optional[List[GameRecord]] = None,
+        game_list: Optional[List[GameInfo]] = None
+) -> Tuple[
     Union[BaseApiStatus, StarRailNoteStatus],
     Optional[StarRailNote]
 ]:
@@ -1542,13 +1778,17 @@ async def starrail_note(account: UserAccount) -> Tuple[
     获取崩铁实时便笺
 
     :param account: 用户账户数据
-    """
-    game_record_status, records = await get_game_record(account)
-    if not game_record_status:
-        return StarRailNoteStatus(game_record_failed=True), None
-    game_list_status, game_list = await get_game_list()
-    if not game_list_status:
-        return StarRailNoteStatus(game_list_failed=True), None
+    :param records: 已获取的用户游戏账户信息，为空则自动获取
+    :param game_list: 已获取的米哈游游戏信息，为空则自动获取
+    """
+    if records is None:
+        game_record_status, records = await get_game_record(account)
+        if not game_record_status:
+            return StarRailNoteStatus(game_record_failed=True), None
+    if game_list is None:
+        game_list_status, game_list = await get_game_list()
+        if not game_list_status:
+            return StarRailNoteStatus(game_list_failed=True), None
     game_filter = filter(lambda x: x.en_name == 'sr', game_list)
     game_info = next(game_filter, None)
     if not game_info:
@@ -1565,11 +1805,11 @@ async def starrail_note(account: UserAccount) -> Tuple[
                 async for attempt in get_async_retry(False):
                     with attempt:
                         headers["DS"] = generate_ds(data={})
-                        async with httpx.AsyncClient() as client:
-                            cookies = account.cookies.dict(v2_stoken=True, cookie_type=True)
-                            res = await client.get(url, headers=headers,
-                                                   cookies=cookies,
-                                                   timeout=plugin_config.preference.timeout)
+                        client = get_client()
+                        cookies = account.cookies.dict(v2_stoken=True, cookie_type=True)
+                        res = await client.get(url, headers=headers,
+                                               cookies=cookies,
+                                               timeout=plugin_config.preference.timeout)
                         api_result = ApiResultHandler(res.json())
                         if api_result.login_expired:
                             logger.info(
@@ -1617,13 +1857,13 @@ async def create_verification(
                 headers["x-rpc-device_fp"] = account.device_fp if account and account.device_fp else \
                     generate_fp_locally()
                 headers["DS"] = generate_ds()
-                async with httpx.AsyncClient() as client:
-                    res = await client.get(
-                        URL_CREATE_VERIFICATION,
-                        headers=headers,
-                        cookies=account.cookies.dict(v2_stoken=True, cookie_type=True),
-                        timeout=plugin_config.preference.timeout
-                    )
+                client = get_client()
+                res = await client.get(
+                    URL_CREATE_VERIFICATION,
+                    headers=headers,
+                    cookies=account.cookies.dict(v2_stoken=True, cookie_type=True),
+                    timeout=plugin_config.preference.timeout
+                )
                 api_result = ApiResultHandler(res.json())
                 return BaseApiStatus(success=True), MmtData.parse_obj(api_result.data)
     except tenacity.RetryError as e:
@@ -1664,13 +1904,13 @@ async def verify_verification(
                 headers["x-rpc-device_fp"] = account.device_fp if account and account.device_fp else \
                     generate_fp_locally()
                 headers["DS"] = generate_ds()
-                async with httpx.AsyncClient() as client:
-                    res = await client.post(
-                        URL_VERIFY_VERIFICATION,
-                        headers=headers,
-                        cookies=account.cookies.dict(v2_stoken=True, cookie_type=True),
-                        json=content,
-                        timeout=plugin_config.preference.timeout)
+                client = get_client()
+                res = await client.post(
+                    URL_VERIFY_VERIFICATION,
+                    headers=headers,
+                    cookies=account.cookies.dict(v2_stoken=True, cookie_type=True),
+                    json=content,
+                    timeout=plugin_config.preference.timeout)
                 api_result = ApiResultHandler(res.json())
                 if api_result.retcode == 0:
                     return BaseApiStatus(success=True)
@@ -1706,12 +1946,12 @@ async def fetch_game_token_qrcode(
                     "app_id": app_id,
                     "device": device_id,
                 }
-                async with httpx.AsyncClient() as client:
-                    res = await client.post(
-                        URL_FETCH_GAME_TOKEN_QRCODE,
-                        json=content,
-                        timeout=plugin_config.preference.timeout
-                    )
+                client = get_client()
+                res = await client.post(
+                    URL_FETCH_GAME_TOKEN_QRCODE,
+                    json=content,
+                    timeout=plugin_config.preference.timeout
+                )
                 api_result = ApiResultHandler(res.json())
                 if api_result.retcode == 0:
                     qrcode_url = api_result.data["url"]
@@ -1753,12 +1993,12 @@ async def query_game_token_qrcode(
                     "device": device_id,
                     "ticket": ticket
                 }
-                async with httpx.AsyncClient() as client:
-                    res = await client.post(
-                        URL_QUERY_GAME_TOKEN_QRCODE,
-                        json=content,
-                        timeout=plugin_config.preference.timeout
-                    )
+                client = get_client()
+                res = await client.post(
+                    URL_QUERY_GAME_TOKEN_QRCODE,
+                    json=content,
+                    timeout=plugin_config.preference.timeout
+                )
                 api_result = ApiResultHandler(res.json())
                 if api_result.retcode == 0:
                     if api_result.data["stat"] == "Init":
@@ -1805,13 +2045,13 @@ async def get_token_by_game_token(
                     "account_id": int(bbs_uid),
                     "game_token": game_token
                 }
-                async with httpx.AsyncClient() as client:
-                    res = await client.post(
-                        URL_GET_TOKEN_BY_GAME_TOKEN,
-                        headers={"x-rpc-app_id": "bll8iq97cem8"},
-                        json=content,
-                        timeout=plugin_config.preference.timeout
-                    )
+                client = get_client()
+                res = await client.post(
+                    URL_GET_TOKEN_BY_GAME_TOKEN,
+                    headers={"x-rpc-app_id": "bll8iq97cem8"},
+                    json=content,
+                    timeout=plugin_config.preference.timeout
+                )
                 api_result = ApiResultHandler(res.json())
                 if api_result.retcode == 0:
                     stoken_v2 = api_result.data["token"]["token"]
@@ -1849,13 +2089,13 @@ async def get_cookie_token_by_game_token(
                     "account_id": int(bbs_uid),
                     "game_token": game_token
                 }
-                async with httpx.AsyncClient() as client:
-                    res = await client.post(
-                        URL_GET_COOKIE_TOKEN_BY_GAME_TOKEN,
-                        headers={"x-rpc-app_id": "bll8iq97cem8"},
-                        json=content,
-                        timeout=plugin_config.preference.timeout
-                    )
+                client = get_client()
+                res = await client.post(
+                    URL_GET_COOKIE_TOKEN_BY_GAME_TOKEN,
+                    headers={"x-rpc-app_id": "bll8iq97cem8"},
+                    json=content,
+                    timeout=plugin_config.preference.timeout
+                )
                 api_result = ApiResultHandler(res.json())
                 if api_result.retcode == 0:
                     cookie_token = api_result.data["token"]["token"]
@@ -1,19 +1,23 @@
+from datetime import datetime
 from typing import List, Optional, Tuple, Literal, Set, Type
 from urllib.parse import urlencode
 
-import httpx
 import tenacity
 
 from ..api.common import ApiResultHandler, HEADERS_API_TAKUMI_MOBILE, is_incorrect_return, \
-    device_login, device_save
+    AndroidDeviceRegistry
 from ..model import GameRecord, BaseApiStatus, Award, GameSignInfo, GeetestResult, MmtData, plugin_config, plugin_env, \
     UserAccount
 from ..utils import logger, generate_ds, \
-    get_async_retry
+    get_async_retry, get_client, AsyncTTLCache
 
 __all__ = ["BaseGameSign", "GenshinImpactSign", "HonkaiImpact3Sign", "HoukaiGakuen2Sign", "TearsOfThemisSign",
            "StarRailSign", "ZenlessZoneZeroSign"]
 
+_reward_cache: AsyncTTLCache[Tuple[str, str], Tuple[BaseApiStatus, Optional[List[Award]]]] = AsyncTTLCache(
+    ttl=32 * 24 * 3600, maxsize=32)
+"""签到奖励列表缓存 {(act_id, 月份): (BaseApiStatus, 奖励列表)}，奖励列表只与活动和月份有关"""
+
 
 class BaseGameSign:
     """
@@ -67,16 +71,28 @@ class BaseGameSign:
 
     async def get_rewards(self, retry: bool = True) -> Tuple[BaseApiStatus, Optional[List[Award]]]:
         """
-        获取签到奖励信息
+        获取签到奖励信息，同一活动每月只会请求一次
+
+        :param retry: 是否允许重试
+        """
+        return await _reward_cache.get(
+            (self.act_id, datetime.now().strftime("%Y-%m")),
+            lambda: self._get_rewards(retry),
+            lambda result: bool(result[0])
+        )
+
+    async def _get_rewards(self, retry: bool = True) -> Tuple[BaseApiStatus, Optional[List[Award]]]:
+        """
+        请求签到奖励信息
 
         :param retry: 是否允许重试
         """
         try:
             async for attempt in get_async_retry(retry):
                 with attempt:
-                    async with httpx.AsyncClient() as client:
-                        res = await client.get(self.url_reward, headers=self.headers_reward,
-                                               timeout=plugin_config.preference.timeout)
+                    client = get_client()
+                    res = await client.get(self.url_reward, headers=self.headers_reward,
+                                           timeout=plugin_config.preference.timeout)
                     award_list = []
                     for award in res.json()["data"]["awards"]:
                         award_list.append(Award.parse_obj(award))
@@ -108,10 +124,10 @@ class BaseGameSign:
             async for attempt in get_async_retry(retry):
                 with attempt:
                     headers["DS"] = generate_ds() if platform == "ios" else generate_ds(platform="android")
-                    async with httpx.AsyncClient() as client:
-                        res = await client.get(self.url_info, headers=headers,
-                                               cookies=self.account.cookies.dict(),
-                                               timeout=plugin_config.preference.timeout)
+                    client = get_client()
+                    res = await client.get(self.url_info, headers=headers,
+                                           cookies=self.account.cookies.dict(),
+                                           timeout=plugin_config.preference.timeout)
                     api_result = ApiResultHandler(res.json())
                     if api_result.login_expired:
                         logger.info(
@@ -154,14 +170,15 @@ class BaseGameSign:
             "uid": self.record.game_role_id
         }
         headers = self.headers_general.copy()
+        device_registered = False
+        """本次签到前是否刚完成安卓设备注册"""
         if platform == "ios":
             headers["x-rpc-device_id"] = self.account.device_id_ios
             headers["Sec-Fetch-Dest"] = "empty"
             headers["Sec-Fetch-Site"] = "same-site"
             headers["DS"] = generate_ds()
         else:
-            await device_login(self.account)
-            await device_save(self.account)
+            device_registered = await AndroidDeviceRegistry.register(self.account)
             headers["x-rpc-device_id"] = self.account.device_id_android
             headers["x-rpc-device_model"] = plugin_env.device_config.X_RPC_DEVICE_MODEL_ANDROID
             headers["User-Agent"] = plugin_env.device_config.USER_AGENT_ANDROID
@@ -181,14 +198,14 @@ class BaseGameSign:
                         headers["x-rpc-seccode"] = geetest_result.seccode
                         logger.info("游戏签到 - 尝试使用人机验证结果进行签到")
 
-                    async with httpx.AsyncClient() as client:
-                        res = await client.post(
-                            self.url_sign,
-                            headers=headers,
-                            cookies=self.account.cookies.dict(),
-                            timeout=plugin_config.preference.timeout,
-                            json=content
-                        )
+                    client = get_client()
+                    res = await client.post(
+                        self.url_sign,
+                        headers=headers,
+                        cookies=self.account.cookies.dict(),
+                        timeout=plugin_config.preference.timeout,
+                        json=content
+                    )
 
                     api_result = ApiResultHandler(res.json())
                     if api_result.login_expired:
@@ -202,6 +219,11 @@ class BaseGameSign:
                         logger.debug(f"网络请求返回: {res.text}")
                         return BaseApiStatus(invalid_ds=True), None
                     elif api_result.data.get("risk_code") != 0:
+                        if platform == "android" and not device_registered and not geetest_result:
+                            # 设备注册记录可能已失效，重新注册设备后再尝试一次
+                            logger.info(f"游戏签到 - 用户 {self.account.display_name} 被人机验证阻拦，尝试重新注册设备")
+                            AndroidDeviceRegistry.invalidate(self.account)
+                            return await self.sign(platform, mmt_data, geetest_result, retry)
                         logger.warning(
                             f"{plugin_config.preference.log_head}游戏签到 - 用户 {self.account.display_name} 可能被人机验证阻拦")
                         logger.debug(f"{plugin_config.preference.log_head}网络请求返回: {res.text}")
@@ -0,0 +1,124 @@
+import asyncio
+import time
+from typing import Dict, Iterable, List, Optional
+
+from ..api.common import get_good_list
+from ..model import BaseApiStatus, Good, plugin_config
+from ..utils import logger
+
+__all__ = ["GOOD_PARTITIONS", "GoodCatalogue"]
+
+GOOD_PARTITIONS = ("bh3", "hk4e", "bh2", "hkrpg", "nxx", "bbs", "nap")
+"""米游币商城的商品分区（游戏简称）"""
+
+
+class GoodCatalogue:
+    """
+    米游币商品目录
+
+    定时获取所有分区的商品信息列表并保存在内存中，按商品ID和分区建立索引，
+    添加兑换计划、生成商品图片时直接读取，无需再次请求。
+    """
+    _partitions: Dict[str, List[Good]] = {}
+    """各分区的商品信息列表 {游戏简称: 商品列表}"""
+    _updated_at: Dict[str, float] = {}
+    """各分区最近一次成功更新的时间戳"""
+    _goods: Dict[str, Good] = {}
+    """商品ID索引 {商品ID: 商品}"""
+    _goods_partition: Dict[str, str] = {}
+    """商品所在分区 {商品ID: 游戏简称}"""
+    _refresh_lock: Optional[asyncio.Lock] = None
+    _refresh_lock_loop: Optional[asyncio.AbstractEventLoop] = None
+
+    @classmethod
+    def _get_refresh_lock(cls) -> asyncio.Lock:
+        loop = asyncio.get_running_loop()
+        if cls._refresh_lock is None or cls._refresh_lock_loop is not loop:
+            cls._refresh_lock = asyncio.Lock()
+            cls._refresh_lock_loop = loop
+        return cls._refresh_lock
+
+    @classmethod
+    async def refresh(cls, partitions: Iterable[str] = GOOD_PARTITIONS) -> BaseApiStatus:
+        """
+        并发获取各分区的商品信息列表并重建索引，获取失败的分区保留原有数据
+
+        :param partitions: 需要更新的分区
+        :return: 所有分区是否都更新成功
+        """
+        partitions = list(partitions)
+        async with cls._get_refresh_lock():
+            results = await asyncio.gather(*(get_good_list(game) for game in partitions))
+            failed_status = None
+            now = time.time()
+            for game, (status, good_list) in zip(partitions, results):
+                if status:
+                    cls._partitions[game] = good_list
+                    cls._updated_at[game] = now
+                else:
+                    failed_status = status
+                    logger.error(f"{plugin_config.preference.log_head}更新商品目录 - {game} 分区的商品列表获取失败")
+            cls._rebuild_index()
+        logger.info(f"{plugin_config.preference.log_head}商品目录已更新，共 {len(cls._goods)} 个商品")
+        return failed_status if failed_status is not None else BaseApiStatus(success=True)
+
+    @classmethod
+    def _rebuild_index(cls):
+        """
+        根据各分区的商品信息列表重建索引（替换整个字典，其他线程读取时不会看到未完成的索引）
+        """
+        goods: Dict[str, Good] = {}
+        goods_partition: Dict[str, str] = {}
+        for game, good_list in cls._partitions.items():
+            for good in good_list:
+                goods[good.goods_id] = good
+                goods_partition[good.goods_id] = game
+        cls._goods, cls._goods_partition = goods, goods_partition
+
+    @classmethod
+    async def ensure_loaded(cls) -> BaseApiStatus:
+        """
+        若商品目录尚未加载（或有分区从未成功获取），则进行一次更新
+        """
+        if missing := [game for game in GOOD_PARTITIONS if game not in cls._updated_at]:
+            return await cls.refresh(missing)
+        return BaseApiStatus(success=True)
+
+    @classmethod
+    def get(cls, goods_id: str) -> Optional[Good]:
+        """
+        根据商品ID获取商品
+
+        :param goods_id: 商品ID
+        """
+        return cls._goods.get(goods_id)
+
+    @classmethod
+    def get_exchangeable(cls, goods_id: str) -> Optional[Good]:
+        """
+        根据商品ID获取尚未结束兑换的限时商品（可添加兑换计划的商品）
+
+        :param goods_id: 商品ID
+        """
+        good = cls._goods.get(goods_id)
+        if good and not good.time_end and good.time_limited:
+            return good
+        return None
+
+    @classmethod
+    def get_partition_name(cls, goods_id: str) -> Optional[str]:
+        """
+        获取商品所在分区
+
+        :param goods_id: 商品ID
+        """
+        return cls._goods_partition.get(goods_id)
+
+    @classmethod
+    def partition(cls, game: str) -> Optional[List[Good]]:
+        """
+        获取某分区的商品信息列表，分区尚未成功获取过时返回 ``None``
+
+        :param game: 游戏简称
+        """
+        return cls._partitions.get(game)
@@ -1,7 +1,6 @@
 import asyncio
-from typing import List, Optional, Tuple, Type, Dict
+from typing import List, Optional, Tuple, Type, Dict, Set
 
-import httpx
 import tenacity
 
 from ..api.common import ApiResultHandler, is_incorrect_return, create_verification, \
@@ -9,7 +8,7 @@ from ..api.common import ApiResultHandler, is_incorrect_return, create_verificat
 from ..model import BaseApiStatus, MissionStatus, MissionData, \
     MissionState, UserAccount, plugin_config, plugin_env, UserData
 from ..utils import logger, generate_ds, \
-    get_async_retry, get_validate
+    get_async_retry, get_validate, get_client, AsyncTTLCache
 
 URL_SIGN = "https://bbs-api.mihoyo.com/apihub/app/api/signIn"
 URL_GET_POST = "https://bbs-api.miyoushe.com/post/api/feeds/posts?fresh_action=1&gids={}&is_first_initialize=false" \
@@ -77,6 +76,10 @@ HEADERS_OLD = {
     "DS": None
 }
 
+_post_pool: AsyncTTLCache[int, Tuple[BaseApiStatus, Optional[List[str]]]] = AsyncTTLCache(
+    plugin_config.preference.post_pool_ttl)
+"""各分区共享的文章列表缓存 {gids: (BaseApiStatus, 文章ID列表)}"""
+
 
 class BaseMission:
     """
@@ -108,6 +111,8 @@ class BaseMission:
         self.account = account
         self.headers = HEADERS_BASE.copy()
         self.headers["x-rpc-device_id"] = account.device_id_android
+        self.liked_posts: Set[str] = set()
+        """该账户在本次任务中已点赞的文章ID"""
 
     async def sign(self, user: UserData, retry: bool = True) -> Tuple[MissionStatus, Optional[int]]:
         """
@@ -126,14 +131,14 @@ class BaseMission:
                     headers = HEADERS_OLD.copy()
                     headers["x-rpc-device_id"] = self.account.device_id_android
                     headers["DS"] = generate_ds(data=content)
-                    async with httpx.AsyncClient() as client:
-                        res = await client.post(
-                            URL_SIGN,
-                            headers=headers,
-                            json=content,
-                            timeout=plugin_config.preference.timeout,
-                            cookies=self.account.cookies.dict(v2_stoken=True, cookie_type=True)
-                        )
+                    client = get_client()
+                    res = await client.post(
+                        URL_SIGN,
+                        headers=headers,
+                        json=content,
+                        timeout=plugin_config.preference.timeout,
+                        cookies=self.account.cookies.dict(v2_stoken=True, cookie_type=True)
+                    )
                     api_result = ApiResultHandler(res.json())
                     if api_result.login_expired:
                         logger.error(
@@ -184,25 +189,59 @@ class BaseMission:
                 logger.exception("米游币任务 - 讨论区签到: 请求失败")
                 return MissionStatus(network_error=True), None
 
-    async def get_posts(self, retry: bool = True) -> Tuple[BaseApiStatus, Optional[List[str]]]:
+    async def get_posts(self, retry: bool = True, refresh: bool = False) -> Tuple[BaseApiStatus, Optional[List[str]]]:
         """
         获取文章ID列表，若失败返回 `None`
 
+        同一分区的文章列表由所有账户共享，在 ``Preference.post_pool_ttl`` 内只会请求一次，
+        返回结果中已去除该账户在本次任务中点赞过的文章。
+
         :param retry: 是否允许重试
+        :param refresh: 是否忽略缓存，重新获取文章列表
         :return: (BaseApiStatus, 文章ID列表)
         """
+        if refresh:
+            _post_pool.invalidate(self.gids)
+        get_post_status, posts = await _post_pool.get(
+            self.gids,
+            lambda: self._fetch_posts(retry),
+            lambda result: bool(result[0])
+        )
+        if not get_post_status:
+            return get_post_status, None
+        return get_post_status, [post_id for post_id in posts if post_id not in self.liked_posts]
+
+    async def _next_posts(self, retry: bool = True) -> Optional[List[str]]:
+        """
+        一轮文章处理完但次数仍未达到要求时，获取下一轮的文章ID列表，若失败或没有可用的文章返回 `None`
+
+        优先使用共享的文章列表，只有去除已点赞的文章后列表为空时才重新获取
+
+        :param retry: 是否允许重试
+        """
+        get_post_status, posts = await self.get_posts(retry)
+        if get_post_status and not posts:
+            get_post_status, posts = await self.get_posts(retry, refresh=True)
+        return posts if get_post_status and posts else None
+
+    async def _fetch_posts(self, retry: bool = True) -> Tuple[BaseApiStatus, Optional[List[str]]]:
+        """
+        请求分区的文章ID列表
+
+        :param retry: 是否允许重试
+        """
         post_id_list = []
         try:
             async for attempt in get_async_retry(retry):
                 with attempt:
                     headers = HEADERS_GET_POSTS.copy()
                     headers["x-rpc-device_id"] = self.account.device_id_ios
-                    async with httpx.AsyncClient() as client:
-                        res = await client.get(
-                            URL_GET_POST.format(self.gids),
-                            headers=headers,
-                            timeout=plugin_config.preference.timeout
-                        )
+                    client = get_client()
+                    res = await client.get(
+                        URL_GET_POST.format(self.gids),
+                        headers=headers,
+                        timeout=plugin_config.preference.timeout
+                    )
                     api_result = ApiResultHandler(res.json())
                     for post in api_result.data["list"]:
                         if post["self_operation"]["attitude"] == 0:
@@ -237,13 +276,13 @@ class BaseMission:
                     async for attempt in get_async_retry(retry):
                         with attempt:
                             self.headers["DS"] = generate_ds(platform="android")
-                            async with httpx.AsyncClient() as client:
-                                res = await client.get(
-                                    URL_READ.format(post_id),
-                                    headers=self.headers,
-                                    timeout=plugin_config.preference.timeout,
-                                    cookies=self.account.cookies.dict(v2_stoken=True, cookie_type=True)
-                                )
+                            client = get_client()
+                            res = await client.get(
+                                URL_READ.format(post_id),
+                                headers=self.headers,
+                                timeout=plugin_config.preference.timeout,
+                                cookies=self.account.cookies.dict(v2_stoken=True, cookie_type=True)
+                            )
                             api_result = ApiResultHandler(res.json())
                             if api_result.login_expired:
                                 logger.info(
@@ -271,9 +310,10 @@ class BaseMission:
                         return MissionStatus(network_error=True)
                 if count != read_times:
                     await asyncio.sleep(plugin_config.preference.sleep_time)
-            get_post_status, posts = await self.get_posts(retry)
-            if not get_post_status:
-                return MissionStatus(failed_getting_post=True)
+            if count < read_times:
+                posts = await self._next_posts(retry)
+                if posts is None:
+                    return MissionStatus(failed_getting_post=True)
 
         return MissionStatus(success=True)
 
@@ -298,13 +338,13 @@ class BaseMission:
                             headers = HEADERS_OLD.copy()
                             headers["x-rpc-device_id"] = self.account.device_id_android
                             headers["DS"] = generate_ds(platform="android")
-                            async with httpx.AsyncClient() as client:
-                                res = await client.post(
-                                    URL_LIKE, headers=headers,
-                                    json={'is_cancel': False, 'post_id': post_id},
-                                    timeout=plugin_config.preference.timeout,
-                                    cookies=self.account.cookies.dict(v2_stoken=True, cookie_type=True)
-                                )
+                            client = get_client()
+                            res = await client.post(
+                                URL_LIKE, headers=headers,
+                                json={'is_cancel': False, 'post_id': post_id},
+                                timeout=plugin_config.preference.timeout,
+                                cookies=self.account.cookies.dict(v2_stoken=True, cookie_type=True)
+                            )
                             api_result = ApiResultHandler(res.json())
                             if api_result.login_expired:
                                 logger.info(
@@ -321,6 +361,7 @@ class BaseMission:
                             if api_result.message != "OK":
                                 raise ValueError
                             count += 1
+                            self.liked_posts.add(post_id)
                 except tenacity.RetryError as e:
                     if is_incorrect_return(e, ValueError):
                         logger.exception(f"米游币任务 - 点赞: 服务器没有正确返回")
@@ -331,9 +372,10 @@ class BaseMission:
                         return MissionStatus(network_error=True)
                 if count != like_times:
                     await asyncio.sleep(plugin_config.preference.sleep_time)
-            get_post_status, posts = await self.get_posts(retry)
-            if not get_post_status:
-                return MissionStatus(failed_getting_post=True)
+            if count < like_times:
+                posts = await self._next_posts(retry)
+                if posts is None:
+                    return MissionStatus(failed_getting_post=True)
 
         return MissionStatus(success=True)
 
@@ -352,13 +394,13 @@ class BaseMission:
                     headers = HEADERS_OLD.copy()
                     headers["x-rpc-device_id"] = self.account.device_id_android
                     headers["DS"] = generate_ds(platform="android")
-                    async with httpx.AsyncClient() as client:
-                        res = await client.get(
-                            URL_SHARE.format(posts[0]),
-                            headers=headers,
-                            timeout=plugin_config.preference.timeout,
-                            cookies=self.account.cookies.dict(v2_stoken=True, cookie_type=True)
-                        )
+                    client = get_client()
+                    res = await client.get(
+                        URL_SHARE.format(posts[0]),
+                        headers=headers,
+                        timeout=plugin_config.preference.timeout,
+                        cookies=self.account.cookies.dict(v2_stoken=True, cookie_type=True)
+                    )
                     api_result = ApiResultHandler(res.json())
                     if api_result.login_expired:
                         logger.info(
@@ -470,10 +512,10 @@ async def get_missions(account: UserAccount, retry: bool = True) -> Tuple[BaseAp
     try:
         async for attempt in get_async_retry(retry):
             with attempt:
-                async with httpx.AsyncClient() as client:
-                    res = await client.get(URL_MISSION, headers=HEADERS_MISSION,
-                                           cookies=account.cookies.dict(v2_stoken=True, cookie_type=True),
-                                           timeout=plugin_config.preference.timeout)
+                client = get_client()
+                res = await client.get(URL_MISSION, headers=HEADERS_MISSION,
+                                       cookies=account.cookies.dict(v2_stoken=True, cookie_type=True),
+                                       timeout=plugin_config.preference.timeout)
                 api_result = ApiResultHandler(res.json())
                 if api_result.login_expired:
                     logger.info(
@@ -507,10 +549,10 @@ async def get_missions_state(account: UserAccount, retry: bool = True) -> Tuple[
     try:
         async for attempt in get_async_retry(retry):
             with attempt:
-                async with httpx.AsyncClient() as client:
-                    res = await client.get(URL_MISSION_STATE, headers=HEADERS_MISSION,
-                                           cookies=account.cookies.dict(v2_stoken=True, cookie_type=True),
-                                           timeout=plugin_config.preference.timeout)
+                client = get_client()
+                res = await client.get(URL_MISSION_STATE, headers=HEADERS_MISSION,
+                                       cookies=account.cookies.dict(v2_stoken=True, cookie_type=True),
+                                       timeout=plugin_config.preference.timeout)
                 api_result = ApiResultHandler(res.json())
                 if api_result.login_expired:
                     logger.info(
@@ -535,3 +577,49 @@ async def get_missions_state(account: UserAccount, retry: bool = True) -> Tuple[
         else:
             logger.exception("获取米游币任务完成情况: 请求失败")
             return BaseApiStatus(network_error=True), None
+
+
+class MissionPlanner:
+    """
+    米游币任务规划器
+
+    根据 ``MissionState`` 中各任务的当前进度计算剩余需要执行的次数，并将其分摊到各个目标分区，
+    已完成的任务不会再发起请求。
+    """
+
+    def __init__(self, missions_state: MissionState):
+        """
+        :param missions_state: 米游币任务完成情况
+        """
+        self.remaining: Dict[str, int] = {
+            key: max(0, mission.threshold - current)
+            for key, (mission, current) in missions_state.state_dict.items()
+        }
+        """各任务剩余需要执行的次数 {mission_key: 次数}"""
+
+    @property
+    def finished(self) -> bool:
+        """
+        是否已无需要执行的任务
+        """
+        return not any(self.remaining.values())
+
+    def next_forum(self, forums_left: int) -> Dict[str, int]:
+        """
+        为下一个分区分配任务，返回该分区各任务需要执行的次数（不包含无需执行的任务）
+
+        :param forums_left: 包括该分区在内，尚未执行任务的分区数量
+        """
+        forums_left = max(1, forums_left)
+        return {key: -(-times // forums_left) for key, times in self.remaining.items() if times > 0}
+
+    def report(self, key: str, times: int, status: MissionStatus):
+        """
+        记录分区内任务的执行结果，执行失败的次数会顺延到之后的分区
+
+        :param key: 任务的 mission_key
+        :param times: 该分区计划执行的次数
+        :param status: 执行结果
+        """
+        if status:
+            self.remaining[key] = max(0, self.remaining[key] - times)
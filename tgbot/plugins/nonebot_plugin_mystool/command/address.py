@@ -32,7 +32,7 @@ CommandRegistry.set_usage(
 async def _(event: Union[GeneralMessageEvent], matcher: Matcher, state: T_State):
     if isinstance(event, GeneralGroupMessageEvent):
         await address_matcher.finish("⚠️为了保护您的隐私，请私聊进行地址设置。")
-    user = PluginDataManager.plugin_data.users.get(event.get_user_id())
+    user = await PluginDataManager.get_user_async(event.get_user_id())
     user_account = user.accounts if user else None
     if not user_account:
         await address_matcher.finish(f"⚠️你尚未绑定米游社账户，请先使用『{COMMAND_BEGIN}登录』进行登录")
@@ -53,7 +53,7 @@ async def _(event: Union[GeneralPrivateMessageEvent], state: T_State, bbs_uid=Ar
     if bbs_uid == '退出':
         await address_matcher.finish('🚪已成功退出')
 
-    user_account = PluginDataManager.plugin_data.users[event.get_user_id()].accounts
+    user_account = (await PluginDataManager.get_user_async(event.get_user_id())).accounts
     if bbs_uid not in user_account:
         await address_matcher.reject('⚠️您发送的账号不在以上账号内，请重新发送')
     account = user_account[bbs_uid]
@@ -86,7 +86,7 @@ async def _(event: Union[GeneralPrivateMessageEvent], state: T_State, bbs_uid=Ar
 
 
 @address_matcher.got('address_id', prompt='请发送你要选择的地址ID')
-async def _(_: Union[GeneralPrivateMessageEvent], state: T_State, address_id=ArgStr()):
+async def _(event: Union[GeneralPrivateMessageEvent], state: T_State, address_id=ArgStr()):
     if address_id == "退出":
         await address_matcher.finish("🚪已成功退出")
 
@@ -95,7 +95,7 @@ async def _(_: Union[GeneralPrivateMessageEvent], state: T_State, address_id=Arg
     if address is not None:
         account: UserAccount = state["account"]
         account.address = address
-        PluginDataManager.write_plugin_data()
+        PluginDataManager.write_plugin_data(event.get_user_id())
         await address_matcher.finish(f"🎉已成功设置账户 {account.display_name} 的地址")
     else:
         await address_matcher.reject("⚠️您发送的地址ID与查询结果不匹配，请重新发送")
@@ -2,15 +2,14 @@ import asyncio
 import io
 import os
 import random
-import threading
 import time
 from datetime import datetime
-from multiprocessing import Manager
-from multiprocessing.pool import Pool
-from multiprocessing.synchronize import Lock
-from typing import List, Callable, Any, Tuple, Optional, Dict, Union
+from concurrent.futures import Executor
+from pathlib import Path
+from typing import List, Tuple, Optional, Union, Iterable
 
-from apscheduler.events import JobExecutionEvent, EVENT_JOB_EXECUTED
+import httpx
+from apscheduler.jobstores.base import JobLookupError
 from nonebot import on_command, get_driver
 from nonebot.adapters.onebot.v11 import MessageEvent as OneBotV11MessageEvent, MessageSegment as OneBotV11MessageSegment
 from nonebot.adapters.qq import MessageEvent as QQGuildMessageEvent, MessageSegment as QQGuildMessageSegment
@@ -19,18 +18,18 @@ from nonebot.matcher import Matcher
 from nonebot.params import ArgPlainText, T_State, CommandArg, Command
 from nonebot_plugin_apscheduler import scheduler
 
-from ..api.common import get_game_record, get_good_detail, get_good_list, good_exchange_sync, \
-    get_device_fp, \
-    good_exchange
+from ..api.common import get_game_record, get_good_detail, get_good_list, get_device_fp, good_exchange, \
+    warm_up_connections, calibrate_server_clock, URL_EXCHANGE
+from ..api.good_catalogue import GoodCatalogue, GOOD_PARTITIONS
 from ..command.common import CommandRegistry
 from ..model import Good, GameRecord, ExchangeStatus, PluginDataManager, plugin_config, UserAccount, \
-    ExchangePlan, ExchangeResult, CommandUsage
+    ExchangePlan, ExchangeResult, CommandUsage, ClockCalibration, BaseApiStatus
 from ..utils import COMMAND_BEGIN, logger, get_last_command_sep, GeneralMessageEvent, \
-    send_private_msg, get_unique_users, \
-    get_all_bind, game_list_to_image
+    NotificationOutbox, MessagePriority, iter_unique_users, AsyncTTLCache, \
+    get_all_bind, game_list_to_image, good_list_fingerprint, ImageProcessPool
 
 __all__ = [
-    "myb_exchange_plan", "get_good_image", "generate_image"
+    "myb_exchange_plan", "get_good_image", "generate_image", "GoodImageGenerator"
 ]
 
 _driver = get_driver()
@@ -93,7 +92,7 @@ async def _(
                 f"{myb_exchange_plan_usage.usage.format(HEAD=COMMAND_BEGIN, SEP=get_last_command_sep())}"
             )
 
-    user = PluginDataManager.plugin_data.users.get(event.get_user_id())
+    user = await PluginDataManager.get_user_async(event.get_user_id())
     user_account = user.accounts if user else None
     if not user_account:
         await matcher.finish(
@@ -143,7 +142,7 @@ async def _(
     """
     if bbs_uid == '退出':
         await matcher.finish('🚪已成功退出')
-    user_account = PluginDataManager.plugin_data.users[event.get_user_id()].accounts
+    user_account = (await PluginDataManager.get_user_async(event.get_user_id())).accounts
     if bbs_uid in user_account:
         state["account"] = user_account[bbs_uid]
     else:
@@ -163,29 +162,17 @@ async def _(
     account: UserAccount = state['account']
     command_2 = state['command_2']
     if command_2 == '+':
-        good_dict = {
-            'bh3': (await get_good_list('bh3'))[1],
-            'ys': (await get_good_list('hk4e'))[1],
-            'bh2': (await get_good_list('bh2'))[1],
-            'xq': (await get_good_list('hkrpg'))[1],
-            'wd': (await get_good_list('nxx'))[1],
-            'bbs': (await get_good_list('bbs'))[1],
-            'nap': (await get_good_list('nap'))[1]
-        }
-        flag = True
-        break_flag = False
-        good = None
-        for good_list in good_dict.values():
-            goods_on_sell = filter(lambda x: not x.time_end and x.time_limited, good_list)
-            for good in goods_on_sell:
-                if good.goods_id == good_id:
-                    flag = False
-                    break_flag = True
-                    break
-            if break_flag:
-                break
-        if flag:
+        # 商品目录已加载时不会发起请求
+        await GoodCatalogue.ensure_loaded()
+        good = GoodCatalogue.get_exchangeable(good_id)
+        if not good:
             await matcher.finish('⚠️您发送的商品ID不在可兑换的商品列表内，程序已退出')
+        # 目录中的商品对象是共享的且可能已过时，兑换计划使用刷新后的副本
+        good_detail_status, good = await get_good_detail(good.copy(deep=True))
+        if good_detail_status.good_not_existed:
+            await matcher.finish('⚠️您发送的商品ID不在可兑换的商品列表内，程序已退出')
+        elif not good_detail_status:
+            await matcher.finish('⚠️获取商品详情失败，请稍后再试')
         state['good'] = good
         if good.time:
             # 若为实物商品，也进入下一步骤，但是传入uid为None
@@ -217,18 +204,16 @@ async def _(
             await matcher.finish(f'⚠️该商品暂时不可以兑换，请重新设置')
 
     elif command_2 == '-':
-        plans = PluginDataManager.plugin_data.users[event.get_user_id()].exchange_plans
+        plans = (await PluginDataManager.get_user_async(event.get_user_id())).exchange_plans
         if plans:
             for plan in plans:
                 if plan.good.goods_id == good_id:
                     plans.discard(plan)
-                    PluginDataManager.write_plugin_data()
-                    for i in range(plugin_config.preference.exchange_thread_count):
-                        try:
-                            scheduler.remove_job(job_id=f"exchange-plan-{hash(plan)}-{i}")
-                        except scheduler.JobLookupError:
-                            # TODO: 原因不明，暂时忽略异常
-                            pass
+                    PluginDataManager.write_plugin_data(event.get_user_id())
+                    try:
+                        scheduler.remove_job(job_id=f"exchange-plan-{hash(plan)}")
+                    except JobLookupError:
+                        pass
                     await matcher.finish('兑换计划删除成功')
             await matcher.finish(f"您没有设置商品ID为 {good_id} 的兑换哦~")
         else:
@@ -250,7 +235,7 @@ async def _(
     """
     初始化商品兑换任务，如果传入UID为None则为实物商品，仍可继续
     """
-    user = PluginDataManager.plugin_data.users[event.get_user_id()]
+    user = await PluginDataManager.get_user_async(event.get_user_id())
     account: UserAccount = state['account']
     good: Good = state['good']
     if good.is_virtual:
@@ -274,20 +259,10 @@ async def _(
             if not fp_status:
                 await matcher.send(
                     '⚠️从服务器获取device_fp失败！兑换时将在本地生成device_fp。你也可以尝试重新添加兑换计划。')
-        PluginDataManager.write_plugin_data()
+        PluginDataManager.write_plugin_data(event.get_user_id())
 
     # 初始化兑换任务
-    finished.setdefault(plan, [])
-    for i in range(plugin_config.preference.exchange_thread_count):
-        scheduler.add_job(
-            good_exchange_sync,
-            "date",
-            id=f"exchange-plan-{hash(plan)}-{i}",
-            replace_existing=True,
-            args=(plan,),
-            run_date=datetime.fromtimestamp(good.time),
-            max_instances=plugin_config.preference.exchange_thread_count
-        )
+    schedule_exchange(plan, event.get_user_id())
 
     await matcher.finish(
         f'🎉设置兑换计划成功！将于 {plan.good.time_text} 开始兑换，到时将会私聊告知您兑换结果')
@@ -342,217 +317,398 @@ async def _(event: Union[GeneralMessageEvent], arg=ArgPlainText("content")):
     elif arg in ['绝区零']:
         arg = ('nap', '绝区零')
     elif arg == '更新':
-        threading.Thread(target=generate_image, kwargs={"is_auto": False}).start()
-        await get_good_image.finish('⏳后台正在生成商品信息图片，请稍后查询')
+        task, started = GoodImageGenerator.start(is_auto=False)
+        if started:
+            await get_good_image.send('⏳后台正在生成商品信息图片，完成后将通知您')
+        else:
+            await get_good_image.send('⏳后台已有正在进行的商品信息图片生成，完成后将通知您')
+        # 等待（共享的）生成任务完成，本次请求被取消时不影响生成
+        try:
+            success = await asyncio.shield(task)
+        except Exception:
+            success = False
+        if success:
+            await get_good_image.finish('✅商品信息图片已更新完成，可以重新查询了')
+        else:
+            await get_good_image.finish('⚠️部分分区的商品信息图片生成失败，请稍后再试')
     else:
         await get_good_image.reject('⚠️您的输入有误，请重新输入')
 
-    img_path = time.strftime(
-        f'{plugin_config.good_list_image_config.SAVE_PATH}/%m-%d-{arg[0]}.jpg', time.localtime())
-    if os.path.exists(img_path):
-        with open(img_path, 'rb') as f:
-            image_bytes = io.BytesIO(f.read())
-        msg = None
-        if isinstance(event, OneBotV11MessageEvent):
-            msg = OneBotV11MessageSegment.image(image_bytes)
-        elif isinstance(event, QQGuildMessageEvent):
-            msg = QQGuildMessageSegment.file_image(image_bytes)
-        await get_good_image.finish(msg)
+    pages = _partition_pages(time.strftime('%m-%d', time.localtime()), arg[0])
+    if pages:
+        for index, img_path in enumerate(pages):
+            with open(img_path, 'rb') as f:
+                image_bytes = io.BytesIO(f.read())
+            msg = None
+            if isinstance(event, OneBotV11MessageEvent):
+                msg = OneBotV11MessageSegment.image(image_bytes)
+            elif isinstance(event, QQGuildMessageEvent):
+                msg = QQGuildMessageSegment.file_image(image_bytes)
+            if index == len(pages) - 1:
+                await get_good_image.finish(msg)
+            await get_good_image.send(msg)
     else:
         await get_good_image.finish(
             f'{arg[1]} 分区暂时没有可兑换的限时商品。如果这与实际不符，你可以尝试用『{COMMAND_BEGIN}商品 更新』进行更新。')
 
 
-lock = threading.Lock()
-finished: Dict[ExchangePlan, List[bool]] = {}
+_calibration_cache: AsyncTTLCache[Tuple[str, int], Tuple[BaseApiStatus, Optional[ClockCalibration]]] = \
+    AsyncTTLCache(ttl=plugin_config.preference.exchange_prepare_time + plugin_config.preference.exchange_duration)
+"""同一兑换时间的所有兑换计划共用的服务器时钟校准结果 {(主机, 兑换时间): 校准结果}"""
 
 
-@lambda func: scheduler.add_listener(func, EVENT_JOB_EXECUTED)
-def exchange_notice(event: JobExecutionEvent):
-    """
-    接收兑换结果
+def schedule_exchange(plan: ExchangePlan, user_id: str):
     """
-    if event.job_id.startswith("exchange-plan"):
-        loop = asyncio.get_event_loop()
+    为兑换计划添加定时任务，任务将在商品兑换开始前 ``exchange_prepare_time`` 秒启动以进行准备
 
-        thread_id = int(event.job_id.split('-')[-1]) + 1
-        result: Tuple[ExchangeStatus, Optional[ExchangeResult]] = event.retval
-        exchange_status, exchange_result = result
+    :param plan: 兑换计划
+    :param user_id: 兑换计划所属的用户ID
+    """
+    run_date = datetime.fromtimestamp(max(plan.good.time - plugin_config.preference.exchange_prepare_time, time.time()))
+    scheduler.add_job(
+        exchange_begin,
+        "date",
+        id=f"exchange-plan-{hash(plan)}",
+        replace_existing=True,
+        args=(plan, user_id),
+        run_date=run_date
+    )
 
-        if not exchange_status:
-            hash_value = int(event.job_id.split('-')[-2])
-            user_id_filter = filter(lambda x: hash(x[1].exchange_plans) == hash_value, get_unique_users())
-            user_id = next(user_id_filter)
-            user_ids = [user_id] + list(get_all_bind(user_id))
-            plans = PluginDataManager.plugin_data.users[user_id].exchange_plans
 
-            with lock:
-                for plan in plans:
-                    finished[plan].append(False)
-                    for _user_id in user_ids:
-                        loop.create_task(
-                            send_private_msg(
-                                user_id=_user_id,
-                                message=f"⚠️账户 {plan.account.display_name}"
-                                        f"\n- {plan.good.general_name}"
-                                        f"\n- 线程 {thread_id}"
-                                        f"\n- 兑换请求发送失败"
-                            )
-                        )
-                    if len(finished[plan]) == plugin_config.preference.exchange_thread_count:
-                        del plan
-                        PluginDataManager.write_plugin_data()
+async def _sleep_until(timestamp: float):
+    """
+    异步等待直到指定的时间戳，最后几毫秒通过让出事件循环的方式逐次检查，使误差保持在亚毫秒级
 
+    :param timestamp: 目标时间戳
+    """
+    while (remaining := timestamp - time.time()) > 0:
+        if remaining > 0.01:
+            await asyncio.sleep(remaining - 0.005)
         else:
-            plan = exchange_result.plan
-            user_filter = filter(lambda x: plan in x[1].exchange_plans, get_unique_users())
-            user_id, user = next(user_filter)
-            user_ids = [user_id] + list(get_all_bind(user_id))
-            with lock:
-                # 如果已经有一个线程兑换成功，就不再接收结果
-                if True not in finished[plan]:
-                    if exchange_result.result:
-                        finished[plan].append(True)
-                        for _user_id in user_ids:
-                            loop.create_task(
-                                send_private_msg(
-                                    user_id=_user_id,
-                                    message=f"🎉账户 {plan.account.display_name}"
-                                            f"\n- {plan.good.general_name}"
-                                            f"\n- 线程 {thread_id}"
-                                            f"\n- 兑换成功"
-                                )
-                            )
-                    else:
-                        finished[plan].append(False)
-                        for _user_id in user_ids:
-                            loop.create_task(
-                                send_private_msg(
-                                    user_id=_user_id,
-                                    message=f"💦账户 {plan.account.display_name}"
-                                            f"\n- {plan.good.general_name}"
-                                            f"\n- 线程 {thread_id}"
-                                            f"\n- 兑换失败"
-                                )
-                            )
-
-                if len(finished[plan]) == plugin_config.preference.exchange_thread_count:
-                    try:
-                        user.exchange_plans.remove(plan)
-                    except KeyError:
-                        pass
-                    else:
-                        PluginDataManager.write_plugin_data()
+            await asyncio.sleep(0)
 
 
-async def exchange_begin(plan: ExchangePlan):
+async def _exchange_worker(
+        plan: ExchangePlan,
+        worker_id: int,
+        start_time: float,
+        stop_event: asyncio.Event,
+        calibration: Optional[ClockCalibration] = None
+) -> Tuple[ExchangeStatus, Optional[ExchangeResult]]:
     """
-    到点后执行兑换
+    单个兑换协程：从 ``start_time`` 开始不断尝试兑换，直到成功、超出兑换持续时间或其他协程已兑换成功
 
     :param plan: 兑换计划
+    :param worker_id: 协程编号
+    :param start_time: 首次发送兑换请求的本地时间戳
+    :param stop_event: 兑换成功后用于通知所有协程停止的事件
+    :param calibration: 服务器时钟校准结果，用于记录每次请求到达服务器的时间
     """
-    duration = 0
     random_x, random_y = plugin_config.preference.exchange_latency
+    end_time = start_time + plugin_config.preference.exchange_duration
     exchange_status, exchange_result = ExchangeStatus(), None
 
+    await _sleep_until(start_time)
     # 在兑换开始后的一段时间内，不断尝试兑换，直到成功（因为太早兑换可能被认定不在兑换时间）
-    while duration < plugin_config.preference.exchange_duration:
-        latency = random.uniform(random_x, random_y)
-        time.sleep(latency)
+    attempt = 0
+    while not stop_event.is_set():
+        attempt += 1
+        if calibration:
+            arrival = calibration.server_time + calibration.rtt / 2 - plan.good.time
+            logger.info(f"{plugin_config.preference.log_head}米游币商品兑换: 协程 {worker_id} 第 {attempt} 次请求"
+                        f"预计于兑换开始后 {arrival * 1000:+.1f} ms 到达服务器")
         exchange_status, exchange_result = await good_exchange(plan)
         if exchange_status and exchange_result.result:
+            stop_event.set()
             break
-        duration += latency
+        if exchange_status.login_expired or time.time() >= end_time:
+            break
+        await _sleep_until(time.time() + random.uniform(random_x, random_y))
     return exchange_status, exchange_result
 
 
+async def exchange_begin(plan: ExchangePlan, user_id: str):
+    """
+    执行兑换计划：预热连接并校准服务器时钟后，多个兑换协程在商品兑换开始时按错开的时间偏移发送兑换请求，
+    任一协程兑换成功后其余协程立即停止，最后通知用户兑换结果并删除该兑换计划
+
+    :param plan: 兑换计划
+    :param user_id: 兑换计划所属的用户ID
+    """
+    worker_count = max(1, plugin_config.preference.exchange_thread_count)
+    _, random_y = plugin_config.preference.exchange_latency
+
+    await warm_up_connections(URL_EXCHANGE, worker_count)
+
+    # 校准服务器时钟，按服务器时间确定兑换开始的本地时间
+    calibration = None
+    if plugin_config.preference.exchange_clock_calibration:
+        # 同一时间开始兑换的多个兑换计划只进行一次校准
+        _, calibration = await _calibration_cache.get(
+            (httpx.URL(URL_EXCHANGE).host, plan.good.time),
+            lambda: calibrate_server_clock(URL_EXCHANGE),
+            cacheable=lambda result: bool(result[0])
+        )
+        if calibration:
+            logger.info(f"{plugin_config.preference.log_head}米游币商品兑换: 商品 {plan.good.goods_id} "
+                        f"服务器时间偏差 {calibration.offset * 1000:+.1f} ms（±{calibration.error * 1000:.1f} ms），"
+                        f"平均往返时延 {calibration.rtt * 1000:.1f} ms，有效采样 {calibration.samples} 次")
+        else:
+            logger.warning(f"{plugin_config.preference.log_head}米游币商品兑换: 商品 {plan.good.goods_id} "
+                           "服务器时间校准失败，将使用本地时间")
+    begin_time = calibration.to_local_time(plan.good.time) if calibration else plan.good.time
+
+    # 各协程的首次请求在兑换间隔内均匀错开，之后的请求间隔随机
+    stop_event = asyncio.Event()
+    offset = random_y / worker_count
+    results = await asyncio.gather(
+        *(_exchange_worker(plan, i + 1, begin_time + i * offset, stop_event, calibration)
+          for i in range(worker_count))
+    )
+
+    success = any(exchange_status and exchange_result.result for exchange_status, exchange_result in results)
+    if success:
+        result_text = "兑换成功"
+    elif any(exchange_status for exchange_status, _ in results):
+        result_text = "兑换失败"
+    elif any(exchange_status.login_expired for exchange_status, _ in results):
+        result_text = "兑换失败，登录失效，请重新登录"
+    else:
+        result_text = "兑换请求发送失败"
+    logger.info(f"{plugin_config.preference.log_head}米游币商品兑换: 用户 {plan.account.display_name} "
+                f"商品 {plan.good.goods_id} {result_text}")
+
+    user_id = PluginDataManager.plugin_data.user_bind.get(user_id, user_id)
+    for _user_id in [user_id] + list(get_all_bind(user_id)):
+        NotificationOutbox.put(
+            user_id=_user_id,
+            message=f"{'🎉' if success else '💦'}账户 {plan.account.display_name}"
+                    f"\n- {plan.good.general_name}"
+                    f"\n- {result_text}",
+            priority=MessagePriority.HIGH
+        )
+
+    if user := await PluginDataManager.get_user_async(user_id):
+        try:
+            user.exchange_plans.remove(plan)
+        except KeyError:
+            pass
+        else:
+            PluginDataManager.write_plugin_data(user_id)
+
+
+@scheduler.scheduled_job("interval",
+                         minutes=plugin_config.preference.good_catalogue_interval,
+                         id="good_catalogue_refresh")
+async def refresh_good_catalogue():
+    """
+    定时更新商品目录
+    """
+    await GoodCatalogue.refresh()
+
+
+@_driver.on_startup
+async def _():
+    """
+    启动机器人时加载商品目录
+    """
+    await GoodCatalogue.ensure_loaded()
+
+
 @_driver.on_startup
 async def _():
     """
     启动机器人时自动初始化兑换任务
     """
-    for user_id, user in PluginDataManager.plugin_data.users.items():
-        plans = user.exchange_plans
-        for plan in plans:
+    async for user_id, user in iter_unique_users():
+        for plan in list(user.exchange_plans):
             good_detail_status, good = await get_good_detail(plan.good)
             if not good_detail_status or not good.time or good.time < time.time():
                 # 若商品不存在则删除
                 # 若重启时兑换超时则删除该兑换
                 user.exchange_plans.remove(plan)
-                PluginDataManager.write_plugin_data()
+                PluginDataManager.write_plugin_data(user_id)
                 continue
             else:
-                finished.setdefault(plan, [])
-                for i in range(plugin_config.preference.exchange_thread_count):
-                    scheduler.add_job(
-                        exchange_begin,
-                        "date",
-                        id=f"exchange-plan-{hash(plan)}-{i}",
-                        replace_existing=True,
-                        args=(plan,),
-                        run_date=datetime.fromtimestamp(good.time),
-                        max_instances=plugin_config.preference.exchange_thread_count
-                    )
+                schedule_exchange(plan, user_id)
 
 
-def image_process(game: str, _lock: Lock = None):
+IMAGE_SUFFIXES = {"JPEG": ".jpg", "WEBP": ".webp"}
+"""商品列表图片格式对应的文件后缀"""
+
+
+def _partition_pages(date: str, game: str) -> List[Path]:
+    """
+    获取某分区在某日生成的商品列表图片（按页码排序）
+
+    :param date: 日期（%m-%d）
+    :param game: 游戏名
+    """
+    pages = []
+    for path in plugin_config.good_list_image_config.SAVE_PATH.glob(f"{date}-{game}-p*"):
+        if path.suffix not in IMAGE_SUFFIXES.values():
+            continue
+        try:
+            pages.append((int(path.stem.rsplit("-p", 1)[1]), path))
+        except ValueError:
+            continue
+    return [path for _, path in sorted(pages)]
+
+
+def _remove_partition_images(game: str, keep: Iterable[Path] = ()):
     """
-    生成并保存图片的进程函数
+    删除某分区已生成的商品列表图片及其指纹文件
 
     :param game: 游戏名
-    :param _lock: 进程锁
+    :param keep: 需要保留的文件
+    """
+    keep = set(keep)
+    save_path = plugin_config.good_list_image_config.SAVE_PATH
+    for pattern in f"??-??-{game}-p*", f"??-??-{game}.fingerprint", f"??-??-{game}.jpg":
+        for path in save_path.glob(pattern):
+            if path in keep:
+                continue
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+
+async def image_process(game: str, good_list: Optional[List[Good]] = None, executor: Optional[Executor] = None):
+    """
+    生成并保存某分区的商品列表图片
+
+    图片按 ``{日期}-{游戏名}-p{页码}`` 命名，商品列表的指纹保存在 ``{日期}-{游戏名}.fingerprint``
+
+    :param game: 游戏名
+    :param good_list: 该分区的商品信息列表（来自商品目录），为空则重新获取
+    :param executor: 合成图片所用的线程池/进程池
     :return: 生成成功或无商品返回True，否则返回False
     """
-    loop = asyncio.new_event_loop()
-    good_list_status, good_list = loop.run_until_complete(get_good_list(game))
-    if not good_list_status:
-        logger.error(f"{plugin_config.preference.log_head}获取 {game} 分区的商品列表失败，跳过该分区的商品图片生成")
-        return False
-    good_list = list(filter(lambda x: not x.time_end and x.time_limited, good_list))
-    if good_list:
-        logger.info(f"{plugin_config.preference.log_head}正在生成 {game} 分区的商品列表图片")
-        image_bytes = loop.run_until_complete(game_list_to_image(good_list, _lock))
-        if not image_bytes:
+    if good_list is None:
+        good_list_status, good_list = await get_good_list(game)
+        if not good_list_status:
+            logger.error(f"{plugin_config.preference.log_head}获取 {game} 分区的商品列表失败，跳过该分区的商品图片生成")
             return False
-        date = time.strftime('%m-%d', time.localtime())
-        path = plugin_config.good_list_image_config.SAVE_PATH / f"{date}-{game}.jpg"
-        with open(path, 'wb') as f:
-            f.write(image_bytes)
-        logger.info(f"{plugin_config.preference.log_head}已完成 {game} 分区的商品列表图片生成")
-    else:
+    good_list = list(filter(lambda x: not x.time_end and x.time_limited, good_list))
+    save_path = plugin_config.good_list_image_config.SAVE_PATH
+    date = time.strftime('%m-%d', time.localtime())
+    fingerprint_path = save_path / f"{date}-{game}.fingerprint"
+    if not good_list:
+        _remove_partition_images(game)
         logger.info(f"{plugin_config.preference.log_head}{game}分区暂时没有可兑换的限时商品，跳过该分区的商品图片生成")
+        return True
+
+    fingerprint = good_list_fingerprint(good_list)
+    old_fingerprint_paths = sorted(save_path.glob(f"??-??-{game}.fingerprint"),
+                                   key=lambda x: x.stat().st_mtime, reverse=True)
+    for old_fingerprint_path in old_fingerprint_paths:
+        old_date = old_fingerprint_path.name[:5]
+        try:
+            old_fingerprint = old_fingerprint_path.read_text()
+        except OSError:
+            continue
+        if old_fingerprint != fingerprint or not (old_pages := _partition_pages(old_date, game)):
+            continue
+        # 商品列表没有变化，沿用原有图片，只更新文件名中的日期
+        pages = [save_path / f"{date}-{game}-p{index}{old_page.suffix}"
+                 for index, old_page in enumerate(old_pages, 1)]
+        if old_date != date:
+            for old_page, page in zip(old_pages, pages):
+                os.replace(old_page, page)
+            os.replace(old_fingerprint_path, fingerprint_path)
+        _remove_partition_images(game, keep=[*pages, fingerprint_path])
+        logger.info(f"{plugin_config.preference.log_head}{game} 分区的商品列表没有变化，无需重新生成图片")
+        return True
+
+    logger.info(f"{plugin_config.preference.log_head}正在生成 {game} 分区的商品列表图片")
+    pages_bytes = await game_list_to_image(good_list, executor)
+    if not pages_bytes:
+        return False
+    suffix = IMAGE_SUFFIXES[plugin_config.good_list_image_config.IMAGE_FORMAT]
+    pages = []
+    for index, image_bytes in enumerate(pages_bytes, 1):
+        path = save_path / f"{date}-{game}-p{index}{suffix}"
+        # 先写入临时文件，避免用户查询时读到不完整的图片
+        temp_path = path.with_suffix(".tmp")
+        with open(temp_path, 'wb') as f:
+            f.write(image_bytes)
+        os.replace(temp_path, path)
+        pages.append(path)
+    fingerprint_path.write_text(fingerprint)
+    _remove_partition_images(game, keep=[*pages, fingerprint_path])
+    logger.info(f"{plugin_config.preference.log_head}已完成 {game} 分区的商品列表图片生成，共 {len(pages)} 张")
     return True
 
 
-def generate_image(is_auto=True, callback: Callable[[bool], Any] = None):
+async def generate_image(is_auto=True) -> bool:
     """
-    生成米游币商品信息图片。该函数会阻塞当前线程
+    生成米游币商品信息图片，应通过 ``GoodImageGenerator`` 调用以避免同时进行多次生成
+
+    每个分区的图片旁保存有商品列表的指纹，只有指纹变化的分区才会重新生成图片，
+    未变化的分区只将原有图片重命名为当日日期。
+    所有网络请求都在当前事件循环中进行，只有图片合成与编码在进程池（``MULTI_PROCESS``）或线程池中进行。
 
     :param is_auto: True为每日自动生成，False为用户手动更新
-    :param callback: 回调函数，参数为生成成功与否
-    """
-    for root, _, files in os.walk(plugin_config.good_list_image_config.SAVE_PATH, topdown=False):
-        for name in files:
-            date = time.strftime('%m-%d', time.localtime())
-            # 若图片开头为当日日期，则退出函数不执行
-            if name.startswith(date):
-                if is_auto:
-                    return
-            # 删除旧图片
-            if name.endswith('.jpg'):
-                os.remove(os.path.join(root, name))
-
-    if plugin_config.good_list_image_config.MULTI_PROCESS:
-        _lock: Lock = Manager().Lock()
-        with Pool() as pool:
-            for game in "bh3", "hk4e", "bh2", "hkrpg", "nxx", "bbs", "nap":
-                pool.apply_async(image_process,
-                                 args=(game, _lock),
-                                 callback=callback)
-            pool.close()
-            pool.join()
-    else:
-        for game in "bh3", "hk4e", "bh2", "hkrpg", "nxx", "bbs", "nap":
-            image_process(game)
+    :return: 是否所有分区都生成成功
+    """
+    logger.info(f"{plugin_config.preference.log_head}开始{'每日自动' if is_auto else '手动'}更新商品列表图片")
+    executor = ImageProcessPool.get_executor() if plugin_config.good_list_image_config.MULTI_PROCESS else None
+    results = await asyncio.gather(
+        *(image_process(game, GoodCatalogue.partition(game), executor) for game in GOOD_PARTITIONS),
+        return_exceptions=True
+    )
+    for game, result in zip(GOOD_PARTITIONS, results):
+        if isinstance(result, BaseException):
+            logger.opt(exception=result).error(f"{plugin_config.preference.log_head}{game} 分区的商品列表图片生成失败")
 
     logger.info(f"{plugin_config.preference.log_head}已完成所有分区的商品列表图片生成")
+    return all(result is True for result in results)
+
+
+class GoodImageGenerator:
+    """
+    商品图片生成协调器
+
+    同一时间最多只进行一次生成（包括更新商品目录），在生成过程中发起的请求（每日自动生成、用户手动更新）
+    不会再启动新的生成，而是共享正在进行的生成的结果。
+    """
+    _task: Optional[asyncio.Task] = None
+    """正在进行的生成任务"""
+
+    @classmethod
+    async def _generate(cls, is_auto: bool) -> bool:
+        await GoodCatalogue.refresh()
+        return await generate_image(is_auto)
+
+    @classmethod
+    def start(cls, is_auto: bool = True) -> Tuple[asyncio.Task, bool]:
+        """
+        开始生成商品图片，若已有正在进行的生成则不再重复启动
+
+        :param is_auto: True为每日自动生成，False为用户手动更新
+        :return: (生成任务（结果为是否所有分区都生成成功）, 是否启动了新的生成)
+        """
+        if cls._task is not None and not cls._task.done():
+            return cls._task, False
+        cls._task = asyncio.create_task(cls._generate(is_auto))
+        cls._task.add_done_callback(cls._on_done)
+        return cls._task, True
+
+    @staticmethod
+    def _on_done(task: asyncio.Task):
+        if not task.cancelled() and task.exception() is not None:
+            logger.opt(exception=task.exception()).error(
+                f"{plugin_config.preference.log_head}商品列表图片生成失败")
+
+    @classmethod
+    async def generate(cls, is_auto: bool = True) -> bool:
+        """
+        生成商品图片并等待完成，若已有正在进行的生成则等待其完成
+
+        :param is_auto: True为每日自动生成，False为用户手动更新
+        :return: 是否所有分区都生成成功
+        """
+        task, _ = cls.start(is_auto)
+        # 调用者被取消时不影响其他等待者
+        return await asyncio.shield(task)
@@ -14,7 +14,7 @@ from nonebot.params import T_State
 
 from ..api.common import get_ltoken_by_stoken, get_cookie_token_by_stoken, get_device_fp, fetch_game_token_qrcode, \
     query_game_token_qrcode, \
-    get_token_by_game_token, get_cookie_token_by_game_token
+    get_token_by_game_token, get_cookie_token_by_game_token, invalidate_game_record_cache
 from ..command.common import CommandRegistry
 from ..model import PluginDataManager, plugin_config, UserAccount, UserData, CommandUsage, BBSCookies, \
     QueryGameTokenQrCodeStatus, GetCookieStatus
@@ -37,7 +37,7 @@ CommandRegistry.set_usage(
 
 @get_cookie.handle()
 async def handle_first_receive(event: Union[GeneralMessageEvent]):
-    user_num = len(set(PluginDataManager.plugin_data.users.values()))  # 由于加入了用户数据绑定功能，可能存在重复的用户数据对象，需要去重
+    user_num = await PluginDataManager.count_users_async()  # 由于加入了用户数据绑定功能，可能存在重复的用户数据对象，需要去重
     if plugin_config.preference.enable_blacklist:
         if event.get_user_id() in read_blacklist():
             await get_cookie.finish("⚠️您已被加入黑名单，无法使用本功能")
@@ -47,8 +47,8 @@ async def handle_first_receive(event: Union[GeneralMessageEvent]):
     if user_num <= plugin_config.preference.max_user or plugin_config.preference.max_user in [-1, 0]:
         # 获取用户数据对象
         user_id = event.get_user_id()
-        PluginDataManager.plugin_data.users.setdefault(user_id, UserData())
-        user = PluginDataManager.plugin_data.users[user_id]
+        if (user := await PluginDataManager.get_user_async(user_id)) is None:
+            user = PluginDataManager.plugin_data.users[user_id] = UserData()
         # 如果是QQ频道，需要记录频道ID
         if isinstance(event, DirectMessageCreateEvent):
             user.qq_guild[user_id] = event.channel_id
@@ -101,7 +101,7 @@ async def handle_first_receive(event: Union[GeneralMessageEvent]):
             if bbs_uid and game_token:
                 cookies = BBSCookies()
                 cookies.bbs_uid = bbs_uid
-                account = PluginDataManager.plugin_data.users[user_id].accounts.get(bbs_uid)
+                account = user.accounts.get(bbs_uid)
                 """当前的账户数据对象"""
                 if not account or not account.cookies:
                     user.accounts.update({
@@ -114,10 +114,12 @@ async def handle_first_receive(event: Union[GeneralMessageEvent]):
                     account = user.accounts[bbs_uid]
                 else:
                     account.cookies.update(cookies)
+                # 账户重新登录后，之前缓存的游戏账户信息可能已经过时
+                invalidate_game_record_cache(bbs_uid)
                 fp_status, account.device_fp = await get_device_fp(device_id)
                 if fp_status:
                     logger.success(f"用户 {bbs_uid} 成功获取 device_fp: {account.device_fp}")
-                PluginDataManager.write_plugin_data()
+                PluginDataManager.write_plugin_data(user_id)
 
                 if login_status:
                     # 3. 通过 GameToken 获取 stoken_v2
@@ -125,7 +127,7 @@ async def handle_first_receive(event: Union[GeneralMessageEvent]):
                     if login_status:
                         logger.success(f"用户 {bbs_uid} 成功获取 stoken_v2: {cookies.stoken_v2}")
                         account.cookies.update(cookies)
-                        PluginDataManager.write_plugin_data()
+                        PluginDataManager.write_plugin_data(user_id)
 
                         if account.cookies.stoken_v2:
                             # 5. 通过 stoken_v2 获取 ltoken
@@ -133,14 +135,14 @@ async def handle_first_receive(event: Union[GeneralMessageEvent]):
                             if login_status:
                                 logger.success(f"用户 {bbs_uid} 成功获取 ltoken: {cookies.ltoken}")
                                 account.cookies.update(cookies)
-                                PluginDataManager.write_plugin_data()
+                                PluginDataManager.write_plugin_data(user_id)
 
                             # 6.1. 通过 stoken_v2 获取 cookie_token
                             login_status, cookies = await get_cookie_token_by_stoken(account.cookies, device_id)
                             if login_status:
                                 logger.success(f"用户 {bbs_uid} 成功获取 cookie_token: {cookies.cookie_token}")
                                 account.cookies.update(cookies)
-                                PluginDataManager.write_plugin_data()
+                                PluginDataManager.write_plugin_data(user_id)
 
                                 logger.success(
                                     f"{plugin_config.preference.log_head}米游社账户 {bbs_uid} 绑定成功")
@@ -151,7 +153,7 @@ async def handle_first_receive(event: Union[GeneralMessageEvent]):
                             if login_status:
                                 logger.success(f"用户 {bbs_uid} 成功获取 cookie_token: {cookies.cookie_token}")
                                 account.cookies.update(cookies)
-                                PluginDataManager.write_plugin_data()
+                                PluginDataManager.write_plugin_data(user_id)
             else:
                 await get_cookie.finish("⚠️获取二维码扫描状态超时，请尝试重新登录")
 
@@ -213,7 +215,7 @@ async def handle_first_receive(event: Union[GeneralMessageEvent], state: T_State
     """
     if isinstance(event, GeneralGroupMessageEvent):
         await output_cookies.finish("⚠️为了保护您的隐私，请私聊进行Cookies导出。")
-    user_account = PluginDataManager.plugin_data.users[event.get_user_id()].accounts
+    user_account = (await PluginDataManager.get_user_async(event.get_user_id())).accounts
     if not user_account:
         await output_cookies.finish(f"⚠️你尚未绑定米游社账户，请先使用『{COMMAND_BEGIN}登录』进行登录")
     elif len(user_account) == 1:
@@ -233,7 +235,7 @@ async def _(event: Union[GeneralPrivateMessageEvent], matcher: Matcher, bbs_uid=
     """
     if bbs_uid == '退出':
         await matcher.finish('🚪已成功退出')
-    user_account = PluginDataManager.plugin_data.users[event.get_user_id()].accounts
+    user_account = (await PluginDataManager.get_user_async(event.get_user_id())).accounts
     if bbs_uid in user_account:
         await output_cookies.finish(json.dumps(user_account[bbs_uid].cookies.dict(cookie_type=True), indent=4))
     else:
@@ -1,6 +1,5 @@
 import asyncio
-import threading
-from typing import Union, Optional, Iterable, Dict
+from typing import Union, Optional, Iterable, List, Tuple
 
 from nonebot import on_command, get_adapters, get_bot
 from nonebot.adapters.onebot.v11 import MessageSegment as OneBotV11MessageSegment, Adapter as OneBotV11Adapter, \
@@ -13,20 +12,20 @@ from nonebot.exception import ActionFailed
 from nonebot.internal.matcher import Matcher
 from nonebot.params import CommandArg
 from nonebot_plugin_apscheduler import scheduler
-from nonebot_plugin_saa import Image
-from pydantic import BaseModel
+from nonebot_plugin_saa import Image, MessageFactory, Text
 
 from ..api import BaseGameSign
-from ..api import BaseMission, get_missions_state
-from ..api.common import genshin_note, get_game_record, starrail_note
+from ..api import BaseMission, MissionPlanner, get_missions_state
+from ..api.common import genshin_note, get_game_record, get_game_list, starrail_note
 from ..api.weibo import WeiboCode, WeiboSign
 from ..command.common import CommandRegistry
-from ..command.exchange import generate_image
-from ..model import (MissionStatus, PluginDataManager, plugin_config, UserData, CommandUsage, GenshinNoteNotice,
-                     StarRailNoteNotice)
-from ..utils import get_file, logger, COMMAND_BEGIN, GeneralMessageEvent, GeneralGroupMessageEvent, \
-    send_private_msg, get_all_bind, \
-    get_unique_users, get_validate, read_admin_list
+from ..command.exchange import GoodImageGenerator
+from ..model import (PluginDataManager, plugin_config, UserData, CommandUsage, UserAccount, BaseApiStatus,
+                     GenshinNote, GenshinNoteStatus, StarRailNote, StarRailNoteStatus, NoteNoticeStore)
+from ..utils import get_file, prune_file_cache, logger, COMMAND_BEGIN, GeneralMessageEvent, GeneralGroupMessageEvent, \
+    NotificationOutbox, MessagePriority, get_all_bind, \
+    iter_unique_users, get_validate, read_admin_list, AccountLimiter, NotePollScheduler, \
+    NotePollKey, predict_genshin_note_delay, predict_starrail_note_delay
 
 __all__ = [
     "manually_game_sign", "manually_bbs_sign", "manually_genshin_note_check",
@@ -52,7 +51,7 @@ async def _(event: Union[GeneralMessageEvent], matcher: Matcher, command_arg=Com
     bot = get_bot()
     user_id = event.get_user_id()
     msgs_list = []
-    user = PluginDataManager.plugin_data.users.get(user_id)
+    user = await PluginDataManager.get_user_async(user_id)
     if not user or not user.accounts:
         await manually_game_sign.finish(f"⚠️你尚未绑定米游社账户，请先使用『{COMMAND_BEGIN}登录』进行登录", at_sender=True)
     if command_arg:
@@ -62,17 +61,18 @@ async def _(event: Union[GeneralMessageEvent], matcher: Matcher, command_arg=Com
             else:
                 if specified_user_id == "*":
                     await manually_game_sign.send("⏳开始为所有用户执行游戏签到...")
-                    for user_id_, user_ in get_unique_users():
+                    async for user_id_, user_ in iter_unique_users():
                         await msgs_list.append(f"⏳开始为用户 {user_id_} 执行游戏签到...")
                         await perform_game_sign(
                             bot=bot,
                             user=user_,
                             user_ids=[],
+                            user_id=user_id_,
                             matcher=matcher,
                             event=event
                         )
                 else:
-                    specified_user = PluginDataManager.plugin_data.users.get(specified_user_id)
+                    specified_user = await PluginDataManager.get_user_async(specified_user_id)
                     if not specified_user:
                         await manually_game_sign.finish(f"⚠️未找到用户 {specified_user_id}", at_sender=True)
                     await msgs_list.append(f"⏳开始为用户 {specified_user_id} 执行游戏签到...")
@@ -80,12 +80,14 @@ async def _(event: Union[GeneralMessageEvent], matcher: Matcher, command_arg=Com
                         bot=bot,
                         user=specified_user,
                         user_ids=[],
+                        user_id=specified_user_id,
                         matcher=matcher,
                         event=event
                     )
     else:
         msgs_list.append("⏳开始游戏签到...")
-        await perform_game_sign(bot=bot, user=user, user_ids=[user_id], matcher=matcher, event=event, msgs_list=msgs_list)
+        await perform_game_sign(bot=bot, user=user, user_ids=[user_id], matcher=matcher, event=event, msgs_list=msgs_list,
+                                user_id=user_id)
 
 
 manually_bbs_sign = on_command(plugin_config.preference.command_start + '任务', priority=5, block=True)
@@ -106,7 +108,7 @@ async def _(event: Union[GeneralMessageEvent], matcher: Matcher, command_arg=Com
     """
     bot = get_bot()
     user_id = event.get_user_id()
-    user = PluginDataManager.plugin_data.users.get(user_id)
+    user = await PluginDataManager.get_user_async(user_id)
     msgs_list = []
     if not user or not user.accounts:
         await manually_bbs_sign.finish(f"⚠️你尚未绑定米游社账户，请先使用『{COMMAND_BEGIN}登录』进行登录", at_sender=True)
@@ -117,39 +119,31 @@ async def _(event: Union[GeneralMessageEvent], matcher: Matcher, command_arg=Com
             else:
                 if specified_user_id == "*":
                     await msgs_list.append("⏳开始为所有用户执行米游币任务...")
-                    for user_id_, user_ in get_unique_users():
+                    async for user_id_, user_ in iter_unique_users():
                         await msgs_list.append(f"⏳开始为用户 {user_id_} 执行米游币任务...")
                         await perform_bbs_sign(
                             user=user_,
                             user_ids=[],
+                            user_id=user_id_,
                             matcher=matcher
                         )
                 else:
-                    specified_user = PluginDataManager.plugin_data.users.get(specified_user_id)
+                    specified_user = await PluginDataManager.get_user_async(specified_user_id)
                     if not specified_user:
                         await manually_bbs_sign.finish(f"⚠️未找到用户 {specified_user_id}")
                     await msgs_list.append(f"⏳开始为用户 {specified_user_id} 执行米游币任务...")
                     await perform_bbs_sign(
                         user=specified_user,
                         user_ids=[],
+                        user_id=specified_user_id,
                         matcher=matcher
                     )
     else:
         msgs_list.append("⏳开始执行米游币任务...")
-        await perform_bbs_sign(bot=bot, user=user, user_ids=[user_id], matcher=matcher, event=event, msgs_list=msgs_list)
+        await perform_bbs_sign(bot=bot, user=user, user_ids=[user_id], matcher=matcher, event=event, msgs_list=msgs_list,
+                               user_id=user_id)
 
 
-class NoteNoticeStatus(BaseModel):
-    """
-    账号便笺通知状态
-    """
-    genshin = GenshinNoteNotice()
-    starrail = StarRailNoteNotice()
-
-
-note_notice_status: Dict[str, NoteNoticeStatus] = {}
-"""记录账号对应的便笺通知状态"""
-
 manually_genshin_note_check = on_command(
     plugin_config.preference.command_start + '原神便笺',
     aliases={
@@ -176,7 +170,7 @@ async def _(event: Union[GeneralMessageEvent], matcher: Matcher):
     手动查看原神便笺
     """
     user_id = event.get_user_id()
-    user = PluginDataManager.plugin_data.users.get(user_id)
+    user = await PluginDataManager.get_user_async(user_id)
     if not user or not user.accounts:
         await manually_game_sign.finish(f"⚠️你尚未绑定米游社账户，请先使用『{COMMAND_BEGIN}登录』进行登录")
     await genshin_note_check(user=user, user_ids=[user_id], matcher=matcher)
@@ -207,7 +201,7 @@ async def _(event: Union[GeneralMessageEvent], matcher: Matcher):
     手动查看星穹铁道便笺（sr）
     """
     user_id = event.get_user_id()
-    user = PluginDataManager.plugin_data.users.get(user_id)
+    user = await PluginDataManager.get_user_async(user_id)
     if not user or not user.accounts:
         await manually_game_sign.finish(f"⚠️你尚未绑定米游社账户，请先使用『{COMMAND_BEGIN}登录』进行登录")
     await starrail_note_check(user=user, user_ids=[user_id], matcher=matcher)
@@ -219,13 +213,15 @@ async def perform_game_sign(
         matcher: Matcher = None,
         bot: Optional[Bot] = None ,
         event: Union[GeneralMessageEvent] = None ,
-        msgs_list = None
+        msgs_list = None,
+        user_id: Optional[str] = None
 ):
     """
     执行游戏签到函数，并发送给用户签到消息。
 
     :param user: 用户数据
     :param user_ids: 发送通知的所有用户ID
+    :param user_id: 用户数据对应的用户ID，用于只写入该用户的数据
     :param matcher: 事件响应器
     :param event: 事件
     """
@@ -234,140 +230,172 @@ async def perform_game_sign(
         # 自动签到时，要求用户打开了签到功能；手动签到时都可以调用执行。
         if not matcher and not account.enable_game_sign:
             continue
-        signed = False
-        """是否已经完成过签到"""
-        game_record_status, records = await get_game_record(account)
-        if not game_record_status:
-            if matcher:
-                msgs_list.append(f"⚠️账户 {account.display_name} 获取游戏账号信息失败，请重新尝试")
-            else:
-                for user_id in user_ids:
-                    await send_private_msg(
-                        user_id=user_id,
-                        message=f"⚠️账户 {account.display_name} 获取游戏账号信息失败，请重新尝试"
-                    )
-            continue
-        games_has_record = []
-        
-        for class_type in BaseGameSign.available_game_signs:
-            signer = class_type(account, records)
-            if not signer.has_record:
-                continue
-            else:
-                games_has_record.append(signer)
-                if class_type.en_name not in account.game_sign_games:
-                    continue
-            get_info_status, info = await signer.get_info(account.platform)
-            if not get_info_status:
+        async with AccountLimiter.account(account, concurrent=not matcher):
+            game_record_status, records = await get_game_record(account)
+            if not game_record_status:
                 if matcher:
-                    msgs_list.append(f"⚠️账户 {account.display_name} 获取签到记录失败")
+                    msgs_list.append(f"⚠️账户 {account.display_name} 获取游戏账号信息失败，请重新尝试")
                 else:
-                    for user_id in user_ids:
-                        await send_private_msg(
-                            user_id=user_id,
-                            message=f"⚠️账户 {account.display_name} 获取签到记录失败"
+                    for notify_id in user_ids:
+                        NotificationOutbox.put(
+                            user_id=notify_id,
+                            message=f"⚠️账户 {account.display_name} 获取游戏账号信息失败，请重新尝试"
                         )
-            else:
-                signed = info.is_sign
-
-            # 若没签到，则进行签到功能；若获取今日签到情况失败，仍可继续
-            if (get_info_status and not info.is_sign) or not get_info_status:
-                sign_status, mmt_data = await signer.sign(account.platform)
-                if sign_status.need_verify:
-                    if plugin_config.preference.geetest_url or user.geetest_url:
-                        for i in range(3):
-                            if matcher:
-                                msgs_list.append(f"⏳[验证码{i}] 正在尝试完成人机验证，请稍后...")
-                            if not (geetest_result := await get_validate(user, mmt_data.gt, mmt_data.challenge)):
-                                continue # 如果没有获取到validate不进行签到，直接重试
-                            sign_status, mmt_data = await signer.sign(account.platform, mmt_data, geetest_result)
-                            if sign_status:
-                                break
-
-                if not sign_status and (user.enable_notice or matcher):
-                    if sign_status.login_expired:
-                        message = f"⚠️账户 {account.display_name} 🎮『{signer.name}』签到时服务器返回登录失效，请尝试重新登录绑定账户"
-                    elif sign_status.need_verify:
-                        message = (f"⚠️账户 {account.display_name} 🎮『{signer.name}』签到时可能遇到验证码拦截，"
-                                   "请尝试使用命令『/账号设置』更改设备平台，若仍失败请手动前往米游社签到")
-                    else:
-                        message = f"⚠️账户 {account.display_name} 🎮『{signer.name}』签到失败，请稍后再试"
-                    if matcher:
-                        msgs_list.append(message)
-                    elif user.enable_notice:
-                        for user_id in user_ids:
-                            await send_private_msg(user_id=user_id, message=message)
-                    await asyncio.sleep(plugin_config.preference.sleep_time)
+                continue
+            games_has_record = []
+            signers = []
+            for class_type in BaseGameSign.available_game_signs:
+                signer = class_type(account, records)
+                if not signer.has_record:
                     continue
-
-                await asyncio.sleep(plugin_config.preference.sleep_time)
-
-            # 用户打开通知或手动签到时，进行通知
-            if user.enable_notice or matcher:
-                onebot_img_msg, saa_img, qq_guild_img_msg = "", "", ""
-                get_info_status, info = await signer.get_info(account.platform)
-                get_award_status, awards = await signer.get_rewards()
-                if not get_info_status or not get_award_status:
-                    msg = f"⚠️账户 {account.display_name} 🎮『{signer.name}』获取签到结果失败！请手动前往米游社查看"
+                games_has_record.append(signer)
+                if class_type.en_name in account.game_sign_games:
+                    signers.append(signer)
+
+            # 同一账户的各游戏并发签到，每个游戏（act_id）各自按冷却时间控制请求节奏
+            results = await asyncio.gather(
+                *(_sign_one_game(user, account, signer, notice=bool(user.enable_notice or matcher))
+                  for signer in signers),
+                return_exceptions=True
+            )
+            reports: List[Tuple[str, Optional[bytes]]] = []
+            """合并后的签到结果 [(消息文本, 奖励图标)]"""
+            for signer, result in zip(signers, results):
+                if isinstance(result, Exception):
+                    logger.opt(exception=result).error(
+                        f"{plugin_config.preference.log_head}账户 {account.display_name} 『{signer.name}』签到执行失败")
+                    if user.enable_notice or matcher:
+                        reports.append((f"⚠️账户 {account.display_name} 🎮『{signer.name}』签到失败，请稍后再试", None))
                 else:
-                    award = awards[info.total_sign_day - 1]
-                    if info.is_sign:
-                        status = "签到成功！" if not signed else "已经签到过了"
-                        msg = f"🪪账户 {account.display_name}" \
-                              f"\n🎮『{signer.name}』" \
-                              f"\n🎮状态: {status}" \
-                              f"\n{signer.record.nickname}·{signer.record.level}" \
-                              "\n\n🎁今日签到奖励：" \
-                              f"\n{award.name} * {award.cnt}" \
-                              f"\n\n📅本月签到次数：{info.total_sign_day}"
-                        img_file = await get_file(award.icon)
-                        onebot_img_msg = OneBotV11MessageSegment.image(img_file)
-                        saa_img = Image(img_file)
-                        qq_guild_img_msg = QQGuildMessageSegment.file_image(img_file)
-                    else:
-                        msg = (f"⚠️账户 {account.display_name} 🎮『{signer.name}』签到失败！请尝试重新签到，"
-                               "若多次失败请尝试重新登录绑定账户")
+                    reports.extend(result)
+
+            if reports:
                 if matcher:
-                    try:
-                        if isinstance(event, OneBotV11MessageEvent):
-                            msgs_list.append(msg + onebot_img_msg)
-                        elif isinstance(event, QQGuildMessageEvent):
-                            await matcher.send(msg)
-                            await matcher.send(qq_guild_img_msg)
-                    except (ActionFailed, AuditException):
-                        pass
+                    for msg, img_file in reports:
+                        try:
+                            if isinstance(event, OneBotV11MessageEvent):
+                                msgs_list.append(msg + OneBotV11MessageSegment.image(img_file) if img_file else msg)
+                            elif isinstance(event, QQGuildMessageEvent):
+                                await matcher.send(msg)
+                                if img_file:
+                                    await matcher.send(QQGuildMessageSegment.file_image(img_file))
+                        except (ActionFailed, AuditException):
+                            pass
                 else:
+                    # 将该账户各游戏的签到结果合并为一条消息发送
+                    segments = []
+                    for index, (msg, img_file) in enumerate(reports):
+                        segments.append(Text(f"\n\n{msg}" if index else msg))
+                        if img_file:
+                            segments.append(Image(img_file))
+                    merged_text = "\n\n".join(msg for msg, _ in reports)
                     for adapter in get_adapters().values():
                         if isinstance(adapter, OneBotV11Adapter):
-                            for user_id in user_ids:
-                                await send_private_msg(use=adapter, user_id=user_id, message=msg + saa_img)
+                            for notify_id in user_ids:
+                                NotificationOutbox.put(use=adapter, user_id=notify_id, message=MessageFactory(segments))
                         elif isinstance(adapter, QQGuildAdapter):
-                            for user_id in user_ids:
-                                await send_private_msg(use=adapter, user_id=user_id, message=msg)
-                                await send_private_msg(use=adapter, user_id=user_id, message=qq_guild_img_msg)
-            await asyncio.sleep(plugin_config.preference.sleep_time)
-        
-        if msgs_list:
-            if isinstance(event, OneBotV11GroupMessageEvent):   #在群聊触发游戏签到将使用合并消息
-                await send_qqGroup(bot, event, msgs_list)
-            else:
-                for msg in msgs_list:
-                    await matcher.send(msg)
+                            for notify_id in user_ids:
+                                NotificationOutbox.put(use=adapter, user_id=notify_id, message=merged_text)
+                                for _, img_file in reports:
+                                    if img_file:
+                                        NotificationOutbox.put(use=adapter, user_id=notify_id,
+                                                               message=QQGuildMessageSegment.file_image(img_file))
+
+            if msgs_list:
+                if isinstance(event, OneBotV11GroupMessageEvent):   #在群聊触发游戏签到将使用合并消息
+                    await send_qqGroup(bot, event, msgs_list)
+                else:
+                    for msg in msgs_list:
+                        await matcher.send(msg)
 
-        if not games_has_record:
-            if matcher:
-                await matcher.send(f"⚠️您的米游社账户 {account.display_name} 下不存在任何游戏账号，已跳过签到")
-            else:
-                for user_id in user_ids:
-                    await send_private_msg(
-                        user_id=user_id,
-                        message=f"⚠️您的米游社账户 {account.display_name} 下不存在任何游戏账号，已跳过签到"
-                    )
+            if not games_has_record:
+                if matcher:
+                    await matcher.send(f"⚠️您的米游社账户 {account.display_name} 下不存在任何游戏账号，已跳过签到")
+                else:
+                    for notify_id in user_ids:
+                        NotificationOutbox.put(
+                            user_id=notify_id,
+                            message=f"⚠️您的米游社账户 {account.display_name} 下不存在任何游戏账号，已跳过签到"
+                        )
 
     # 如果全部登录失效，则关闭通知
     if len(failed_accounts) == len(user.accounts):
         user.enable_notice = False
-        PluginDataManager.write_plugin_data()
+        PluginDataManager.write_plugin_data(user_id)
+
+
+async def _sign_one_game(
+        user: UserData,
+        account: UserAccount,
+        signer: BaseGameSign,
+        notice: bool
+) -> List[Tuple[str, Optional[bytes]]]:
+    """
+    执行账户下某个游戏的签到，返回需要通知用户的签到结果
+
+    :param user: 用户数据
+    :param account: 米游社账户
+    :param signer: 该游戏的签到对象
+    :param notice: 是否需要生成签到结果通知
+    :return: [(消息文本, 奖励图标)]
+    """
+    reports: List[Tuple[str, Optional[bytes]]] = []
+    signed = False
+    """是否已经完成过签到"""
+    get_info_status, info = await signer.get_info(account.platform)
+    if not get_info_status:
+        reports.append((f"⚠️账户 {account.display_name} 获取签到记录失败", None))
+    else:
+        signed = info.is_sign
+
+    # 若没签到，则进行签到功能；若获取今日签到情况失败，仍可继续
+    if (get_info_status and not info.is_sign) or not get_info_status:
+        sign_status, mmt_data = await signer.sign(account.platform)
+        if sign_status.need_verify:
+            if plugin_config.preference.geetest_url or user.geetest_url:
+                for _ in range(3):
+                    if not (geetest_result := await get_validate(user, mmt_data.gt, mmt_data.challenge)):
+                        continue  # 如果没有获取到validate不进行签到，直接重试
+                    sign_status, mmt_data = await signer.sign(account.platform, mmt_data, geetest_result)
+                    if sign_status:
+                        break
+
+        if not sign_status:
+            if notice:
+                if sign_status.login_expired:
+                    message = f"⚠️账户 {account.display_name} 🎮『{signer.name}』签到时服务器返回登录失效，请尝试重新登录绑定账户"
+                elif sign_status.need_verify:
+                    message = (f"⚠️账户 {account.display_name} 🎮『{signer.name}』签到时可能遇到验证码拦截，"
+                               "请尝试使用命令『/账号设置』更改设备平台，若仍失败请手动前往米游社签到")
+                else:
+                    message = f"⚠️账户 {account.display_name} 🎮『{signer.name}』签到失败，请稍后再试"
+                reports.append((message, None))
+            return reports
+
+        await asyncio.sleep(plugin_config.preference.sleep_time)
+
+    # 用户打开通知或手动签到时，进行通知
+    if notice:
+        get_info_status, info = await signer.get_info(account.platform)
+        get_award_status, awards = await signer.get_rewards()
+        if not get_info_status or not get_award_status:
+            reports.append(
+                (f"⚠️账户 {account.display_name} 🎮『{signer.name}』获取签到结果失败！请手动前往米游社查看", None))
+        elif info.is_sign:
+            award = awards[info.total_sign_day - 1]
+            status = "签到成功！" if not signed else "已经签到过了"
+            msg = f"🪪账户 {account.display_name}" \
+                  f"\n🎮『{signer.name}』" \
+                  f"\n🎮状态: {status}" \
+                  f"\n{signer.record.nickname}·{signer.record.level}" \
+                  "\n\n🎁今日签到奖励：" \
+                  f"\n{award.name} * {award.cnt}" \
+                  f"\n\n📅本月签到次数：{info.total_sign_day}"
+            reports.append((msg, await get_file(award.icon, use_cache=True)))
+        else:
+            reports.append((f"⚠️账户 {account.display_name} 🎮『{signer.name}』签到失败！请尝试重新签到，"
+                            "若多次失败请尝试重新登录绑定账户", None))
+    return reports
 
 
 async def perform_bbs_sign(
@@ -376,12 +404,14 @@ async def perform_bbs_sign(
         matcher: Matcher = None, 
         bot: Optional[Bot] = None ,
         event: Union[GeneralMessageEvent] = None ,
-        msgs_list = None):
+        msgs_list = None,
+        user_id: Optional[str] = None):
     """
     执行米游币任务函数，并发送给用户任务执行消息。
 
     :param user: 用户数据
     :param user_ids: 发送通知的所有用户ID
+    :param user_id: 用户数据对应的用户ID，用于只写入该用户的数据
     :param matcher: 事件响应器
     """
     failed_accounts = []
@@ -390,135 +420,144 @@ async def perform_bbs_sign(
         if not matcher and not account.enable_mission:
             continue
 
-        missions_state_status, missions_state = await get_missions_state(account)
-        if not missions_state_status:
-            if missions_state_status.login_expired:
-                if matcher:
-                    await matcher.send(f'⚠️账户 {account.display_name} 登录失效，请重新登录', at_sender=True)
-                else:
-                    for user_id in user_ids:
-                        await send_private_msg(
-                            user_id=user_id,
-                            message=f'⚠️账户 {account.display_name} 登录失效，请重新登录'
-                        )
-            if matcher:
-                await matcher.send(f'⚠️账户 {account.display_name} 获取任务完成情况请求失败，你可以手动前往App查看', at_sender=True)
-            else:
-                for user_id in user_ids:
-                    await send_private_msg(
-                        user_id=user_id,
-                        message=f'⚠️账户 {account.display_name} 获取任务完成情况请求失败，你可以手动前往App查看'
-                    )
-            continue
-        myb_before_mission = missions_state.current_myb
-
-        # 在此处进行判断。因为如果在多个分区执行任务，会在完成之前就已经达成米游币任务目标，导致其他分区任务不会执行。
-        finished = all(current == mission.threshold for mission, current in missions_state.state_dict.values())
-        if not finished:
-            if not account.mission_games:
-                msgs_list.append(
-                    f'⚠️🆔账户 {account.display_name} 未设置米游币任务目标分区，将跳过执行')
-            for class_name in account.mission_games:
-                class_type = BaseMission.available_games.get(class_name)
-                if not class_type:
-                    if matcher:
-                        msgs_list.append(
-                            f'⚠️🆔账户 {account.display_name} 米游币任务目标分区『{class_name}』未找到，将跳过该分区')
-                    continue
-                mission_obj = class_type(account)
-                if matcher:
-                    msgs_list.append(f'🆔账户 {account.display_name} ⏳开始在分区『{class_type.name}』执行米游币任务...')
-
-                # 执行任务
-                sign_status, read_status, like_status, share_status = (
-                    MissionStatus(),
-                    MissionStatus(),
-                    MissionStatus(),
-                    MissionStatus()
-                )
-                sign_points: Optional[int] = None
-                for key_name in missions_state.state_dict:
-                    if key_name == BaseMission.SIGN:
-                        sign_status, sign_points = await mission_obj.sign(user)
-                    elif key_name == BaseMission.VIEW:
-                        read_status = await mission_obj.read()
-                    elif key_name == BaseMission.LIKE:
-                        like_status = await mission_obj.like()
-                    elif key_name == BaseMission.SHARE:
-                        share_status = await mission_obj.share()
-
-                if matcher:
-                    msgs_list.append(
-                        f"🆔账户 {account.display_name} 🎮『{class_type.name}』米游币任务执行情况：\n"
-                        f"📅签到：{'✓' if sign_status else '✕'} +{sign_points or '0'} 米游币🪙\n"
-                        f"📰阅读：{'✓' if read_status else '✕'}\n"
-                        f"❤️点赞：{'✓' if like_status else '✕'}\n"
-                        f"↗️分享：{'✓' if share_status else '✕'}"
-                    )
+        async with AccountLimiter.account(account, concurrent=not matcher):
 
-        # 用户打开通知或手动任务时，进行通知
-        if user.enable_notice or matcher:
             missions_state_status, missions_state = await get_missions_state(account)
             if not missions_state_status:
                 if missions_state_status.login_expired:
                     if matcher:
-                        msgs_list.append(f'⚠️账户 {account.display_name} 登录失效，请重新登录')
+                        await matcher.send(f'⚠️账户 {account.display_name} 登录失效，请重新登录', at_sender=True)
                     else:
-                        for user_id in user_ids:
-                            await send_private_msg(
-                                user_id=user_id,
+                        for notify_id in user_ids:
+                            NotificationOutbox.put(
+                                user_id=notify_id,
                                 message=f'⚠️账户 {account.display_name} 登录失效，请重新登录'
                             )
-                    continue
                 if matcher:
-                    msgs_list.append(
-                        f'⚠️账户 {account.display_name} 获取任务完成情况请求失败，你可以手动前往App查看')
+                    await matcher.send(f'⚠️账户 {account.display_name} 获取任务完成情况请求失败，你可以手动前往App查看', at_sender=True)
                 else:
-                    for user_id in user_ids:
-                        await send_private_msg(
-                            user_id=user_id,
+                    for notify_id in user_ids:
+                        NotificationOutbox.put(
+                            user_id=notify_id,
                             message=f'⚠️账户 {account.display_name} 获取任务完成情况请求失败，你可以手动前往App查看'
                         )
                 continue
-            if all(current == mission.threshold for mission, current in missions_state.state_dict.values()):
-                notice_string = "🎉已完成今日米游币任务"
-            else:
-                notice_string = "⚠️今日米游币任务未全部完成"
-
-            msg = f"{notice_string}" \
-                  f"\n🆔账户 {account.display_name}"
-            for key_name, (mission, current) in missions_state.state_dict.items():
-                if key_name == BaseMission.SIGN:
-                    mission_name = "📅签到"
-                elif key_name == BaseMission.VIEW:
-                    mission_name = "📰阅读"
-                elif key_name == BaseMission.LIKE:
-                    mission_name = "❤️点赞"
-                elif key_name == BaseMission.SHARE:
-                    mission_name = "↗️分享"
+            myb_before_mission = missions_state.current_myb
+
+            # 根据当前进度规划各分区需要执行的任务次数，已完成的任务不再执行
+            planner = MissionPlanner(missions_state)
+            if not planner.finished:
+                if not account.mission_games and matcher:
+                    msgs_list.append(
+                        f'⚠️🆔账户 {account.display_name} 未设置米游币任务目标分区，将跳过执行')
+                class_types = []
+                for class_name in account.mission_games:
+                    class_type = BaseMission.available_games.get(class_name)
+                    if not class_type:
+                        if matcher:
+                            msgs_list.append(
+                                f'⚠️🆔账户 {account.display_name} 米游币任务目标分区『{class_name}』未找到，将跳过该分区')
+                        continue
+                    class_types.append(class_type)
+
+                for index, class_type in enumerate(class_types):
+                    forum_plan = planner.next_forum(len(class_types) - index)
+                    if not forum_plan:
+                        break
+                    mission_obj = class_type(account)
+                    if matcher:
+                        msgs_list.append(f'🆔账户 {account.display_name} ⏳开始在分区『{class_type.name}』执行米游币任务...')
+
+                    # 执行任务
+                    report_lines = []
+                    for key_name, times in forum_plan.items():
+                        if key_name == BaseMission.SIGN:
+                            sign_status, sign_points = await mission_obj.sign(user)
+                            planner.report(key_name, times, sign_status)
+                            report_lines.append(
+                                f"📅签到：{'✓' if sign_status else '✕'} +{sign_points or '0'} 米游币🪙")
+                        elif key_name == BaseMission.VIEW:
+                            read_status = await mission_obj.read(times)
+                            planner.report(key_name, times, read_status)
+                            report_lines.append(f"📰阅读 {times} 次：{'✓' if read_status else '✕'}")
+                        elif key_name == BaseMission.LIKE:
+                            like_status = await mission_obj.like(times)
+                            planner.report(key_name, times, like_status)
+                            report_lines.append(f"❤️点赞 {times} 次：{'✓' if like_status else '✕'}")
+                        elif key_name == BaseMission.SHARE:
+                            share_status = await mission_obj.share()
+                            planner.report(key_name, times, share_status)
+                            report_lines.append(f"↗️分享：{'✓' if share_status else '✕'}")
+
+                    if matcher and report_lines:
+                        msgs_list.append(
+                            f"🆔账户 {account.display_name} 🎮『{class_type.name}』米游币任务执行情况：\n"
+                            + "\n".join(report_lines)
+                        )
+
+            # 用户打开通知或手动任务时，进行通知
+            if user.enable_notice or matcher:
+                missions_state_status, missions_state = await get_missions_state(account)
+                if not missions_state_status:
+                    if missions_state_status.login_expired:
+                        if matcher:
+                            msgs_list.append(f'⚠️账户 {account.display_name} 登录失效，请重新登录')
+                        else:
+                            for notify_id in user_ids:
+                                NotificationOutbox.put(
+                                    user_id=notify_id,
+                                    message=f'⚠️账户 {account.display_name} 登录失效，请重新登录'
+                                )
+                        continue
+                    if matcher:
+                        msgs_list.append(
+                            f'⚠️账户 {account.display_name} 获取任务完成情况请求失败，你可以手动前往App查看')
+                    else:
+                        for notify_id in user_ids:
+                            NotificationOutbox.put(
+                                user_id=notify_id,
+                                message=f'⚠️账户 {account.display_name} 获取任务完成情况请求失败，你可以手动前往App查看'
+                            )
+                    continue
+                if all(current >= mission.threshold for mission, current in missions_state.state_dict.values()):
+                    notice_string = "🎉已完成今日米游币任务"
                 else:
-                    mission_name = mission.mission_key
-                msg += f"\n{mission_name}：{'✓' if current >= mission.threshold else '✕'}"
-            msg += f"\n🪙获得米游币: {missions_state.current_myb - myb_before_mission}" \
-                   f"\n💰当前米游币: {missions_state.current_myb}"
+                    notice_string = "⚠️今日米游币任务未全部完成"
 
-            if matcher:
-                msgs_list.append(msg)
-            else:
-                for user_id in user_ids:
-                    await send_private_msg(user_id=user_id, message=msg)
+                msg = f"{notice_string}" \
+                      f"\n🆔账户 {account.display_name}"
+                for key_name, (mission, current) in missions_state.state_dict.items():
+                    if key_name == BaseMission.SIGN:
+                        mission_name = "📅签到"
+                    elif key_name == BaseMission.VIEW:
+                        mission_name = "📰阅读"
+                    elif key_name == BaseMission.LIKE:
+                        mission_name = "❤️点赞"
+                    elif key_name == BaseMission.SHARE:
+                        mission_name = "↗️分享"
+                    else:
+                        mission_name = mission.mission_key
+                    msg += f"\n{mission_name}：{'✓' if current >= mission.threshold else '✕'}"
+                msg += f"\n🪙获得米游币: {missions_state.current_myb - myb_before_mission}" \
+                       f"\n💰当前米游币: {missions_state.current_myb}"
+
+                if matcher:
+                    msgs_list.append(msg)
+                else:
+                    for notify_id in user_ids:
+                        NotificationOutbox.put(user_id=notify_id, message=msg)
         
-        if msgs_list:
-            if isinstance(event, OneBotV11GroupMessageEvent):   #在群聊触发游戏签到将使用合并消息
-                await send_qqGroup(bot, event, msgs_list)
-            else:
-                for msg in msgs_list:
-                    await matcher.send(msg)
+            if msgs_list:
+                if isinstance(event, OneBotV11GroupMessageEvent):   #在群聊触发游戏签到将使用合并消息
+                    await send_qqGroup(bot, event, msgs_list)
+                else:
+                    for msg in msgs_list:
+                        await matcher.send(msg)
 
     # 如果全部登录失效，则关闭通知
     if len(failed_accounts) == len(user.accounts):
         user.enable_notice = False
-        PluginDataManager.write_plugin_data()
+        PluginDataManager.write_plugin_data(user_id)
 
 
 async def genshin_note_check(user: UserData, user_ids: Iterable[str], matcher: Matcher = None):
@@ -530,83 +569,105 @@ async def genshin_note_check(user: UserData, user_ids: Iterable[str], matcher: M
     :param matcher: 事件响应器
     """
     for account in user.accounts.values():
-        note_notice_status.setdefault(account.bbs_uid, NoteNoticeStatus())
-        genshin_notice = note_notice_status[account.bbs_uid].genshin
         if (account.enable_resin and 'GenshinImpact' in account.game_sign_games) or matcher:
             genshin_board_status, note = await genshin_note(account)
-            if not genshin_board_status:
-                if matcher:
-                    if genshin_board_status.login_expired:
-                        await matcher.send(f'⚠️账户 {account.display_name} 登录失效，请重新登录')
-                    elif genshin_board_status.no_genshin_account:
-                        await matcher.send(f'⚠️账户 {account.display_name} 没有绑定任何原神账户，请绑定后再重试')
-                    elif genshin_board_status.need_verify:
-                        await matcher.send(f'⚠️账户 {account.display_name} 获取实时便笺时被人机验证阻拦')
-                    await matcher.send(f'⚠️账户 {account.display_name} 获取实时便笺请求失败，你可以手动前往App查看')
-                continue
+            await genshin_note_notice(account, genshin_board_status, note, user_ids, matcher)
 
-            msg = ''
-            # 手动查询体力时，无需判断是否溢出
-            if not matcher:
-                do_notice = False
-                """记录是否需要提醒"""
-                # 体力溢出提醒
-                if note.current_resin >= account.user_resin_threshold:
-                    # 防止重复提醒
-                    if not genshin_notice.current_resin_full:
-                        if note.current_resin == 200:
-                            genshin_notice.current_resin_full = True
-                            msg += '❕您的树脂已经满啦\n'
-                            do_notice = True
-                        elif not genshin_notice.current_resin:
-                            genshin_notice.current_resin_full = False
-                            genshin_notice.current_resin = True
-                            msg += '❕您的树脂已达到提醒阈值\n'
-                            do_notice = True
-                else:
-                    genshin_notice.current_resin = False
-                    genshin_notice.current_resin_full = False
 
-                # 洞天财瓮溢出提醒
-                if note.current_home_coin == note.max_home_coin:
-                    # 防止重复提醒
-                    if not genshin_notice.current_home_coin:
-                        genshin_notice.current_home_coin = True
-                        msg += '❕您的洞天财瓮已经满啦\n'
-                        do_notice = True
-                else:
-                    genshin_notice.current_home_coin = False
-
-                # 参量质变仪就绪提醒
-                if note.transformer:
-                    if note.transformer_text == '已准备就绪':
-                        # 防止重复提醒
-                        if not genshin_notice.transformer:
-                            genshin_notice.transformer = True
-                            msg += '❕您的参量质变仪已准备就绪\n\n'
-                            do_notice = True
-                    else:
-                        genshin_notice.transformer = False
-                else:
-                    genshin_notice.transformer = True
+async def genshin_note_notice(
+        account: UserAccount,
+        genshin_board_status: Union[BaseApiStatus, GenshinNoteStatus],
+        note: Optional[GenshinNote],
+        user_ids: Iterable[str],
+        matcher: Matcher = None
+):
+    """
+    根据已获取的原神实时便笺判断是否需要提醒，并发送给用户。
 
-                if not do_notice:
-                    logger.info(f"原神实时便笺：账户 {account.display_name} 树脂:{note.current_resin},未满足推送条件")
-                    return
-
-            msg += "❖原神·实时便笺❖" \
-                   f"\n🆔账户 {account.display_name}" \
-                   f"\n⏳树脂数量：{note.current_resin} / 200" \
-                   f"\n⏱️树脂{note.resin_recovery_text}" \
-                   f"\n🕰️探索派遣：{note.current_expedition_num} / {note.max_expedition_num}" \
-                   f"\n📅每日委托：{4 - note.finished_task_num} 个任务未完成" \
-                   f"\n💰洞天财瓮：{note.current_home_coin} / {note.max_home_coin}" \
-                   f"\n🎰参量质变仪：{note.transformer_text if note.transformer else 'N/A'}"
-            if matcher:
-                await matcher.send(msg)
+    :param account: 米游社账户
+    :param genshin_board_status: 获取实时便笺的返回状态
+    :param note: 原神实时便笺
+    :param user_ids: 发送通知的所有用户ID
+    :param matcher: 事件响应器
+    """
+    notice_status = await NoteNoticeStore.get_async(account.bbs_uid)
+    genshin_notice = notice_status.genshin
+    if not genshin_board_status:
+        if matcher:
+            if genshin_board_status.login_expired:
+                await matcher.send(f'⚠️账户 {account.display_name} 登录失效，请重新登录')
+            elif genshin_board_status.no_genshin_account:
+                await matcher.send(f'⚠️账户 {account.display_name} 没有绑定任何原神账户，请绑定后再重试')
+            elif genshin_board_status.need_verify:
+                await matcher.send(f'⚠️账户 {account.display_name} 获取实时便笺时被人机验证阻拦')
+            await matcher.send(f'⚠️账户 {account.display_name} 获取实时便笺请求失败，你可以手动前往App查看')
+        return
+
+    msg = ''
+    # 手动查询体力时，无需判断是否溢出
+    if not matcher:
+        notice_before = genshin_notice.dict()
+        do_notice = False
+        """记录是否需要提醒"""
+        # 体力溢出提醒
+        if note.current_resin >= account.user_resin_threshold:
+            # 防止重复提醒
+            if not genshin_notice.current_resin_full:
+                if note.current_resin == 200:
+                    genshin_notice.current_resin_full = True
+                    msg += '❕您的树脂已经满啦\n'
+                    do_notice = True
+                elif not genshin_notice.current_resin:
+                    genshin_notice.current_resin_full = False
+                    genshin_notice.current_resin = True
+                    msg += '❕您的树脂已达到提醒阈值\n'
+                    do_notice = True
+        else:
+            genshin_notice.current_resin = False
+            genshin_notice.current_resin_full = False
+
+        # 洞天财瓮溢出提醒
+        if note.current_home_coin == note.max_home_coin:
+            # 防止重复提醒
+            if not genshin_notice.current_home_coin:
+                genshin_notice.current_home_coin = True
+                msg += '❕您的洞天财瓮已经满啦\n'
+                do_notice = True
+        else:
+            genshin_notice.current_home_coin = False
+
+        # 参量质变仪就绪提醒
+        if note.transformer:
+            if note.transformer_text == '已准备就绪':
+                # 防止重复提醒
+                if not genshin_notice.transformer:
+                    genshin_notice.transformer = True
+                    msg += '❕您的参量质变仪已准备就绪\n\n'
+                    do_notice = True
             else:
-                for user_id in user_ids:
-                    await send_private_msg(user_id=user_id, message=msg)
+                genshin_notice.transformer = False
+        else:
+            genshin_notice.transformer = True
+
+        if genshin_notice.dict() != notice_before:
+            NoteNoticeStore.mark_dirty(account.bbs_uid, notice_status)
+        if not do_notice:
+            logger.info(f"原神实时便笺：账户 {account.display_name} 树脂:{note.current_resin},未满足推送条件")
+            return
+
+    msg += "❖原神·实时便笺❖" \
+           f"\n🆔账户 {account.display_name}" \
+           f"\n⏳树脂数量：{note.current_resin} / 200" \
+           f"\n⏱️树脂{note.resin_recovery_text}" \
+           f"\n🕰️探索派遣：{note.current_expedition_num} / {note.max_expedition_num}" \
+           f"\n📅每日委托：{4 - note.finished_task_num} 个任务未完成" \
+           f"\n💰洞天财瓮：{note.current_home_coin} / {note.max_home_coin}" \
+           f"\n🎰参量质变仪：{note.transformer_text if note.transformer else 'N/A'}"
+    if matcher:
+        await matcher.send(msg)
+    else:
+        for user_id in user_ids:
+            NotificationOutbox.put(user_id=user_id, message=msg, priority=MessagePriority.LOW)
 
 
 async def starrail_note_check(user: UserData, user_ids: Iterable[str], matcher: Matcher = None):
@@ -618,71 +679,94 @@ async def starrail_note_check(user: UserData, user_ids: Iterable[str], matcher:
     :param matcher: 事件响应器
     """
     for account in user.accounts.values():
-        note_notice_status.setdefault(account.bbs_uid, NoteNoticeStatus())
-        starrail_notice = note_notice_status[account.bbs_uid].starrail
         if (account.enable_resin and 'StarRail' in account.game_sign_games) or matcher:
             starrail_board_status, note = await starrail_note(account)
-            if not starrail_board_status:
-                if matcher:
-                    if starrail_board_status.login_expired:
-                        await matcher.send(f'⚠️账户 {account.display_name} 登录失效，请重新登录')
-                    elif starrail_board_status.no_starrail_account:
-                        await matcher.send(f'⚠️账户 {account.display_name} 没有绑定任何星铁账户，请绑定后再重试')
-                    elif starrail_board_status.need_verify:
-                        await matcher.send(f'⚠️账户 {account.display_name} 获取实时便笺时被人机验证阻拦')
-                    await matcher.send(f'⚠️账户 {account.display_name} 获取实时便笺请求失败，你可以手动前往App查看')
-                continue
+            await starrail_note_notice(account, starrail_board_status, note, user_ids, matcher)
 
-            msg = ''
-            # 手动查询体力时，无需判断是否溢出
-            if not matcher:
-                do_notice = False
-                """记录是否需要提醒"""
-                # 体力溢出提醒
-                if note.current_stamina >= account.user_stamina_threshold:
-                    # 防止重复提醒
-                    if not starrail_notice.current_stamina_full:
-                        if note.current_stamina >= note.max_stamina:
-                            starrail_notice.current_stamina_full = True
-                            msg += '❕您的开拓力已经溢出\n'
-                            if note.current_train_score != note.max_train_score:
-                                msg += '❕您的每日实训未完成\n'
-                            do_notice = True
-                        elif not starrail_notice.current_stamina:
-                            starrail_notice.current_stamina_full = False
-                            starrail_notice.current_stamina = True
-                            msg += '❕您的开拓力已达到提醒阈值\n'
-                            if note.current_train_score != note.max_train_score:
-                                msg += '❕您的每日实训未完成\n'
-                            do_notice = True
-                else:
-                    starrail_notice.current_stamina = False
-                    starrail_notice.current_stamina_full = False
 
-                # 每周模拟宇宙积分提醒
-                if note.current_rogue_score != note.max_rogue_score:
-                    if plugin_config.preference.notice_time:
-                        msg += '❕您的模拟宇宙积分还没打满\n\n'
-                        do_notice = True
-
-                if not do_notice:
-                    logger.info(
-                        f"崩铁实时便笺：账户 {account.display_name} 开拓力:{note.current_stamina},未满足推送条件")
-                    return
-
-            msg += "❖星穹铁道·实时便笺❖" \
-                   f"\n🆔账户 {account.display_name}" \
-                   f"\n⏳开拓力数量：{note.current_stamina} / {note.max_stamina}" \
-                   f"\n⏱开拓力{note.stamina_recover_text}" \
-                   f"\n📒每日实训：{note.current_train_score} / {note.max_train_score}" \
-                   f"\n📅每日委托：{note.accepted_expedition_num} / 4" \
-                   f"\n🌌模拟宇宙：{note.current_rogue_score} / {note.max_rogue_score}"
+async def starrail_note_notice(
+        account: UserAccount,
+        starrail_board_status: Union[BaseApiStatus, StarRailNoteStatus],
+        note: Optional[StarRailNote],
+        user_ids: Iterable[str],
+        matcher: Matcher = None
+):
+    """
+    根据已获取的星铁实时便笺判断是否需要提醒，并发送给用户。
 
-            if matcher:
-                await matcher.send(msg)
-            else:
-                for user_id in user_ids:
-                    await send_private_msg(user_id=user_id, message=msg)
+    :param account: 米游社账户
+    :param starrail_board_status: 获取实时便笺的返回状态
+    :param note: 星铁实时便笺
+    :param user_ids: 发送通知的所有用户ID
+    :param matcher: 事件响应器
+    """
+    notice_status = await NoteNoticeStore.get_async(account.bbs_uid)
+    starrail_notice = notice_status.starrail
+    if not starrail_board_status:
+        if matcher:
+            if starrail_board_status.login_expired:
+                await matcher.send(f'⚠️账户 {account.display_name} 登录失效，请重新登录')
+            elif starrail_board_status.no_starrail_account:
+                await matcher.send(f'⚠️账户 {account.display_name} 没有绑定任何星铁账户，请绑定后再重试')
+            elif starrail_board_status.need_verify:
+                await matcher.send(f'⚠️账户 {account.display_name} 获取实时便笺时被人机验证阻拦')
+            await matcher.send(f'⚠️账户 {account.display_name} 获取实时便笺请求失败，你可以手动前往App查看')
+        return
+
+    msg = ''
+    # 手动查询体力时，无需判断是否溢出
+    if not matcher:
+        notice_before = starrail_notice.dict()
+        do_notice = False
+        """记录是否需要提醒"""
+        # 体力溢出提醒
+        if note.current_stamina >= account.user_stamina_threshold:
+            # 防止重复提醒
+            if not starrail_notice.current_stamina_full:
+                if note.current_stamina >= note.max_stamina:
+                    starrail_notice.current_stamina_full = True
+                    msg += '❕您的开拓力已经溢出\n'
+                    if note.current_train_score != note.max_train_score:
+                        msg += '❕您的每日实训未完成\n'
+                    do_notice = True
+                elif not starrail_notice.current_stamina:
+                    starrail_notice.current_stamina_full = False
+                    starrail_notice.current_stamina = True
+                    msg += '❕您的开拓力已达到提醒阈值\n'
+                    if note.current_train_score != note.max_train_score:
+                        msg += '❕您的每日实训未完成\n'
+                    do_notice = True
+        else:
+            starrail_notice.current_stamina = False
+            starrail_notice.current_stamina_full = False
+
+        if starrail_notice.dict() != notice_before:
+            NoteNoticeStore.mark_dirty(account.bbs_uid, notice_status)
+
+        # 每周模拟宇宙积分提醒
+        if note.current_rogue_score != note.max_rogue_score:
+            if plugin_config.preference.notice_time:
+                msg += '❕您的模拟宇宙积分还没打满\n\n'
+                do_notice = True
+
+        if not do_notice:
+            logger.info(
+                f"崩铁实时便笺：账户 {account.display_name} 开拓力:{note.current_stamina},未满足推送条件")
+            return
+
+    msg += "❖星穹铁道·实时便笺❖" \
+           f"\n🆔账户 {account.display_name}" \
+           f"\n⏳开拓力数量：{note.current_stamina} / {note.max_stamina}" \
+           f"\n⏱开拓力{note.stamina_recover_text}" \
+           f"\n📒每日实训：{note.current_train_score} / {note.max_train_score}" \
+           f"\n📅每日委托：{note.accepted_expedition_num} / 4" \
+           f"\n🌌模拟宇宙：{note.current_rogue_score} / {note.max_rogue_score}"
+
+    if matcher:
+        await matcher.send(msg)
+    else:
+        for user_id in user_ids:
+            NotificationOutbox.put(user_id=user_id, message=msg, priority=MessagePriority.LOW)
 
 
 manually_weibo_code_check = on_command(plugin_config.preference.command_start + 'wb兑换', priority=5, block=True)
@@ -694,7 +778,7 @@ async def weibo_code(event: Union[GeneralMessageEvent], matcher: Matcher):
         await matcher.send("⚠️为了保护您的隐私，请私聊进行查询。")
     else:
         user_id = event.get_user_id()
-        user = PluginDataManager.plugin_data.users.get(user_id)
+        user = await PluginDataManager.get_user_async(user_id)
         await weibo_code_check(user=user, user_ids=[user_id], matcher=matcher)
 
 
@@ -704,7 +788,7 @@ manually_weibo_sign_check = on_command(plugin_config.preference.command_start +
 @manually_weibo_sign_check.handle()
 async def weibo_sign(event: Union[GeneralMessageEvent], matcher: Matcher):
     user_id = event.get_user_id()
-    user = PluginDataManager.plugin_data.users.get(user_id)
+    user = await PluginDataManager.get_user_async(user_id)
     await weibo_sign_check(user=user, user_ids=[user_id], matcher=matcher)
 
 
@@ -721,7 +805,7 @@ async def weibo_sign_check(user: UserData, user_ids: Iterable[str], matcher: Mat
                 await matcher.send(message=msg)
             else:
                 for user_id in user_ids:
-                    await send_private_msg(user_id=user_id, message=msg)
+                    NotificationOutbox.put(user_id=user_id, message=msg)
     else:
         message = "未开启微博自动签到功能"
         if matcher:
@@ -771,7 +855,7 @@ async def weibo_code_check(user: UserData, user_ids: Iterable[str], mode=0, matc
                                 messages = msg + saa_img
                                 for user_id in user_ids:
                                     logger.info(f"检测到当前超话有兑换码，正在给{user_id}推送信息中")
-                                    await send_private_msg(user_id=user_id, message=messages)
+                                    NotificationOutbox.put(user_id=user_id, message=messages)
                 except Exception:
                     pass
     else:
@@ -790,12 +874,34 @@ async def send_qqGroup(bot, event, msgs_list):
 
 
 @scheduler.scheduled_job("cron", hour='0', minute='0', id="daily_goodImg_update")
-def daily_update():
+async def daily_update():
     """
     每日图片生成函数
     """
     logger.info(f"{plugin_config.preference.log_head}后台开始生成每日商品图片")
-    threading.Thread(target=generate_image).start()
+    if not await GoodImageGenerator.generate():
+        logger.warning(f"{plugin_config.preference.log_head}部分分区的每日商品图片生成失败")
+
+
+@scheduler.scheduled_job("cron", hour='4', minute='0', id="file_cache_prune")
+async def prune_file_cache_job():
+    """
+    每日清理过期的本地文件缓存
+    """
+    removed = await asyncio.get_running_loop().run_in_executor(None, prune_file_cache)
+    if removed:
+        logger.info(f"{plugin_config.preference.log_head}已清理 {removed} 个过期的文件缓存")
+
+
+@scheduler.scheduled_job("interval",
+                         minutes=plugin_config.preference.plugin_data_compact_interval,
+                         id="plugin_data_compact")
+async def compact_plugin_data():
+    """
+    定时将插件数据追加日志合并到插件数据文件
+    """
+    if (future := PluginDataManager.compact()) is not None:
+        await future
 
 
 @scheduler.scheduled_job("cron",
@@ -807,26 +913,126 @@ async def daily_schedule():
     自动米游币任务、游戏签到函数
     """
     logger.info(f"{plugin_config.preference.log_head}开始执行每日自动任务")
-    for user_id, user in get_unique_users():
+
+    async def run_user(user_id: str, user: UserData):
         user_ids = [user_id] + list(get_all_bind(user_id))
-        await perform_game_sign(user=user, user_ids=user_ids)
-        await perform_bbs_sign(user=user, user_ids=user_ids)
+        # 该用户的所有通知在任务结束后合并为一条消息发送
+        async with NotificationOutbox.digest():
+            await perform_game_sign(user=user, user_ids=user_ids, user_id=user_id)
+            await perform_bbs_sign(user=user, user_ids=user_ids, user_id=user_id)
+
+    async def worker():
+        while (item := await queue.get()) is not None:
+            user_id, user = item
+            try:
+                await run_user(user_id, user)
+            except Exception:
+                logger.exception(f"{plugin_config.preference.log_head}用户 {user_id} 的每日自动任务执行失败")
+
+    # 由固定数量的协程并发处理用户，用户数据在有空闲协程时才读取，内存占用不随用户总数增长；
+    # 同时执行的账户数由 AccountLimiter 限制，冷却时间只作用于各自的账户
+    worker_count = max(1, plugin_config.preference.max_concurrent_users)
+    queue: "asyncio.Queue[Optional[Tuple[str, UserData]]]" = asyncio.Queue(maxsize=worker_count)
+    workers = [asyncio.create_task(worker()) for _ in range(worker_count)]
+    try:
+        async for item in iter_unique_users():
+            await queue.put(item)
+    finally:
+        for _ in workers:
+            await queue.put(None)
+        await asyncio.gather(*workers)
     logger.info(f"{plugin_config.preference.log_head}每日自动任务执行完成")
 
 
 @scheduler.scheduled_job("interval",
-                         minutes=plugin_config.preference.resin_interval,
+                         minutes=plugin_config.preference.note_check_tick
+                         if plugin_config.preference.adaptive_note_check
+                         else plugin_config.preference.resin_interval,
                          id="resin_check")
 async def auto_note_check():
     """
     自动查看实时便笺
+
+    开启自适应检查时，只检查 ``NotePollScheduler`` 中已到期的账户
     """
-    logger.info(f"{plugin_config.preference.log_head}开始执行自动便笺检查")
-    for user_id, user in get_unique_users():
+    preference = plugin_config.preference
+    adaptive = preference.adaptive_note_check
+    due = NotePollScheduler.pop_due() if adaptive else set()
+
+    def is_due(key: NotePollKey) -> bool:
+        return not adaptive or key in due or not NotePollScheduler.is_scheduled(key)
+
+    jobs = []
+    async for user_id, user in iter_unique_users():
         user_ids = [user_id] + list(get_all_bind(user_id))
-        await genshin_note_check(user=user, user_ids=user_ids)
-        await starrail_note_check(user=user, user_ids=user_ids)
-    logger.info(f"{plugin_config.preference.log_head}自动便笺检查执行完成")
+        for account in user.accounts.values():
+            if not account.enable_resin:
+                continue
+            check_genshin = 'GenshinImpact' in account.game_sign_games \
+                            and is_due((account.bbs_uid, "genshin"))
+            check_starrail = 'StarRail' in account.game_sign_games \
+                             and is_due((account.bbs_uid, "starrail"))
+            if check_genshin or check_starrail:
+                jobs.append((account, user_ids, check_genshin, check_starrail))
+    if not jobs:
+        return
+
+    logger.info(f"{preference.log_head}开始执行自动便笺检查，共 {len(jobs)} 个账户")
+    # 同时进行的便笺请求数
+    semaphore = asyncio.Semaphore(max(1, preference.note_check_concurrency))
+    # 游戏列表在本轮检查中只获取一次
+    game_list_status, game_list = await get_game_list()
+    if not game_list_status:
+        game_list = None
+
+    async def check_account(account: UserAccount, user_ids: Iterable[str], check_genshin: bool,
+                            check_starrail: bool):
+        if adaptive:
+            # 先按固定间隔安排下一次检查，请求失败时以此重试
+            for game, checked in ("genshin", check_genshin), ("starrail", check_starrail):
+                if checked:
+                    NotePollScheduler.schedule((account.bbs_uid, game), preference.resin_interval * 60)
+        # 每个账户只获取一次游戏账户信息，供两个游戏的便笺请求共用
+        async with semaphore:
+            game_record_status, records = await get_game_record(account)
+        if not game_record_status:
+            logger.info(f"{preference.log_head}自动便笺检查：账户 {account.display_name} 获取游戏账户信息失败")
+            return
+
+        async def fetch_genshin():
+            async with semaphore:
+                status, note = await genshin_note(account, records=records, game_list=game_list)
+            if adaptive and status:
+                NotePollScheduler.schedule((account.bbs_uid, "genshin"), predict_genshin_note_delay(account, note))
+            await genshin_note_notice(account, status, note, user_ids=user_ids)
+
+        async def fetch_starrail():
+            async with semaphore:
+                status, note = await starrail_note(account, records=records, game_list=game_list)
+            if adaptive and status:
+                NotePollScheduler.schedule((account.bbs_uid, "starrail"), predict_starrail_note_delay(account, note))
+            await starrail_note_notice(account, status, note, user_ids=user_ids)
+
+        tasks = []
+        if check_genshin:
+            tasks.append(fetch_genshin())
+        if check_starrail:
+            tasks.append(fetch_starrail())
+        await asyncio.gather(*tasks)
+
+    # 一次性读取本轮需要的通知状态
+    await NoteNoticeStore.preload_async(account.bbs_uid for account, *_ in jobs)
+
+    # 本轮检查中同一用户的便笺提醒合并为一条消息发送
+    async with NotificationOutbox.digest():
+        results = await asyncio.gather(*(check_account(*job) for job in jobs), return_exceptions=True)
+    for (account, *_), result in zip(jobs, results):
+        if isinstance(result, Exception):
+            logger.opt(exception=result).error(
+                f"{preference.log_head}账户 {account.display_name} 的自动便笺检查执行失败")
+    # 本轮检查中修改过的通知状态统一写入
+    await NoteNoticeStore.flush_async()
+    logger.info(f"{preference.log_head}自动便笺检查执行完成")
 
 
 @scheduler.scheduled_job("cron",
@@ -838,7 +1044,7 @@ async def auto_weibo_check():
     每日检查微博超话签到及兑换码函数
     """
     logger.info(f"{plugin_config.preference.log_head}开始执行微博自动任务")
-    for user_id, user in get_unique_users():
+    async for user_id, user in iter_unique_users():
         user_ids = [user_id] + list(get_all_bind(user_id))
         # await weibo_sign_check(user=user, user_ids=user_ids)
         await weibo_code_check(user=user, user_ids=user_ids, mode=1)
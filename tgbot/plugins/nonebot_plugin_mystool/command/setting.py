@@ -6,10 +6,11 @@ from nonebot.matcher import Matcher
 from nonebot.params import T_State
 
 from ..api import BaseMission, BaseGameSign
+from ..api.common import invalidate_game_record_cache
 from ..api.weibo import Tool
 from ..command.common import CommandRegistry
 from ..model import PluginDataManager, plugin_config, UserAccount, CommandUsage, UserData
-from ..utils import COMMAND_BEGIN, GeneralMessageEvent
+from ..utils import COMMAND_BEGIN, GeneralMessageEvent, NotePollScheduler
 
 __all__ = ["setting", "account_setting", "global_setting"]
 
@@ -48,7 +49,7 @@ async def _(event: Union[GeneralMessageEvent], matcher: Matcher, state: T_State)
     """
     账号设置命令触发
     """
-    user = PluginDataManager.plugin_data.users.get(event.get_user_id())
+    user = await PluginDataManager.get_user_async(event.get_user_id())
     user_account = user.accounts if user else None
     if not user_account:
         await account_setting.finish(
@@ -71,10 +72,10 @@ async def _(event: Union[GeneralMessageEvent], matcher: Matcher, state: T_State,
     if bbs_uid == '退出':
         await matcher.finish('🚪已成功退出')
 
-    user_account = PluginDataManager.plugin_data.users[event.get_user_id()].accounts
+    user_account = (await PluginDataManager.get_user_async(event.get_user_id())).accounts
     if not (account := user_account.get(bbs_uid)):
         await account_setting.reject('⚠️您发送的账号不在以上账号内，请重新发送')
-    state["user"] = PluginDataManager.plugin_data.users[event.get_user_id()]
+    state["user"] = await PluginDataManager.get_user_async(event.get_user_id())
     state['account'] = account
     state["prepare_to_delete"] = False
 
@@ -121,16 +122,16 @@ async def _(event: Union[GeneralMessageEvent], state: T_State, setting_id=ArgStr
     根据所选更改相应账户的相应设置
     """
     account: UserAccount = state['account']
-    user_account = PluginDataManager.plugin_data.users[event.get_user_id()].accounts
+    user_account = (await PluginDataManager.get_user_async(event.get_user_id())).accounts
     if setting_id == '退出':
         await account_setting.finish('🚪已成功退出')
     elif setting_id == '1':
         account.enable_mission = not account.enable_mission
-        PluginDataManager.write_plugin_data()
+        PluginDataManager.write_plugin_data(event.get_user_id())
         await account_setting.finish(f"📅米游币任务自动执行已 {'✅开启' if account.enable_mission else '❌关闭'}")
     elif setting_id == '2':
         account.enable_game_sign = not account.enable_game_sign
-        PluginDataManager.write_plugin_data()
+        PluginDataManager.write_plugin_data(event.get_user_id())
         await account_setting.finish(f"📅米哈游游戏自动签到已 {'✅开启' if account.enable_game_sign else '❌关闭'}")
     elif setting_id == '3':
         signable_games = "、".join(f"『{game.name}』" for game in BaseGameSign.available_game_signs)
@@ -149,7 +150,7 @@ async def _(event: Union[GeneralMessageEvent], state: T_State, setting_id=ArgStr
         else:
             account.platform = "ios"
             platform_show = "iOS"
-        PluginDataManager.write_plugin_data()
+        PluginDataManager.write_plugin_data(event.get_user_id())
         await account_setting.finish(f"📲设备平台已更改为 {platform_show}")
     elif setting_id == '5':
         games_show = "、".join(map(lambda x: f"『{x.name}』", BaseMission.available_games.values()))
@@ -163,7 +164,7 @@ async def _(event: Union[GeneralMessageEvent], state: T_State, setting_id=ArgStr
         state["setting_item"] = "mission_games"
     elif setting_id == '6':
         account.enable_resin = not account.enable_resin
-        PluginDataManager.write_plugin_data()
+        PluginDataManager.write_plugin_data(event.get_user_id())
         await account_setting.finish(f"📅原神、星穹铁道便笺提醒已 {'✅开启' if account.enable_resin else '❌关闭'}")
     elif setting_id == '7':
         await account_setting.send(
@@ -198,7 +199,8 @@ async def _(event: Union[GeneralMessageEvent], state: T_State, setting_id=ArgStr
         await account_setting.reject(f"⚠️确认删除账号 {account.display_name} ？发送 \"确认删除\" 以确定。")
     elif setting_id == '确认删除' and state["prepare_to_delete"]:
         user_account.pop(account.bbs_uid)
-        PluginDataManager.write_plugin_data()
+        invalidate_game_record_cache(account.bbs_uid)
+        PluginDataManager.write_plugin_data(event.get_user_id())
         await account_setting.finish(f"已删除账号 {account.display_name} 的数据")
     else:
         await account_setting.reject("⚠️您的输入有误，请重新输入")
@@ -231,7 +233,7 @@ async def _(_: Union[GeneralMessageEvent], state: T_State, notice_game=ArgStr())
 
 
 @account_setting.got('setting_wb')
-async def _(_: Union[GeneralMessageEvent], state: T_State, setting_wb=ArgStr()):
+async def _(event: Union[GeneralMessageEvent], state: T_State, setting_wb=ArgStr()):
     if setting_wb == '退出':
         await account_setting.finish('🚪已成功退出')
 
@@ -239,7 +241,7 @@ async def _(_: Union[GeneralMessageEvent], state: T_State, setting_wb=ArgStr()):
         user: UserData = state["user"]
         if setting_wb == "1":
             user.enable_weibo = not user.enable_weibo
-            PluginDataManager.write_plugin_data()
+            PluginDataManager.write_plugin_data(event.get_user_id())
             await account_setting.finish(f"微博签到与兑换功能已 {'✅开启' if user.enable_weibo else '❌关闭'}")
         elif setting_wb == '添加账号':
             await account_setting.send(
@@ -280,7 +282,7 @@ async def _(_: Union[GeneralMessageEvent], state: T_State, setting_wb=ArgStr()):
 
 
 @account_setting.got('setting_value')
-async def _(_: Union[GeneralMessageEvent], state: T_State, setting_value=ArgStr()):
+async def _(event: Union[GeneralMessageEvent], state: T_State, setting_value=ArgStr()):
     if setting_value == '退出':
         await account_setting.finish('🚪已成功退出')
     account: UserAccount = state['account']
@@ -294,7 +296,8 @@ async def _(_: Union[GeneralMessageEvent], state: T_State, setting_value=ArgStr(
             if 0 <= resin_threshold <= 200:
                 # 输入有效的数字范围，将 resin_threshold 赋值为输入的整数
                 account.user_resin_threshold = resin_threshold
-                PluginDataManager.write_plugin_data()
+                NotePollScheduler.remove(account.bbs_uid)
+                PluginDataManager.write_plugin_data(event.get_user_id())
                 await account_setting.finish("更改原神便笺树脂提醒阈值成功\n"
                                              f"⏰当前提醒阈值：{resin_threshold}")
             else:
@@ -309,7 +312,8 @@ async def _(_: Union[GeneralMessageEvent], state: T_State, setting_value=ArgStr(
             if 0 <= stamina_threshold <= 240:
                 # 输入有效的数字范围，将 stamina_threshold 赋值为输入的整数
                 account.user_stamina_threshold = stamina_threshold
-                PluginDataManager.write_plugin_data()
+                NotePollScheduler.remove(account.bbs_uid)
+                PluginDataManager.write_plugin_data(event.get_user_id())
                 await account_setting.finish("更改崩铁便笺开拓力提醒阈值成功\n"
                                              f"⏰当前提醒阈值：{stamina_threshold}")
             else:
@@ -328,7 +332,7 @@ async def _(_: Union[GeneralMessageEvent], state: T_State, setting_value=ArgStr(
                 sign_games.append(game_name)
 
         account.game_sign_games = sign_games
-        PluginDataManager.write_plugin_data()
+        PluginDataManager.write_plugin_data(event.get_user_id())
         setting_value = setting_value.replace(" ", "、")
         await account_setting.finish(f"💬执行签到的游戏已更改为『{setting_value}』")
 
@@ -345,7 +349,7 @@ async def _(_: Union[GeneralMessageEvent], state: T_State, setting_value=ArgStr(
                 mission_games.append(game_name)
 
         account.mission_games = mission_games
-        PluginDataManager.write_plugin_data()
+        PluginDataManager.write_plugin_data(event.get_user_id())
         setting_value = setting_value.replace(" ", "、")
         await account_setting.finish(f"💬执行米游币任务的频道已更改为『{setting_value}』")
 
@@ -361,7 +365,7 @@ async def _(_: Union[GeneralMessageEvent], state: T_State, setting_value=ArgStr(
                     user.weibo.append(userdata_dict)
         elif len(user.weibo) == 0:
             user.weibo.append(userdata_dict)
-        PluginDataManager.write_plugin_data()
+        PluginDataManager.write_plugin_data(event.get_user_id())
         await account_setting.finish(f"{userdata_dict['name']}微博账号设置成功")
 
     elif state["setting_item"] == "del_weibo_account":
@@ -371,7 +375,7 @@ async def _(_: Union[GeneralMessageEvent], state: T_State, setting_value=ArgStr(
             for usr in user.weibo:
                 if usr['name'] == setting_value:
                     user.weibo.remove(usr)
-            PluginDataManager.write_plugin_data()
+            PluginDataManager.write_plugin_data(event.get_user_id())
             await account_setting.finish(f"{setting_value}微博账号成功删除")
 
 
@@ -391,7 +395,7 @@ async def _(event: Union[GeneralMessageEvent], matcher: Matcher):
     """
     通知设置命令触发
     """
-    user = PluginDataManager.plugin_data.users[event.get_user_id()]
+    user = await PluginDataManager.get_user_async(event.get_user_id())
     await matcher.send(
         f"自动通知每日计划任务结果：{'🔔开' if user.enable_notice else '🔕关'}"
         "\n请问您是否需要更改呢？\n请回复“是”或“否”\n🚪发送“退出”即可退出")
@@ -402,12 +406,12 @@ async def _(event: Union[GeneralMessageEvent], matcher: Matcher, choice=ArgStr()
     """
     根据选择变更通知设置
     """
-    user = PluginDataManager.plugin_data.users[event.get_user_id()]
+    user = await PluginDataManager.get_user_async(event.get_user_id())
     if choice == '退出':
         await matcher.finish("🚪已成功退出")
     elif choice == '是':
         user.enable_notice = not user.enable_notice
-        PluginDataManager.write_plugin_data()
+        PluginDataManager.write_plugin_data(event.get_user_id())
         await matcher.finish(f"自动通知每日计划任务结果 已 {'🔔开启' if user.enable_notice else '🔕关闭'}")
     elif choice == '否':
         await matcher.finish("没有做修改哦~")
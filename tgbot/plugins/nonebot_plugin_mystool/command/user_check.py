@@ -92,7 +92,7 @@ async def _(
         command_arg=CommandArg()
 ):
     user_id = event.get_user_id()
-    user = PluginDataManager.plugin_data.users.get(user_id)
+    user = await PluginDataManager.get_user_async(user_id)
     if len(command) > 1:
         if user is None:
             await matcher.finish("⚠️您的用户数据不存在，只有进行登录操作以后才会生成用户数据")
@@ -148,7 +148,8 @@ async def _(
             for key in src_users:
                 del PluginDataManager.plugin_data.user_bind[key]
                 del PluginDataManager.plugin_data.users[key]
-            PluginDataManager.plugin_data.users[target_id].uuid = str(uuid4())
+            target_user = await PluginDataManager.get_user_async(target_id)
+            target_user.uuid = str(uuid4())
             PluginDataManager.write_plugin_data()
 
             await matcher.send(
@@ -174,19 +175,15 @@ async def _(
         elif user and uuid == user.uuid:
             await matcher.finish("⚠️您不能绑定自己的UUID密钥")
         else:
-            # 筛选UUID密钥对应的用户
+            # 筛选UUID密钥对应的用户（不包含被绑定的用户，防止形成循环绑定的关系链）
             target_users = list(
-                filter(lambda x: x[1].uuid == uuid and x[0] != user_id, PluginDataManager.plugin_data.users.items()))
-            # 如果有多个用户使用了此UUID密钥，即目标用户被多个用户绑定，需要进一步筛选，防止形成循环绑定的关系链
-            if len(target_users) > 1:
-                user_filter = filter(lambda x: x[0] not in PluginDataManager.plugin_data.user_bind, target_users)
-                target_id, _ = next(user_filter)
-            elif len(target_users) == 1:
+                filter(lambda x: x[0] != user_id, await PluginDataManager.find_users_by_uuid_async(uuid)))
+            if target_users:
                 target_id, _ = target_users[0]
             else:
                 await matcher.finish("⚠️找不到此UUID密钥对应的用户数据")
             PluginDataManager.plugin_data.do_user_bind(user_id, target_id)
-            user = PluginDataManager.plugin_data.users[user_id]
+            user = await PluginDataManager.get_user_async(user_id)
             if isinstance(event, DirectMessageCreateEvent):
                 user.qq_guild[user_id] = event.channel_id
             elif isinstance(event, MessageCreateEvent):
@@ -222,9 +219,9 @@ async def _(bot: Bot, event: Union[GeneralGroupMessageEvent]):
     # 附加功能：记录用户所在频道
     if isinstance(event, MessageCreateEvent):
         user_id = event.get_user_id()
-        if user := PluginDataManager.plugin_data.users.get(user_id):
+        if user := await PluginDataManager.get_user_async(user_id):
             user.qq_guild[user_id] = event.guild_id
-            PluginDataManager.write_plugin_data()
+            PluginDataManager.write_plugin_data(user_id)
 
     msg_text = f"{PLUGIN.metadata.name}" \
                f"{PLUGIN.metadata.description}\n" \
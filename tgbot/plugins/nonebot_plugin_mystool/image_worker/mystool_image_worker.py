@@ -0,0 +1,69 @@
+"""
+商品列表图片合成
+
+该模块以顶层模块 ``mystool_image_worker`` 的名称导入，只依赖标准库和 PIL，
+图片生成进程池的子进程只需导入该模块，不会导入插件本身和 NoneBot。
+"""
+import io
+from typing import Any, Dict, List, Optional, Tuple
+
+from PIL import Image, ImageDraw, ImageFont
+
+__all__ = ["make_thumbnail", "render_good_list_page"]
+
+
+def make_thumbnail(content: bytes, icon_size: Tuple[int, int]) -> bytes:
+    """
+    将预览图调整为 ``icon_size`` 大小并编码为 PNG
+
+    :param content: 原始预览图数据
+    :param icon_size: 缩略图大小
+    """
+    with Image.open(io.BytesIO(content)) as img:
+        thumbnail = img.resize(icon_size)
+    thumbnail_bytes = io.BytesIO()
+    thumbnail.save(thumbnail_bytes, format="PNG")
+    return thumbnail_bytes.getvalue()
+
+
+def render_good_list_page(
+        texts: List[str],
+        icons: List[Optional[bytes]],
+        font_path: str,
+        encoding: str,
+        config: Dict[str, Any]
+) -> bytes:
+    """
+    生成一页商品列表图片并编码
+
+    :param texts: 各商品的文字说明
+    :param icons: 各商品对应的预览图（已调整大小的图片数据），为 ``None`` 时留空
+    :param font_path: 字体文件路径或字体名称
+    :param encoding: 字体编码
+    :param config: 商品列表图片设置（``GoodListImageConfig.dict()``）
+    :return: 编码后的图片数据
+    """
+    icon_size = config["ICON_SIZE"]
+    font = ImageFont.truetype(font_path, config["FONT_SIZE"], encoding=encoding)
+    item_height = icon_size[1] + config["PADDING_ICON"]
+    preview = Image.new('RGB', (config["WIDTH"], item_height * len(texts)), (255, 255, 255))
+    draw = ImageDraw.Draw(preview)
+    for index, (text, icon) in enumerate(zip(texts, icons)):
+        # 预览图粘贴位置 高
+        size_y = index * item_height
+        if icon is not None:
+            with Image.open(io.BytesIO(icon)) as img:
+                preview.paste(img, (0, size_y))
+        # 根据预览图高度来确定写入文字的位置
+        draw.text((icon_size[0] + config["PADDING_TEXT_AND_ICON_X"], size_y + config["PADDING_TEXT_AND_ICON_Y"]),
+                  text, (0, 0, 0), font)
+
+    # 导出
+    image_bytes = io.BytesIO()
+    if config["IMAGE_FORMAT"] == "WEBP":
+        preview.save(image_bytes, format="WEBP", quality=config["QUALITY"])
+    else:
+        preview.save(image_bytes, format="JPEG", quality=config["QUALITY"], optimize=True,
+                     progressive=config["PROGRESSIVE_JPEG"])
+    preview.close()
+    return image_bytes.getvalue()
@@ -1,3 +1,4 @@
 from .common import *
 from .config import *
 from .data import *
+from .note_notice import *
@@ -13,7 +13,7 @@ __all__ = ["root_path", "data_path", "BaseModelWithSetter", "BaseModelWithUpdate
            "Award", "GameSignInfo", "MissionData", "MissionState", "GenshinNote", "StarRailNote", "GenshinNoteNotice",
            "StarRailNoteNotice", "BaseApiStatus", "CreateMobileCaptchaStatus", "GetCookieStatus", "GetGoodDetailStatus",
            "ExchangeStatus", "MissionStatus", "GetFpStatus", "BoardStatus", "GenshinNoteStatus", "StarRailNoteStatus",
-           "QueryGameTokenQrCodeStatus", "GeetestResult", "GeetestResultV4", "CommandUsage"]
+           "QueryGameTokenQrCodeStatus", "GeetestResult", "GeetestResultV4", "CommandUsage", "ClockCalibration"]
 
 root_path = Path(__name__).parent.absolute()
 '''NoneBot2 机器人根目录'''
@@ -378,6 +378,8 @@ class GenshinNote(BaseModel):
     """洞天财瓮 未收取的宝钱数"""
     max_home_coin: Optional[int]
     """洞天财瓮 最多可容纳宝钱数"""
+    home_coin_recovery_time: Optional[int]
+    """洞天财瓮 剩余存满时间"""
     transformer: Optional[Dict[str, Any]]
     """参量质变仪相关数据"""
     resin_recovery_time: Optional[int]
@@ -659,3 +661,32 @@ class CommandUsage(BaseModel):
     name: Optional[str]
     description: Optional[str]
     usage: Optional[str]
+
+
+class ClockCalibration(BaseModel):
+    """
+    服务器时钟校准结果
+    """
+    offset: float
+    """服务器时间与本地时间之差（服务器时间 - 本地时间，单位：秒）"""
+    error: float
+    """校准结果的误差范围（±，单位：秒）"""
+    rtt: float
+    """平均网络往返时延（单位：秒）"""
+    samples: int
+    """有效的采样次数"""
+
+    @property
+    def server_time(self) -> float:
+        """
+        当前的服务器时间戳
+        """
+        return time.time() + self.offset
+
+    def to_local_time(self, server_timestamp: float) -> float:
+        """
+        将服务器时间戳转换为本地时间戳
+
+        :param server_timestamp: 服务器时间戳
+        """
+        return server_timestamp - self.offset
@@ -2,7 +2,7 @@ import os
 import sys
 from datetime import time, timedelta, datetime
 from pathlib import Path
-from typing import Union, Optional, Tuple, Any, Dict, TYPE_CHECKING
+from typing import Union, Optional, Tuple, Any, Dict, Literal, TYPE_CHECKING
 
 import nonebot
 from nonebot.log import logger
@@ -13,12 +13,14 @@ from ..model.common import data_path
 if TYPE_CHECKING:
     IntStr = Union[int, str]
 
-__all__ = ["plugin_config_path", "Preference",
+__all__ = ["plugin_config_path", "NOTICE_TIME", "Preference",
            "GoodListImageConfig", "SaltConfig", "DeviceConfig", "PluginConfig", "PluginEnv", "plugin_config",
            "plugin_env"]
 
 plugin_config_path = data_path / "configV2.json"
 """插件数据文件默认路径"""
+NOTICE_TIME = "20:00"
+"""每日便笺提醒时间段的中心时间，时间段为前后 ``resin_interval`` 分钟"""
 _driver = nonebot.get_driver()
 
 
@@ -38,14 +40,46 @@ class Preference(BaseModel):
     """最大网络请求重试次数"""
     retry_interval: float = 2
     """网络请求重试间隔（单位：秒）（除兑换请求外）"""
+    http2: bool = False
+    """是否启用 HTTP/2（需要安装 h2）"""
+    http_max_connections: Optional[int] = 50
+    """每个主机的连接池最大连接数"""
+    http_max_keepalive_connections: Optional[int] = 20
+    """每个主机的连接池最大保持连接数"""
+    http_keepalive_expiry: Optional[float] = 30
+    """空闲连接保持时间（单位：秒）"""
+    http_max_concurrent_requests: Optional[int] = 10
+    """每个主机同时进行的最大请求数，超出的请求将排队等待"""
+    game_record_cache_ttl: float = 3600
+    """用户绑定的游戏账户信息缓存时间（单位：秒）"""
+    game_list_cache_ttl: float = 86400
+    """米哈游游戏信息缓存时间（单位：秒）"""
+    good_list_concurrency: int = 4
+    """获取商品信息列表时同时请求的最大页数"""
+    good_catalogue_interval: int = 60
+    """商品目录（所有分区的商品信息列表）的更新间隔（单位：分钟）"""
+    post_pool_ttl: float = 300
+    """米游币任务中各分区文章列表的共享缓存时间（单位：秒）"""
+    file_cache_path: Path = data_path / "file_cache"
+    """下载文件（如签到奖励图标）的本地缓存目录"""
+    good_image_concurrency: int = 8
+    """生成商品图片时同时获取商品详情、下载商品预览图的最大数量"""
+    icon_cache_max_age: float = 86400
+    """商品预览图缩略图缓存的有效时间，超过后使用条件请求（ETag/Last-Modified）检查是否更新（单位：秒）"""
+    file_cache_max_age: int = 30
+    """本地文件缓存（包括商品预览图缩略图）的保留时间，超过该时间未使用的文件会在每日清理时删除（单位：天）"""
     timezone: Optional[str] = "Asia/Shanghai"
     """兑换时所用的时区"""
     exchange_thread_count: int = 2
-    """兑换线程数"""
+    """每个兑换计划同时进行兑换的协程数"""
     exchange_latency: Tuple[float, float] = (0, 0.5)
-    """同一线程下，每个兑换请求之间的间隔时间"""
+    """同一协程下，每个兑换请求之间的间隔时间"""
     exchange_duration: float = 5
     """兑换持续时间随机范围（单位：秒）"""
+    exchange_prepare_time: float = 10
+    """兑换开始前提前进行准备（如预热网络连接）的时间（单位：秒）"""
+    exchange_clock_calibration: bool = True
+    """兑换前是否根据服务器时间校准兑换开始时间"""
     enable_log_output: bool = True
     """是否保存日志"""
     log_head: str = ""
@@ -60,6 +94,12 @@ class Preference(BaseModel):
     '''文件读写编码'''
     max_user: int = 0
     '''支持最多用户数'''
+    storage_backend: Literal["json", "sqlite"] = "json"
+    '''插件数据存储方式，"json" 为 dataV2.json 文件，"sqlite" 为 dataV2.db 数据库（首次启用时自动从 dataV2.json 迁移）'''
+    sqlite_cache_size: int = 1024
+    '''使用 SQLite 存储时，内存中常驻的最近使用的用户数据数量'''
+    plugin_data_compact_interval: int = 60
+    '''使用插件数据文件存储时，将追加日志合并到插件数据文件的间隔（单位：分钟）'''
     add_friend_accept: bool = True
     '''是否自动同意好友申请'''
     add_friend_welcome: bool = True
@@ -68,10 +108,38 @@ class Preference(BaseModel):
     '''插件内部命令头(若为""空字符串则不启用)'''
     sleep_time: float = 2
     '''任务操作冷却时间(如米游币任务)'''
+    max_concurrent_accounts: int = 5
+    '''每日自动任务同时执行的最大账户数'''
+    max_concurrent_users: int = 20
+    '''每日自动任务同时处理的最大用户数，其余用户在有空闲时才读取（同时执行的账户数仍受 max_concurrent_accounts 限制）'''
     plan_time: str = "00:30"
     '''每日自动签到和米游社任务的定时任务执行时间，格式为HH:MM'''
     resin_interval: int = 60
-    '''每次检查原神便笺间隔，单位为分钟'''
+    '''每次检查原神便笺间隔，单位为分钟（开启自适应检查时为请求失败后的重试间隔）'''
+    adaptive_note_check: bool = True
+    '''是否根据预测的树脂/开拓力恢复时间自适应安排每个账户的便笺检查'''
+    note_check_tick: int = 5
+    '''自适应便笺检查时，定时任务的运行间隔，单位为分钟'''
+    note_max_interval: int = 360
+    '''自适应便笺检查时，同一账户两次检查的最长间隔，单位为分钟'''
+    note_poll_lead: int = 10
+    '''自适应便笺检查时，在预测达到提醒阈值前提前检查的时间，单位为分钟'''
+    note_check_concurrency: int = 8
+    '''自动便笺检查时同时进行的最大请求数'''
+    outbox_workers: int = 4
+    '''通知发件箱的发送协程数'''
+    outbox_adapter_rate: float = 5
+    '''每个适配器每秒最多发送的通知数'''
+    outbox_adapter_burst: int = 10
+    '''每个适配器允许突发发送的通知数'''
+    outbox_recipient_rate: float = 0.5
+    '''每个用户每秒最多接收的通知数'''
+    outbox_recipient_burst: int = 3
+    '''每个用户允许突发接收的通知数'''
+    outbox_max_retries: int = 3
+    '''通知发送失败后的最大重试次数'''
+    outbox_retry_delay: float = 5
+    '''通知发送失败后首次重试的等待时间（之后每次翻倍），单位为秒'''
     global_geetest: bool = True
     '''是否开启使用全局极验Geetest，默认开启'''
     geetest_url: Optional[str]
@@ -121,8 +189,7 @@ class Preference(BaseModel):
     def notice_time(self) -> bool:
         now_hour = datetime.now().hour
         now_minute = datetime.now().minute
-        set_time = "20:00"
-        notice_time = int(set_time[:2]) * 60 + int(set_time[3:])
+        notice_time = int(NOTICE_TIME[:2]) * 60 + int(NOTICE_TIME[3:])
         start_time = notice_time - self.resin_interval
         end_time = notice_time + self.resin_interval
         return start_time <= (now_hour * 60 + now_minute) % (24 * 60) <= end_time
@@ -155,6 +222,14 @@ class GoodListImageConfig(BaseModel):
     '''商品列表图片缓存目录'''
     MULTI_PROCESS: bool = sys.platform != "win32"
     '''是否使用多进程生成图片（如果生成图片时崩溃，可尝试关闭此选项）'''
+    PAGE_SIZE: int = 10
+    '''每张图片最多包含的商品数量，商品较多时分为多张图片（为0则不分页）'''
+    IMAGE_FORMAT: Literal["JPEG", "WEBP"] = "JPEG"
+    '''图片格式'''
+    QUALITY: int = 85
+    '''图片质量（1-100）'''
+    PROGRESSIVE_JPEG: bool = True
+    '''图片格式为 JPEG 时是否使用渐进式编码'''
 
 
 class SaltConfig(BaseModel):
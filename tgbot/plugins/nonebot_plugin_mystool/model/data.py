@@ -1,7 +1,11 @@
+import asyncio
 import json
+import os
+import threading
 from json import JSONDecodeError
+from pathlib import Path
 from typing import Union, Optional, Any, Dict, TYPE_CHECKING, AbstractSet, \
-    Mapping, Set, Literal, List
+    Mapping, Set, Literal, List, Tuple
 from uuid import UUID, uuid4
 
 from httpx import Cookies
@@ -10,6 +14,10 @@ from pydantic import BaseModel, ValidationError, validator, Field
 
 from .._version import __version__
 from ..model.common import data_path, BaseModelWithSetter, Address, BaseModelWithUpdate, Good, GameRecord
+from ..model.config import plugin_config
+
+if TYPE_CHECKING:
+    from ..model.sqlite_storage import SqliteStorage
 
 if TYPE_CHECKING:
     IntStr = Union[int, str]
@@ -17,10 +25,13 @@ if TYPE_CHECKING:
     AbstractSetIntStr = AbstractSet[IntStr]
     MappingIntStrAny = Mapping[IntStr, Any]
 
-__all__ = ["plugin_data_path", "BBSCookies", "UserAccount", "ExchangePlan", "ExchangeResult", "uuid4_validate",
+__all__ = ["plugin_data_path", "plugin_data_log_path", "plugin_data_compacting_log_path", "BBSCookies", "UserAccount", "ExchangePlan", "ExchangeResult", "uuid4_validate",
            "UserData", "PluginData", "PluginDataManager"]
 
 plugin_data_path = data_path / "dataV2.json"
+plugin_data_log_path = data_path / "dataV2.log"
+plugin_data_compacting_log_path = data_path / "dataV2.log.compacting"
+"""正在合并到快照中的追加日志"""
 _uuid_set: Set[str] = set()
 """已使用的用户UUID密钥集合"""
 _new_uuid_in_init = False
@@ -472,13 +483,66 @@ class PluginData(BaseModel):
 
 
 class PluginDataManager:
+    """
+    插件数据管理器
+
+    插件数据由两部分组成：
+    - 插件数据文件 ``dataV2.json``：完整的插件数据快照，通过临时文件 + 重命名的方式原子地写入
+    - 追加日志 ``dataV2.log``：每行为一条发生变化的用户数据记录，加载时按顺序重放到快照之上，
+      记录数达到 ``compact_threshold`` 或定时任务运行时，日志会被重命名为 ``dataV2.log.compacting``，
+      并在线程池中与快照文件合并（只处理文件中的数据，不序列化内存中的插件数据，不阻塞事件循环）
+
+    偏好设置 ``storage_backend`` 为 ``"sqlite"`` 时，改为使用 SQLite 数据库 ``dataV2.db`` 存储，
+    ``plugin_data.users`` 将按需从数据库中读取用户数据
+    """
     plugin_data: Optional[PluginData] = None
     """加载出的插件数据对象"""
+    compact_threshold: int = 500
+    """追加日志记录数达到该值时，压缩合并为新的快照"""
+    _log_records: int = 0
+    """当前追加日志中的记录数"""
+    _lock = threading.RLock()
+    """写入锁（避免同时写入插件数据文件和追加日志）"""
+    _snapshot_lock = threading.Lock()
+    """快照文件写入锁（日志合并在其他线程中进行）"""
+    _compacting: bool = False
+    """是否正在合并追加日志"""
+    _storage: Optional["SqliteStorage"] = None
+    """使用 SQLite 存储时的数据库存储对象"""
 
     @classmethod
     def load_plugin_data(cls):
         """
-        加载插件数据文件
+        加载插件数据
+        """
+        if plugin_config.preference.storage_backend == "sqlite":
+            cls._load_sqlite()
+        else:
+            cls._load_json()
+
+    @classmethod
+    def _load_sqlite(cls):
+        """
+        连接 SQLite 插件数据库，若数据库不存在而存在插件数据文件，则先将插件数据文件迁移至数据库
+        """
+        from ..model.sqlite_storage import plugin_data_db_path, SqliteStorage, SqliteUserDict
+
+        need_migrate = not plugin_data_db_path.exists() and plugin_data_path.is_file()
+        storage = SqliteStorage()
+        if need_migrate:
+            cls._load_json()
+            storage.import_plugin_data(cls.plugin_data)
+            logger.info(f"已将插件数据文件 {plugin_data_path} 迁移至数据库 {plugin_data_db_path}，原文件将保留作为备份")
+
+        cls.plugin_data = PluginData()
+        cls.plugin_data.user_bind = storage.load_bindings()
+        cls.plugin_data.users = SqliteUserDict(storage, cls.plugin_data, plugin_config.preference.sqlite_cache_size)
+        cls._storage = storage
+
+    @classmethod
+    def _load_json(cls):
+        """
+        加载插件数据文件，并重放追加日志中的用户数据记录
         """
         if plugin_data_path.exists() and plugin_data_path.is_file():
             try:
@@ -496,20 +560,71 @@ class PluginDataManager:
         else:
             cls.plugin_data = PluginData()
             try:
-                str_data = cls.plugin_data.json(indent=4)
                 plugin_data_path.parent.mkdir(parents=True, exist_ok=True)
-                with open(plugin_data_path, "w", encoding="utf-8") as f:
-                    f.write(str_data)
+                cls._write_snapshot()
             except (AttributeError, TypeError, ValueError, PermissionError):
                 logger.exception(f"创建插件数据文件失败，请检查是否有权限读取和写入 {plugin_data_path}")
                 raise
             else:
                 logger.info(f"插件数据文件 {plugin_data_path} 不存在，已创建默认插件数据文件。")
 
+        log_paths = [path for path in (plugin_data_compacting_log_path, plugin_data_log_path) if path.is_file()]
+        for log_path in log_paths:
+            try:
+                replayed = cls._replay_log(log_path)
+            except ValidationError:
+                logger.exception(f"读取插件数据日志失败，请检查插件数据日志 {log_path} 格式是否正确")
+                raise
+            logger.info(f"已从插件数据日志 {log_path} 恢复 {replayed} 条用户数据记录")
+        if log_paths:
+            # 合并为新的快照，同时清除日志末尾可能存在的不完整记录
+            cls._write_snapshot()
+
     @classmethod
-    def write_plugin_data(cls):
+    def _read_log(cls, path: Path) -> List[Tuple[str, Optional[Dict[str, Any]]]]:
         """
-        写入插件数据文件
+        读取追加日志中的用户数据记录，末尾不完整的记录（如写入时进程崩溃）将被忽略
+
+        :param path: 日志文件路径
+        :return: 按写入顺序排列的 (用户ID, 用户数据) 记录，用户数据为 ``None`` 表示删除
+        """
+        records = []
+        with open(path, "r", encoding="utf-8") as f:
+            for line_number, line in enumerate(f, start=1):
+                if not line.strip():
+                    continue
+                try:
+                    record = json.loads(line)
+                except JSONDecodeError:
+                    logger.warning(f"插件数据日志 {path} 第 {line_number} 行记录不完整，已忽略该行及之后的记录")
+                    break
+                records.append((record["user_id"], record["user"]))
+        return records
+
+    @classmethod
+    def _replay_log(cls, path: Optional[Path] = None) -> int:
+        """
+        按顺序重放追加日志中的用户数据记录，末尾不完整的记录（如写入时进程崩溃）将被忽略
+
+        :param path: 日志文件路径，为空则使用 ``plugin_data_log_path``
+        :return: 重放的记录数
+        """
+        replayed = 0
+        for user_id, user_dict in cls._read_log(path or plugin_data_log_path):
+            if user_dict is None:
+                cls.plugin_data.users.pop(user_id, None)
+            else:
+                cls.plugin_data.users[user_id] = UserData.parse_obj(user_dict)
+            replayed += 1
+        if replayed:
+            # 被替换的用户数据对象需要重新同步到绑定它的用户上
+            cls.plugin_data.do_user_bind()
+        return replayed
+
+    @classmethod
+    def _write_snapshot(cls):
+        """
+        将完整的插件数据原子地写入插件数据文件，并清空追加日志
 
         :return: 是否成功
         """
@@ -518,10 +633,203 @@ class PluginDataManager:
         except (AttributeError, TypeError, ValueError):
             logger.exception("数据对象序列化失败，可能是数据类型错误")
             return False
-        else:
-            with open(plugin_data_path, "w", encoding="utf-8") as f:
-                f.write(str_data)
-            return True
+        with cls._snapshot_lock:
+            cls._write_snapshot_file(str_data)
+            # 快照已包含所有数据，包括尚未合并的日志
+            plugin_data_log_path.unlink(missing_ok=True)
+            plugin_data_compacting_log_path.unlink(missing_ok=True)
+        cls._log_records = 0
+        return True
+
+    @staticmethod
+    def _write_snapshot_file(str_data: str):
+        """
+        原子地写入插件数据文件
+
+        :param str_data: 插件数据文件内容
+        """
+        temp_path = plugin_data_path.with_name(f"{plugin_data_path.name}.tmp")
+        with open(temp_path, "w", encoding="utf-8") as f:
+            f.write(str_data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, plugin_data_path)
+
+    @classmethod
+    def compact(cls) -> Optional[asyncio.Future]:
+        """
+        将追加日志合并到快照中
+
+        日志会先被重命名为 ``dataV2.log.compacting``，之后的记录写入新的日志；
+        合并在线程池中进行（没有运行中的事件循环时在当前线程进行）。
+
+        :return: 合并任务，无需合并或上一次合并尚未完成时返回 ``None``
+        """
+        with cls._lock:
+            if cls._storage is not None or cls._compacting:
+                return None
+            if not plugin_data_compacting_log_path.is_file():
+                # 上一次合并失败时，先重新合并遗留的日志
+                if not plugin_data_log_path.is_file():
+                    return None
+                os.replace(plugin_data_log_path, plugin_data_compacting_log_path)
+                cls._log_records = 0
+            cls._compacting = True
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            cls._merge_compacting_log()
+            return None
+        return loop.run_in_executor(None, cls._merge_compacting_log)
+
+    @classmethod
+    def _merge_compacting_log(cls):
+        """
+        将 ``dataV2.log.compacting`` 中的记录合并到快照文件中，只处理文件中的数据，可在其他线程中运行
+        """
+        try:
+            with cls._snapshot_lock:
+                # 期间写入过完整快照时，日志已被删除
+                if not plugin_data_compacting_log_path.is_file():
+                    return
+                with open(plugin_data_path, "r", encoding="utf-8") as f:
+                    plugin_data_dict = json.load(f)
+                users = plugin_data_dict.setdefault("users", {})
+                for user_id, user_dict in cls._read_log(plugin_data_compacting_log_path):
+                    if user_dict is None:
+                        users.pop(user_id, None)
+                    else:
+                        users[user_id] = user_dict
+                cls._write_snapshot_file(json.dumps(plugin_data_dict, indent=4))
+                plugin_data_compacting_log_path.unlink()
+        except Exception:
+            logger.exception(f"合并插件数据日志 {plugin_data_compacting_log_path} 失败，将在下一次合并时重试")
+        finally:
+            cls._compacting = False
+
+    @classmethod
+    def _append_log(cls, user_id: str):
+        """
+        将某个用户的数据追加写入日志，用户数据不存在时写入删除记录
+
+        :param user_id: 用户ID（若为被绑定的用户，则写入其绑定的目标用户数据）
+        :return: 是否成功
+        """
+        user_id = cls.plugin_data.user_bind.get(user_id, user_id)
+        user = cls.plugin_data.users.get(user_id)
+        try:
+            user_json = user.json() if user is not None else "null"
+        except (AttributeError, TypeError, ValueError):
+            logger.exception("数据对象序列化失败，可能是数据类型错误")
+            return False
+        with open(plugin_data_log_path, "a", encoding="utf-8") as f:
+            f.write(f'{{"user_id": {json.dumps(user_id)}, "user": {user_json}}}\n')
+        cls._log_records += 1
+        if cls._log_records >= cls.compact_threshold:
+            cls.compact()
+        return True
+
+    @classmethod
+    def write_plugin_data(cls, user_id: Optional[str] = None):
+        """
+        写入插件数据文件
+
+        - 指定用户ID时，只将该用户的数据追加写入日志
+        - 未指定用户ID时（如修改了用户绑定关系），写入完整的插件数据快照
+
+        :param user_id: 数据发生变化的用户ID
+        :return: 是否成功
+        """
+        with cls._lock:
+            if cls._storage is not None:
+                if user_id is None:
+                    cls.plugin_data.users.write_all()
+                else:
+                    cls.plugin_data.users.write_user(user_id)
+                return True
+            elif user_id is None:
+                return cls._write_snapshot()
+            else:
+                return cls._append_log(user_id)
+
+    @classmethod
+    def _find_users(cls, user_ids: List[str]) -> List[Tuple[str, UserData]]:
+        users = []
+        for user_id in user_ids:
+            if (user := cls.plugin_data.users.get(user_id)) is not None:
+                users.append((user_id, user))
+        return users
+
+    @classmethod
+    async def get_user_async(cls, user_id: str) -> Optional[UserData]:
+        """
+        获取用户数据，使用 SQLite 存储时从数据库读取不会阻塞事件循环（在协程中应使用该方法）
+
+        :param user_id: 用户ID
+        """
+        if cls._storage is not None:
+            return await cls.plugin_data.users.get_async(user_id)
+        return cls.plugin_data.users.get(user_id)
+
+    @classmethod
+    def find_users_by_uuid(cls, uuid: str) -> List[Tuple[str, UserData]]:
+        """
+        通过UUID密钥查找用户（不包含被绑定的用户）
+
+        :param uuid: 用户UUID密钥
+        :return: [(用户ID, 用户数据)]
+        """
+        if cls._storage is not None:
+            return cls._find_users(cls._storage.find_user_ids_by_uuid(uuid))
+        return [(user_id, user) for user_id, user in cls.plugin_data.users.items()
+                if user_id not in cls.plugin_data.user_bind and user.uuid == uuid]
+
+    @classmethod
+    async def find_users_by_uuid_async(cls, uuid: str) -> List[Tuple[str, UserData]]:
+        """
+        通过UUID密钥查找用户（不包含被绑定的用户），不阻塞事件循环
+
+        :param uuid: 用户UUID密钥
+        :return: [(用户ID, 用户数据)]
+        """
+        if cls._storage is None:
+            return cls.find_users_by_uuid(uuid)
+        users = []
+        for user_id in await cls._storage.find_user_ids_by_uuid_async(uuid):
+            if (user := await cls.get_user_async(user_id)) is not None:
+                users.append((user_id, user))
+        return users
+
+    @classmethod
+    def find_users_by_bbs_uid(cls, bbs_uid: str) -> List[Tuple[str, UserData]]:
+        """
+        通过米游社UID查找绑定了该米游社账户的用户（不包含被绑定的用户）
+
+        :param bbs_uid: 米游社UID
+        :return: [(用户ID, 用户数据)]
+        """
+        if cls._storage is not None:
+            return cls._find_users(cls._storage.find_user_ids_by_bbs_uid(bbs_uid))
+        return [(user_id, user) for user_id, user in cls.plugin_data.users.items()
+                if user_id not in cls.plugin_data.user_bind and bbs_uid in user.accounts]
+
+    @classmethod
+    def count_users(cls) -> int:
+        """
+        获取用户数量（不包含被绑定的用户）
+        """
+        if cls._storage is not None:
+            return cls._storage.count_users()
+        return len(set(cls.plugin_data.users.values()))
+
+    @classmethod
+    async def count_users_async(cls) -> int:
+        """
+        获取用户数量（不包含被绑定的用户），不阻塞事件循环
+        """
+        if cls._storage is not None:
+            return await cls._storage.count_users_async()
+        return cls.count_users()
 
 
 PluginDataManager.load_plugin_data()
@@ -0,0 +1,148 @@
+import asyncio
+import sqlite3
+import threading
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from nonebot.log import logger
+from pydantic import BaseModel
+
+from .common import data_path, GenshinNoteNotice, StarRailNoteNotice
+
+__all__ = ["note_notice_db_path", "NoteNoticeStatus", "NoteNoticeStore"]
+
+note_notice_db_path = data_path / "note_notice.db"
+"""便笺通知状态数据库路径"""
+
+
+class NoteNoticeStatus(BaseModel):
+    """
+    账号便笺通知状态
+    """
+    genshin = GenshinNoteNotice()
+    starrail = StarRailNoteNotice()
+
+
+class NoteNoticeStore:
+    """
+    便笺通知状态存储
+
+    通知状态保存在 SQLite 数据库中，重启后不会重复提醒已提醒过的账户。
+    每个米游社账户的状态在首次访问时才从数据库读取，修改后先保留在内存中，调用 ``flush`` 时再批量写入，写入后移出内存。
+    批量检查前应先调用 ``preload_async`` 一次性读取所需的状态，检查后调用 ``flush_async``，数据库操作不会阻塞事件循环。
+    """
+    _cache: Dict[str, NoteNoticeStatus] = {}
+    """已读取的通知状态 {米游社UID: 通知状态}"""
+    _dirty: Set[str] = set()
+    """已修改但尚未写入数据库的米游社UID"""
+    _connection: Optional[sqlite3.Connection] = None
+    _lock = threading.Lock()
+
+    @classmethod
+    def _get_connection(cls) -> sqlite3.Connection:
+        if cls._connection is None:
+            note_notice_db_path.parent.mkdir(parents=True, exist_ok=True)
+            cls._connection = sqlite3.connect(note_notice_db_path, check_same_thread=False)
+            cls._connection.execute(
+                "CREATE TABLE IF NOT EXISTS note_notice (bbs_uid TEXT PRIMARY KEY, data TEXT NOT NULL)")
+        return cls._connection
+
+    @classmethod
+    def preload(cls, bbs_uids: Iterable[str]):
+        """
+        一次性读取多个账户的通知状态（已读取的账户会被跳过）
+
+        :param bbs_uids: 米游社UID
+        """
+        missing = [bbs_uid for bbs_uid in set(bbs_uids) if bbs_uid not in cls._cache]
+        rows: Dict[str, str] = {}
+        with cls._lock:
+            try:
+                connection = cls._get_connection()
+                # 分批查询，避免超出 SQLite 的参数数量限制
+                for i in range(0, len(missing), 500):
+                    batch = missing[i:i + 500]
+                    rows.update(connection.execute(
+                        f"SELECT bbs_uid, data FROM note_notice WHERE bbs_uid IN ({','.join('?' * len(batch))})",
+                        batch).fetchall())
+            except sqlite3.Error:
+                logger.exception("批量读取便笺通知状态失败")
+        for bbs_uid in missing:
+            status = NoteNoticeStatus.parse_raw(rows[bbs_uid]) if bbs_uid in rows else NoteNoticeStatus()
+            cls._cache.setdefault(bbs_uid, status)
+
+    @classmethod
+    async def preload_async(cls, bbs_uids: Iterable[str]):
+        """
+        在线程池中一次性读取多个账户的通知状态，不阻塞事件循环
+
+        :param bbs_uids: 米游社UID
+        """
+        await asyncio.get_running_loop().run_in_executor(None, cls.preload, list(bbs_uids))
+
+    @classmethod
+    async def get_async(cls, bbs_uid: str) -> NoteNoticeStatus:
+        """
+        获取账户的便笺通知状态，未读取时在线程池中读取，修改后需要调用 ``mark_dirty``
+
+        :param bbs_uid: 米游社UID
+        """
+        if (status := cls._cache.get(bbs_uid)) is not None:
+            return status
+        await cls.preload_async([bbs_uid])
+        return cls._cache[bbs_uid]
+
+    @classmethod
+    def mark_dirty(cls, bbs_uid: str, status: NoteNoticeStatus):
+        """
+        标记账户的通知状态已修改
+
+        :param bbs_uid: 米游社UID
+        :param status: 修改后的通知状态（若已在写入后被移出缓存，则重新放入）
+        """
+        cls._cache.setdefault(bbs_uid, status)
+        cls._dirty.add(bbs_uid)
+
+    @classmethod
+    def _take_dirty_rows(cls) -> Tuple[Set[str], List[Tuple[str, str]]]:
+        """
+        取出所有已修改的通知状态并序列化
+        """
+        dirty, cls._dirty = cls._dirty, set()
+        rows = [(bbs_uid, cls._cache[bbs_uid].json(exclude_none=True)) for bbs_uid in dirty if bbs_uid in cls._cache]
+        return dirty, rows
+
+    @classmethod
+    def flush(cls):
+        """
+        将所有已修改的通知状态写入数据库
+        """
+        if cls._dirty:
+            cls._write_rows(*cls._take_dirty_rows())
+        cls._evict()
+
+    @classmethod
+    async def flush_async(cls):
+        """
+        在线程池中将所有已修改的通知状态写入数据库，不阻塞事件循环（序列化在调用处完成）
+        """
+        if cls._dirty:
+            await asyncio.get_running_loop().run_in_executor(None, cls._write_rows, *cls._take_dirty_rows())
+        cls._evict()
+
+    @classmethod
+    def _evict(cls):
+        """
+        移出已写入数据库的通知状态，只保留尚未写入的部分，避免缓存随账户数量无限增长
+        """
+        cls._cache = {bbs_uid: cls._cache[bbs_uid] for bbs_uid in cls._dirty if bbs_uid in cls._cache}
+
+    @classmethod
+    def _write_rows(cls, dirty: Set[str], rows: List[Tuple[str, str]]):
+        with cls._lock:
+            try:
+                with cls._get_connection() as connection:
+                    connection.executemany(
+                        "INSERT OR REPLACE INTO note_notice (bbs_uid, data) VALUES (?, ?)", rows)
+            except sqlite3.Error:
+                logger.exception("写入便笺通知状态失败")
+                cls._dirty |= dirty
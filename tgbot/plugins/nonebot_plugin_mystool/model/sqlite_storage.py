@@ -0,0 +1,419 @@
+import asyncio
+import json
+import sqlite3
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Callable, Collection, Dict, Iterator, List, MutableMapping, Optional, Set, Tuple, TypeVar
+from weakref import WeakValueDictionary
+
+from nonebot.log import logger
+
+from .common import data_path
+from .data import PluginData, UserData
+
+__all__ = ["plugin_data_db_path", "SqliteStorage", "SqliteUserDict"]
+
+plugin_data_db_path = data_path / "dataV2.db"
+"""SQLite 插件数据库默认路径"""
+
+_T = TypeVar("_T")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    user_id TEXT PRIMARY KEY,
+    uuid TEXT,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_users_uuid ON users (uuid);
+CREATE TABLE IF NOT EXISTS accounts (
+    user_id TEXT NOT NULL,
+    bbs_uid TEXT NOT NULL,
+    data TEXT NOT NULL,
+    PRIMARY KEY (user_id, bbs_uid)
+);
+CREATE INDEX IF NOT EXISTS idx_accounts_bbs_uid ON accounts (bbs_uid);
+CREATE TABLE IF NOT EXISTS exchange_plans (
+    user_id TEXT NOT NULL,
+    plan_index INTEGER NOT NULL,
+    data TEXT NOT NULL,
+    PRIMARY KEY (user_id, plan_index)
+);
+CREATE TABLE IF NOT EXISTS bindings (
+    src TEXT PRIMARY KEY,
+    dst TEXT NOT NULL
+);
+"""
+
+_UserRows = Tuple[Optional[str], str, List[Tuple[str, str]], List[str]]
+"""用户数据对应的数据行 (UUID, 用户数据, [(米游社UID, 账户数据)], [兑换计划数据])"""
+
+
+def _dump_user(user: UserData) -> _UserRows:
+    """
+    将用户数据拆分为各个数据表中的数据行
+    """
+    return (
+        user.uuid,
+        user.json(exclude={"accounts", "exchange_plans"}),
+        [(bbs_uid, account.json()) for bbs_uid, account in user.accounts.items()],
+        [plan.json() for plan in user.exchange_plans]
+    )
+
+
+def _load_user(rows: _UserRows) -> UserData:
+    """
+    由各个数据表中的数据行还原用户数据
+    """
+    _, user_json, accounts, plans = rows
+    user_dict = json.loads(user_json)
+    user_dict["accounts"] = {bbs_uid: json.loads(account_json) for bbs_uid, account_json in accounts}
+    user_dict["exchange_plans"] = [json.loads(plan_json) for plan_json in plans]
+    return UserData.parse_obj(user_dict)
+
+
+class SqliteStorage:
+    """
+    基于 SQLite 的插件数据存储
+
+    所有数据库操作都在同一个后台线程中按提交顺序执行：写入操作提交后立即返回，不阻塞事件循环；
+    读取操作会排在之前提交的写入之后，因此总能读到最新的数据。
+    在协程中应使用 ``*_async`` 读取方法，等待读取时不会阻塞事件循环。
+    """
+
+    def __init__(self, path: Path = plugin_data_db_path):
+        self.path = path
+        self._connection: Optional[sqlite3.Connection] = None
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="mystool-sqlite")
+
+    def _get_connection(self) -> sqlite3.Connection:
+        """
+        获取数据库连接，只会在后台线程中调用
+        """
+        if self._connection is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._connection = sqlite3.connect(self.path)
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute("PRAGMA synchronous=NORMAL")
+            self._connection.executescript(_SCHEMA)
+        return self._connection
+
+    def _submit(self, func: Callable[..., _T], *args: Any) -> "Future[_T]":
+        return self._executor.submit(lambda: func(self._get_connection(), *args))
+
+    def _read(self, func: Callable[..., _T], *args: Any) -> _T:
+        return self._submit(func, *args).result()
+
+    async def _read_async(self, func: Callable[..., _T], *args: Any) -> _T:
+        return await asyncio.wrap_future(self._submit(func, *args))
+
+    def _write(self, func: Callable[..., Any], *args: Any) -> Future:
+        future = self._submit(func, *args)
+        future.add_done_callback(self._on_write_done)
+        return future
+
+    def _on_write_done(self, future: Future):
+        if exception := future.exception():
+            logger.opt(exception=exception).error(f"写入插件数据库 {self.path} 失败")
+
+    @staticmethod
+    def _select_user(connection: sqlite3.Connection, user_id: str) -> Optional[_UserRows]:
+        row = connection.execute("SELECT uuid, data FROM users WHERE user_id = ?", (user_id,)).fetchone()
+        if row is None:
+            return None
+        accounts = connection.execute(
+            "SELECT bbs_uid, data FROM accounts WHERE user_id = ?", (user_id,)).fetchall()
+        plans = connection.execute(
+            "SELECT data FROM exchange_plans WHERE user_id = ? ORDER BY plan_index", (user_id,)).fetchall()
+        return row[0], row[1], accounts, [plan for plan, in plans]
+
+    @staticmethod
+    def _delete_user_rows(connection: sqlite3.Connection, user_id: str):
+        for table in "users", "accounts", "exchange_plans":
+            connection.execute(f"DELETE FROM {table} WHERE user_id = ?", (user_id,))
+
+    @classmethod
+    def _save_users(cls, connection: sqlite3.Connection, users: Dict[str, _UserRows], deleted: Set[str]):
+        with connection:
+            for user_id in deleted:
+                cls._delete_user_rows(connection, user_id)
+            for user_id, (uuid, user_json, accounts, plans) in users.items():
+                cls._delete_user_rows(connection, user_id)
+                connection.execute("INSERT INTO users (user_id, uuid, data) VALUES (?, ?, ?)",
+                                   (user_id, uuid, user_json))
+                connection.executemany("INSERT INTO accounts (user_id, bbs_uid, data) VALUES (?, ?, ?)",
+                                       ((user_id, bbs_uid, data) for bbs_uid, data in accounts))
+                connection.executemany("INSERT INTO exchange_plans (user_id, plan_index, data) VALUES (?, ?, ?)",
+                                       ((user_id, i, data) for i, data in enumerate(plans)))
+
+    @classmethod
+    def _save_bindings(cls, connection: sqlite3.Connection, bindings: Dict[str, str]):
+        with connection:
+            connection.execute("DELETE FROM bindings")
+            connection.executemany("INSERT INTO bindings (src, dst) VALUES (?, ?)", bindings.items())
+            # 被绑定的用户直接使用目标用户的数据，不再保留自己的数据
+            for src in bindings:
+                cls._delete_user_rows(connection, src)
+
+    def load_user(self, user_id: str) -> Optional[UserData]:
+        """
+        读取用户数据
+
+        :param user_id: 用户ID
+        """
+        return self._parse_user(user_id, self._read(self._select_user, user_id))
+
+    async def load_user_async(self, user_id: str) -> Optional[UserData]:
+        """
+        读取用户数据，不阻塞事件循环
+
+        :param user_id: 用户ID
+        """
+        return self._parse_user(user_id, await self._read_async(self._select_user, user_id))
+
+    def _parse_user(self, user_id: str, rows: Optional[_UserRows]) -> Optional[UserData]:
+        if rows is None:
+            return None
+        user = _load_user(rows)
+        if rows[0] != user.uuid:
+            # 旧数据中没有UUID密钥，初始化时进行了生成，需要保存
+            self.save_users({user_id: user})
+        return user
+
+    def load_bindings(self) -> Dict[str, str]:
+        """
+        读取所有用户数据绑定关系
+        """
+        return dict(self._read(lambda connection: connection.execute("SELECT src, dst FROM bindings").fetchall()))
+
+    def list_user_ids(self) -> List[str]:
+        """
+        获取所有用户ID（不包含被绑定的用户）
+        """
+        rows = self._read(self._select_user_ids)
+        return [user_id for user_id, in rows]
+
+    async def list_user_ids_async(self) -> List[str]:
+        """
+        获取所有用户ID（不包含被绑定的用户），不阻塞事件循环
+        """
+        rows = await self._read_async(self._select_user_ids)
+        return [user_id for user_id, in rows]
+
+    @staticmethod
+    def _select_user_ids(connection: sqlite3.Connection) -> List[Tuple[str]]:
+        return connection.execute("SELECT user_id FROM users").fetchall()
+
+    @staticmethod
+    def _count_users(connection: sqlite3.Connection, exclude: Collection[str] = ()) -> int:
+        if not exclude:
+            return connection.execute("SELECT COUNT(*) FROM users").fetchone()[0]
+        exclude = list(exclude)
+        return connection.execute(
+            f"SELECT COUNT(*) FROM users WHERE user_id NOT IN ({','.join('?' * len(exclude))})", exclude).fetchone()[0]
+
+    def count_users(self, exclude: Collection[str] = ()) -> int:
+        """
+        获取用户数量（不包含被绑定的用户）
+
+        :param exclude: 不计入的用户ID
+        """
+        return self._read(self._count_users, exclude)
+
+    async def count_users_async(self) -> int:
+        """
+        获取用户数量（不包含被绑定的用户），不阻塞事件循环
+        """
+        return await self._read_async(self._count_users)
+
+    @staticmethod
+    def _select_user_ids_by_uuid(connection: sqlite3.Connection, uuid: str) -> List[Tuple[str]]:
+        return connection.execute("SELECT user_id FROM users WHERE uuid = ?", (uuid,)).fetchall()
+
+    def find_user_ids_by_uuid(self, uuid: str) -> List[str]:
+        """
+        通过UUID密钥查找用户ID
+        """
+        return [user_id for user_id, in self._read(self._select_user_ids_by_uuid, uuid)]
+
+    async def find_user_ids_by_uuid_async(self, uuid: str) -> List[str]:
+        """
+        通过UUID密钥查找用户ID，不阻塞事件循环
+        """
+        return [user_id for user_id, in await self._read_async(self._select_user_ids_by_uuid, uuid)]
+
+    def find_user_ids_by_bbs_uid(self, bbs_uid: str) -> List[str]:
+        """
+        通过米游社UID查找绑定了该账户的用户ID
+        """
+        rows = self._read(
+            lambda connection: connection.execute(
+                "SELECT DISTINCT user_id FROM accounts WHERE bbs_uid = ?", (bbs_uid,)).fetchall())
+        return [user_id for user_id, in rows]
+
+    def save_users(self, users: Dict[str, UserData], deleted: Set[str] = frozenset()) -> Future:
+        """
+        保存用户数据（序列化在调用处完成，写入在后台线程中进行）
+
+        :param users: 需要保存的用户数据
+        :param deleted: 需要删除的用户ID
+        """
+        rows = {user_id: _dump_user(user) for user_id, user in users.items()}
+        return self._write(self._save_users, rows, set(deleted))
+
+    def save_bindings(self, bindings: Dict[str, str]) -> Future:
+        """
+        保存用户数据绑定关系
+
+        :param bindings: 用户数据绑定关系
+        """
+        return self._write(self._save_bindings, dict(bindings))
+
+    def import_plugin_data(self, plugin_data: PluginData):
+        """
+        将完整的插件数据导入数据库，用于从 dataV2.json 迁移
+
+        :param plugin_data: 插件数据
+        """
+        users = {user_id: user for user_id, user in plugin_data.users.items() if user_id not in plugin_data.user_bind}
+        self.save_users(users).result()
+        self.save_bindings(plugin_data.user_bind).result()
+
+
+class SqliteUserDict(MutableMapping[str, UserData]):
+    """
+    按需从 SQLite 读取用户数据的 ``PluginData.users``
+
+    - 被绑定的用户ID会解析为其目标用户ID，返回同一个用户数据对象
+    - 仍被引用或最近使用的用户数据对象会被复用，其余的会被释放，内存占用不随用户总数增长
+    - 修改后的数据在调用 ``PluginDataManager.write_plugin_data`` 时写入
+    - 同步访问（如 ``users[user_id]``）在数据未缓存时会等待数据库读取，
+      在协程中应使用 ``get_async``（或 ``PluginDataManager.get_user_async``）和 ``user_ids_async``，读取不会阻塞事件循环
+    """
+
+    def __init__(self, storage: SqliteStorage, plugin_data: PluginData, cache_size: int = 1024):
+        self._storage = storage
+        self._plugin_data = plugin_data
+        self._cache_size = max(1, cache_size)
+        self._referenced: "WeakValueDictionary[str, UserData]" = WeakValueDictionary()
+        """仍被引用的用户数据对象"""
+        self._recent: "OrderedDict[str, UserData]" = OrderedDict()
+        """最近使用的用户数据对象"""
+        self._deleted: Set[str] = set()
+        """已删除但尚未写入的用户ID"""
+        self._lock = threading.RLock()
+
+    def _resolve(self, user_id: str) -> str:
+        return self._plugin_data.user_bind.get(user_id, user_id)
+
+    def _remember(self, user_id: str, user: UserData):
+        self._referenced[user_id] = user
+        self._recent[user_id] = user
+        self._recent.move_to_end(user_id)
+        while len(self._recent) > self._cache_size:
+            self._recent.popitem(last=False)
+
+    def __getitem__(self, user_id: str) -> UserData:
+        user_id = self._resolve(user_id)
+        with self._lock:
+            if user_id in self._deleted:
+                raise KeyError(user_id)
+            user = self._referenced.get(user_id)
+            if user is None:
+                user = self._storage.load_user(user_id)
+                if user is None:
+                    raise KeyError(user_id)
+            self._remember(user_id, user)
+            return user
+
+    async def get_async(self, user_id: str) -> Optional[UserData]:
+        """
+        获取用户数据，需要从数据库读取时不阻塞事件循环
+
+        :param user_id: 用户ID
+        """
+        user_id = self._resolve(user_id)
+        with self._lock:
+            if user_id in self._deleted:
+                return None
+            user = self._referenced.get(user_id)
+        if user is None:
+            loaded = await self._storage.load_user_async(user_id)
+            if loaded is None:
+                return None
+            with self._lock:
+                if user_id in self._deleted:
+                    return None
+                # 等待读取期间可能已有其他调用加载了该用户，应使用同一个对象
+                user = self._referenced.get(user_id) or loaded
+        with self._lock:
+            self._remember(user_id, user)
+        return user
+
+    async def user_ids_async(self) -> List[str]:
+        """
+        获取所有用户ID（包含被绑定的用户），只读取ID而不加载用户数据，不阻塞事件循环
+        """
+        stored_ids = await self._storage.list_user_ids_async()
+        with self._lock:
+            user_ids = set(stored_ids)
+            user_ids.update(self._referenced.keys())
+            user_ids.difference_update(self._deleted)
+        user_ids.update(self._plugin_data.user_bind.keys())
+        return list(user_ids)
+
+    def __setitem__(self, user_id: str, user: UserData):
+        # 被绑定的用户直接使用目标用户的数据
+        if user_id in self._plugin_data.user_bind:
+            return
+        with self._lock:
+            self._deleted.discard(user_id)
+            self._remember(user_id, user)
+
+    def __delitem__(self, user_id: str):
+        # 被绑定用户的数据不会单独保存，解除绑定后可能不存在对应的数据，因此这里不会抛出 KeyError
+        with self._lock:
+            self._referenced.pop(user_id, None)
+            self._recent.pop(user_id, None)
+            self._deleted.add(user_id)
+
+    def __iter__(self) -> Iterator[str]:
+        with self._lock:
+            user_ids = set(self._storage.list_user_ids())
+            user_ids.update(self._referenced.keys())
+            user_ids.difference_update(self._deleted)
+        user_ids.update(self._plugin_data.user_bind.keys())
+        return iter(list(user_ids))
+
+    def __len__(self) -> int:
+        # 已加载的用户可能尚未写入数据库，单独计数；被绑定的用户没有单独的数据
+        with self._lock:
+            loaded = set(self._referenced.keys())
+            excluded = loaded | self._deleted
+        return self._storage.count_users(excluded) + len(loaded) + len(self._plugin_data.user_bind)
+
+    def write_user(self, user_id: str):
+        """
+        写入某个用户的数据（若已删除则删除数据库中的数据）
+
+        :param user_id: 用户ID
+        """
+        user_id = self._resolve(user_id)
+        with self._lock:
+            if user_id in self._deleted:
+                self._deleted.discard(user_id)
+                self._storage.save_users({}, {user_id})
+            elif (user := self._referenced.get(user_id)) is not None:
+                self._storage.save_users({user_id: user})
+
+    def write_all(self):
+        """
+        写入所有已加载的用户数据、已删除的用户以及用户数据绑定关系
+        """
+        with self._lock:
+            users = {user_id: user for user_id, user in self._referenced.items()
+                     if user_id not in self._plugin_data.user_bind}
+            self._storage.save_users(users, self._deleted)
+            self._deleted.clear()
+            self._storage.save_bindings(self._plugin_data.user_bind)
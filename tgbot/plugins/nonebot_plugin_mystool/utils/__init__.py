@@ -1,2 +1,7 @@
 from .common import *
+from .client import *
+from .limiter import *
+from .cache import *
+from .note_schedule import *
+from .outbox import *
 from .good_image import *
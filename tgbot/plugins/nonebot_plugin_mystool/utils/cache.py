@@ -0,0 +1,104 @@
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, Generic, Hashable, Optional, Tuple, TypeVar
+
+__all__ = ["AsyncTTLCache"]
+
+_K = TypeVar("_K", bound=Hashable)
+_V = TypeVar("_V")
+
+
+class AsyncTTLCache(Generic[_K, _V]):
+    """
+    带过期时间的异步缓存
+
+    同一个键同一时间只会有一个加载协程在运行（single-flight），其他并发的调用会等待并共享该次加载的结果；
+    发起加载的调用被取消时，其他等待者不会被取消，而是重新发起加载。
+    """
+
+    def __init__(self, ttl: float, maxsize: Optional[int] = None):
+        """
+        :param ttl: 缓存有效时间（单位：秒）
+        :param maxsize: 最大缓存数量，超出时淘汰最久未使用的缓存，为空则不限制
+        """
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._values: "OrderedDict[_K, Tuple[float, _V]]" = OrderedDict()
+        """缓存的值 {键: (过期时间, 值)}"""
+        self._pending: Dict[_K, asyncio.Future] = {}
+        """正在进行的加载"""
+
+    async def get(
+            self,
+            key: _K,
+            loader: Callable[[], Awaitable[_V]],
+            cacheable: Callable[[_V], bool] = lambda _: True
+    ) -> _V:
+        """
+        获取缓存的值，缓存不存在或已过期时调用 ``loader`` 加载
+
+        :param key: 缓存键
+        :param loader: 加载函数
+        :param cacheable: 判断加载结果是否可以缓存（如请求失败的结果不应缓存）
+        """
+        loop = asyncio.get_running_loop()
+        while True:
+            if (item := self._values.get(key)) is not None:
+                expire_time, value = item
+                if expire_time > time.monotonic():
+                    self._values.move_to_end(key)
+                    return value
+                del self._values[key]
+
+            pending = self._pending.get(key)
+            if pending is None or pending.get_loop() is not loop:
+                break
+            try:
+                return await asyncio.shield(pending)
+            except asyncio.CancelledError:
+                # 只有发起加载的调用被取消时，其他等待者重新获取（重新发起加载或等待新的加载）
+                if pending.cancelled():
+                    continue
+                raise
+
+        future = loop.create_future()
+        self._pending[key] = future
+        try:
+            value = await loader()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            # 避免没有其他等待者时出现 "Future exception was never retrieved"
+            future.exception()
+            raise
+        else:
+            future.set_result(value)
+            if cacheable(value) and self._pending.get(key) is future:
+                self._set(key, value)
+            return value
+        finally:
+            if self._pending.get(key) is future:
+                del self._pending[key]
+
+    def _set(self, key: _K, value: _V):
+        self._values[key] = (time.monotonic() + self.ttl, value)
+        self._values.move_to_end(key)
+        if self.maxsize is not None:
+            while len(self._values) > self.maxsize:
+                self._values.popitem(last=False)
+
+    def invalidate(self, key: Optional[_K] = None):
+        """
+        使缓存失效，正在进行的加载结果也不会被缓存
+
+        :param key: 缓存键，为空则清空全部缓存
+        """
+        if key is None:
+            self._values.clear()
+            self._pending.clear()
+        else:
+            self._values.pop(key, None)
+            self._pending.pop(key, None)
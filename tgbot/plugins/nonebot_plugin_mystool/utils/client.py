@@ -0,0 +1,161 @@
+import asyncio
+from http.cookiejar import CookieJar, DefaultCookiePolicy
+from typing import AsyncIterator, Dict, Optional
+from weakref import WeakKeyDictionary
+
+import httpx
+from nonebot.log import logger
+
+from ..model import plugin_config
+
+__all__ = ["HttpClientManager", "get_client", "BYPASS_HOST_LIMIT"]
+
+BYPASS_HOST_LIMIT = {"mystool_bypass_host_limit": True}
+"""
+作为请求的 ``extensions`` 传入时，该请求不受每个主机最大并发请求数的限制（用于兑换等对时间敏感的请求）
+"""
+
+
+class _ReleasingStream(httpx.AsyncByteStream):
+    """
+    响应体读取完毕并关闭后释放主机并发名额的响应流
+    """
+
+    def __init__(self, stream: httpx.AsyncByteStream, semaphore: asyncio.Semaphore):
+        self._stream = stream
+        self._semaphore = semaphore
+        self._released = False
+
+    async def __aiter__(self) -> AsyncIterator[bytes]:
+        async for chunk in self._stream:
+            yield chunk
+
+    async def aclose(self) -> None:
+        try:
+            await self._stream.aclose()
+        finally:
+            if not self._released:
+                self._released = True
+                self._semaphore.release()
+
+
+class _PerHostTransport(httpx.AsyncBaseTransport):
+    """
+    按目标主机分发请求的传输层，每个主机（如 api-takumi.mihoyo.com、bbs-api.mihoyo.com）拥有独立的 keep-alive 连接池
+
+    若设置了每个主机的最大并发请求数，超出的请求会排队等待，而不是因连接池已满而超时失败；
+    带有 ``BYPASS_HOST_LIMIT`` 扩展的请求不排队
+    """
+
+    def __init__(self, http2: bool, limits: httpx.Limits, max_concurrent_requests: Optional[int] = None):
+        self._http2 = http2
+        self._limits = limits
+        self._max_concurrent_requests = max_concurrent_requests
+        self._transports: Dict[str, httpx.AsyncHTTPTransport] = {}
+        self._semaphores: Dict[str, asyncio.Semaphore] = {}
+
+    def _get_transport(self, host: str) -> httpx.AsyncHTTPTransport:
+        transport = self._transports.get(host)
+        if transport is None:
+            transport = httpx.AsyncHTTPTransport(http2=self._http2, limits=self._limits)
+            self._transports[host] = transport
+        return transport
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        host = request.url.host
+        if not self._max_concurrent_requests or request.extensions.get("mystool_bypass_host_limit"):
+            return await self._get_transport(host).handle_async_request(request)
+
+        semaphore = self._semaphores.setdefault(host, asyncio.Semaphore(self._max_concurrent_requests))
+        await semaphore.acquire()
+        try:
+            response = await self._get_transport(host).handle_async_request(request)
+        except BaseException:
+            semaphore.release()
+            raise
+        response.stream = _ReleasingStream(response.stream, semaphore)
+        return response
+
+    async def aclose(self) -> None:
+        transports = list(self._transports.values())
+        self._transports.clear()
+        self._semaphores.clear()
+        for transport in transports:
+            await transport.aclose()
+
+
+class HttpClientManager:
+    """
+    插件共用的 httpx.AsyncClient 管理器
+
+    每个事件循环拥有一个共享的客户端，客户端内部按主机维护连接池，避免每次请求都重新进行 DNS 解析、TCP 连接和 TLS 握手。
+    共享客户端不会保存服务器返回的 Cookies，不同账号的 Cookies 仍需在每次请求时单独传入。
+    """
+    _clients: "WeakKeyDictionary[asyncio.AbstractEventLoop, httpx.AsyncClient]" = WeakKeyDictionary()
+    """事件循环与对应的共享客户端"""
+
+    @classmethod
+    def _http2_available(cls) -> bool:
+        """
+        是否可以启用 HTTP/2（需要安装 h2）
+        """
+        if not plugin_config.preference.http2:
+            return False
+        try:
+            import h2  # noqa: F401
+        except ImportError:
+            logger.warning(f"{plugin_config.preference.log_head}未安装 h2，无法启用 HTTP/2，将使用 HTTP/1.1")
+            return False
+        return True
+
+    @classmethod
+    def _create_client(cls) -> httpx.AsyncClient:
+        """
+        创建新的共享客户端
+        """
+        limits = httpx.Limits(
+            max_connections=plugin_config.preference.http_max_connections,
+            max_keepalive_connections=plugin_config.preference.http_max_keepalive_connections,
+            keepalive_expiry=plugin_config.preference.http_keepalive_expiry
+        )
+        # 拒绝保存任何 Cookie，防止不同账号的 Cookies 在共享客户端中互相污染
+        cookie_jar = CookieJar(policy=DefaultCookiePolicy(allowed_domains=[]))
+        return httpx.AsyncClient(
+            transport=_PerHostTransport(
+                cls._http2_available(),
+                limits,
+                plugin_config.preference.http_max_concurrent_requests
+            ),
+            cookies=httpx.Cookies(cookie_jar),
+            timeout=plugin_config.preference.timeout
+        )
+
+    @classmethod
+    def get_client(cls) -> httpx.AsyncClient:
+        """
+        获取当前事件循环下的共享客户端，需要在协程中调用
+        """
+        loop = asyncio.get_running_loop()
+        client: Optional[httpx.AsyncClient] = cls._clients.get(loop)
+        if client is None or client.is_closed:
+            client = cls._create_client()
+            cls._clients[loop] = client
+        return client
+
+    @classmethod
+    async def close_all(cls):
+        """
+        关闭当前事件循环下的共享客户端及其所有连接池，用于 NoneBot 关闭时的清理
+        """
+        loop = asyncio.get_running_loop()
+        client = cls._clients.pop(loop, None)
+        if client is not None and not client.is_closed:
+            await client.aclose()
+            logger.info(f"{plugin_config.preference.log_head}已关闭共享的网络请求连接池")
+
+
+def get_client() -> httpx.AsyncClient:
+    """
+    获取当前事件循环下的共享 httpx.AsyncClient
+    """
+    return HttpClientManager.get_client()
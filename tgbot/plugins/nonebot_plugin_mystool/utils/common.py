@@ -9,10 +9,9 @@ import uuid
 from copy import deepcopy
 from pathlib import Path
 from typing import (Dict, Literal,
-                    Union, Optional, Tuple, Iterable, List)
+                    Union, Optional, Tuple, Iterable, List, AsyncIterator)
 from urllib.parse import urlencode
 
-import httpx
 import nonebot.log
 import nonebot.plugin
 import tenacity
@@ -36,13 +35,15 @@ from nonebot.log import logger
 from nonebot.log import logger
 from qrcode import QRCode
 
+from .client import get_client
 from ..model import GeetestResult, PluginDataManager, Preference, plugin_config, plugin_env, UserData
+from ..model.sqlite_storage import SqliteUserDict
 
 __all__ = ["GeneralMessageEvent", "GeneralPrivateMessageEvent", "GeneralGroupMessageEvent", "CommandBegin",
            "get_last_command_sep", "COMMAND_BEGIN", "set_logger", "logger", "PLUGIN", "custom_attempt_times",
            "get_async_retry", "generate_device_id", "cookie_str_to_dict", "cookie_dict_to_str", "generate_ds",
-           "get_validate", "generate_seed_id", "generate_fp_locally", "get_file", "blur_phone", "generate_qr_img",
-           "send_private_msg", "get_unique_users", "get_all_bind", "read_blacklist", "read_whitelist",
+           "get_validate", "generate_seed_id", "generate_fp_locally", "get_file", "prune_file_cache", "blur_phone",
+           "generate_qr_img", "send_private_msg", "get_unique_users", "iter_unique_users", "get_all_bind", "read_blacklist", "read_whitelist",
            "read_admin_list"]
 
 # 启用 nonebot-plugin-send-anything-anywhere 的自动选择 Bot 功能
@@ -261,13 +262,13 @@ async def get_validate(user: UserData, gt: str = None, challenge: str = None, re
     debug_log = {"geetest_url": geetest_url, "params": params, "content": content}
     logger.debug(f"{plugin_config.preference.log_head}get_validate: {debug_log}")
     try:
-        async with httpx.AsyncClient() as client:
-            res = await client.post(
-                geetest_url,
-                params=params,
-                json=content,
-                timeout=60
-            )
+        client = get_client()
+        res = await client.post(
+            geetest_url,
+            params=params,
+            json=content,
+            timeout=60
+        )
         geetest_data = res.json()
         logger.debug(f"{plugin_config.preference.log_head}人机验证结果：{geetest_data}")
         validate = geetest_data['data']['validate']
@@ -297,23 +298,71 @@ def generate_fp_locally(length: int = 13):
     return ''.join(random.choices(characters, k=length))
 
 
-async def get_file(url: str, retry: bool = True):
+async def get_file(url: str, retry: bool = True, use_cache: bool = False):
     """
     下载文件
 
     :param url: 文件URL
     :param retry: 是否允许重试
+    :param use_cache: 是否使用本地文件缓存（以URL为键，适用于内容不会变化的文件，如签到奖励图标）
     :return: 文件数据，若下载失败则返回 ``None``
     """
+    cache_file = plugin_config.preference.file_cache_path / hashlib.sha256(url.encode()).hexdigest()
+    if use_cache and cache_file.is_file():
+        try:
+            content = cache_file.read_bytes()
+        except OSError:
+            logger.exception(f"{plugin_config.preference.log_head}读取文件缓存 - {cache_file} 失败")
+        else:
+            try:
+                # 刷新缓存时间，仍在使用的缓存不会被清理
+                os.utime(cache_file)
+            except OSError:
+                pass
+            return content
     try:
         async for attempt in get_async_retry(retry):
             with attempt:
-                async with httpx.AsyncClient() as client:
-                    res = await client.get(url, timeout=plugin_config.preference.timeout, follow_redirects=True)
-                return res.content
+                client = get_client()
+                res = await client.get(url, timeout=plugin_config.preference.timeout, follow_redirects=True)
+                if use_cache:
+                    # 避免缓存错误页面
+                    res.raise_for_status()
+                content = res.content
     except tenacity.RetryError:
         logger.exception(f"{plugin_config.preference.log_head}下载文件 - {url} 失败")
         return None
+    if use_cache:
+        try:
+            os.makedirs(cache_file.parent, exist_ok=True)
+            temp_file = cache_file.with_suffix(f".{uuid.uuid4().hex}.tmp")
+            temp_file.write_bytes(content)
+            os.replace(temp_file, cache_file)
+        except OSError:
+            logger.exception(f"{plugin_config.preference.log_head}写入文件缓存 - {cache_file} 失败")
+    return content
+
+
+def prune_file_cache() -> int:
+    """
+    删除本地文件缓存目录中超过保留时间（``file_cache_max_age``）未使用的文件，
+    文件缓存以URL为键，签到奖励图标、商品预览图等每月更换后旧文件不会再被使用
+
+    :return: 删除的文件数量
+    """
+    cache_path = plugin_config.preference.file_cache_path
+    if not cache_path.is_dir():
+        return 0
+    expire_time = time.time() - plugin_config.preference.file_cache_max_age * 86400
+    removed = 0
+    for file in cache_path.rglob("*"):
+        try:
+            if file.is_file() and file.stat().st_mtime < expire_time:
+                file.unlink()
+                removed += 1
+        except OSError:
+            logger.exception(f"{plugin_config.preference.log_head}清理文件缓存 - {file} 失败")
+    return removed
 
 
 def blur_phone(phone: Union[str, int]) -> str:
@@ -382,7 +431,7 @@ async def send_private_msg(
                     f"{plugin_config.preference.log_head}向用户 {user_id} 发送 QQ 聊天私信 user_id: {user_id_int}")
             else:
                 if guild_id is None:
-                    if user := PluginDataManager.plugin_data.users.get(user_id):
+                    if user := await PluginDataManager.get_user_async(user_id):
                         if not (guild_id := user.qq_guild.get(user_id)):
                             logger.error(f"{plugin_config.preference.log_head}用户 {user_id} 数据中没有任何频道ID")
                             return False, None
@@ -411,6 +460,26 @@ def get_unique_users() -> Iterable[Tuple[str, UserData]]:
                   PluginDataManager.plugin_data.users.items())
 
 
+async def iter_unique_users() -> AsyncIterator[Tuple[str, UserData]]:
+    """
+    逐个获取 不包含绑定用户数据 的所有用户数据以及对应的ID（同 ``get_unique_users``）
+
+    使用 SQLite 存储时，用户数据在需要时才逐个读取，读取不会阻塞事件循环
+
+    :return: 异步迭代器[用户ID, 用户数据]
+    """
+    users = PluginDataManager.plugin_data.users
+    if not isinstance(users, SqliteUserDict):
+        for item in get_unique_users():
+            yield item
+        return
+    for user_id in await users.user_ids_async():
+        if user_id in PluginDataManager.plugin_data.user_bind:
+            continue
+        if (user := await users.get_async(user_id)) is not None:
+            yield user_id, user
+
+
 def get_all_bind(user_id: str) -> Iterable[str]:
     """
     获取绑定该用户的所有用户ID
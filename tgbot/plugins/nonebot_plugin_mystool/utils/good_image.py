@@ -1,127 +1,265 @@
+import asyncio
+import hashlib
+import importlib
 import io
+import json
+import multiprocessing
 import os
+import sys
+import time
+import uuid
 import zipfile
-from multiprocessing import Lock
-from typing import List, Tuple
+from concurrent.futures import Executor, ProcessPoolExecutor
+from pathlib import Path
+from typing import List, Optional, Union
 
-import httpx
-from PIL import Image, ImageDraw, ImageFont
+import tenacity
 
 from ..api.common import get_good_detail
 from ..model import Good, data_path, plugin_config
+from ..utils.client import get_client
 from ..utils.common import get_file, logger, get_async_retry
 
-__all__ = ["game_list_to_image"]
+__all__ = ["game_list_to_image", "get_good_icon", "good_list_fingerprint", "get_font_path", "ImageProcessPool"]
 
 FONT_URL = os.path.join(
     plugin_config.preference.github_proxy,
     "https://github.com/adobe-fonts/source-han-sans/releases/download/2.004R/SourceHanSansHWSC.zip")
-TEMP_FONT_PATH = data_path / "temp" / "font.zip"
 FONT_SAVE_PATH = data_path / "SourceHanSansHWSC-Regular.otf"
+ICON_CACHE_PATH = plugin_config.preference.file_cache_path / "good_icon"
+"""商品预览图缩略图缓存目录"""
+IMAGE_WORKER_PATH = Path(__file__).parent.parent / "image_worker"
+"""图片合成模块 ``mystool_image_worker`` 所在目录"""
 
+# 以顶层模块名导入图片合成函数，进程池的子进程反序列化时只会导入该模块，不会导入插件和 NoneBot
+if str(IMAGE_WORKER_PATH) not in sys.path:
+    sys.path.append(str(IMAGE_WORKER_PATH))
+image_worker = importlib.import_module("mystool_image_worker")
 
-async def game_list_to_image(good_list: List[Good], lock: Lock = None, retry: bool = True):
+
+class ImageProcessPool:
+    """
+    图片生成所用的进程池
+
+    进程池在首次使用时创建并一直保留，使用 forkserver（不支持时为 spawn）方式启动子进程，
+    子进程不会复制机器人进程（事件循环、数据库连接、定时任务线程等）。
+    """
+    _executor: Optional[ProcessPoolExecutor] = None
+
+    @classmethod
+    def get_executor(cls) -> ProcessPoolExecutor:
+        """
+        获取进程池，不存在时创建
+        """
+        if cls._executor is None:
+            if "forkserver" in multiprocessing.get_all_start_methods():
+                context = multiprocessing.get_context("forkserver")
+                # 默认会在 forkserver 中预先导入主模块，改为只导入图片合成模块
+                context.set_forkserver_preload(["mystool_image_worker"])
+            else:
+                context = multiprocessing.get_context("spawn")
+            cls._executor = ProcessPoolExecutor(mp_context=context)
+        return cls._executor
+
+    @classmethod
+    def shutdown(cls):
+        """
+        关闭进程池
+        """
+        if cls._executor is not None:
+            cls._executor.shutdown(wait=False, cancel_futures=True)
+            cls._executor = None
+
+
+def _load_thumbnail(path: Path) -> Optional[bytes]:
+    """
+    读取缓存的缩略图，读取失败返回 ``None``
+
+    :param path: 缩略图文件路径
     """
-    将商品信息列表转换为图片数据，若返回`None`说明生成失败
+    if not path.is_file():
+        return None
+    try:
+        return path.read_bytes()
+    except OSError:
+        logger.exception(f"{plugin_config.preference.log_head}读取商品预览图缓存 - {path} 失败")
+        return None
+
+
+def _write_file_atomic(path: Path, data: bytes):
+    """
+    写入文件，先写入临时文件再替换，避免其他进程读到不完整的文件
+
+    :param path: 文件路径
+    :param data: 文件数据
+    """
+    temp_file = path.with_suffix(f".{uuid.uuid4().hex}.tmp")
+    temp_file.write_bytes(data)
+    os.replace(temp_file, path)
+
+
+async def get_good_icon(url: str, retry: bool = True, executor: Optional[Executor] = None) -> Optional[bytes]:
+    """
+    获取已调整为 ``ICON_SIZE`` 大小的商品预览图（PNG 数据），若获取失败则返回 ``None``
+
+    缩略图以 预览图URL + ``ICON_SIZE`` 为键缓存在本地，缓存超过 ``icon_cache_max_age`` 后
+    使用条件请求（ETag/Last-Modified）检查预览图是否更新，未更新则继续使用缓存。
+
+    :param url: 商品预览图URL
+    :param retry: 是否允许重试
+    :param executor: 调整图片大小所用的线程池/进程池，为空则使用事件循环默认的线程池
+    """
+    icon_size = plugin_config.good_list_image_config.ICON_SIZE
+    key = hashlib.sha256(f"{url}|{icon_size[0]}x{icon_size[1]}".encode()).hexdigest()
+    thumbnail_file = ICON_CACHE_PATH / f"{key}.png"
+    meta_file = ICON_CACHE_PATH / f"{key}.json"
+
+    headers = {}
+    if thumbnail_file.is_file():
+        try:
+            is_fresh = time.time() - thumbnail_file.stat().st_mtime < plugin_config.preference.icon_cache_max_age
+            meta = json.loads(meta_file.read_text()) if meta_file.is_file() else {}
+        except (OSError, ValueError):
+            is_fresh, meta = False, {}
+        if is_fresh and (thumbnail := _load_thumbnail(thumbnail_file)) is not None:
+            return thumbnail
+        if etag := meta.get("etag"):
+            headers["If-None-Match"] = etag
+        if last_modified := meta.get("last_modified"):
+            headers["If-Modified-Since"] = last_modified
+
+    try:
+        async for attempt in get_async_retry(retry):
+            with attempt:
+                client = get_client()
+                res = await client.get(url, headers=headers, timeout=plugin_config.preference.timeout,
+                                       follow_redirects=True)
+                if res.status_code != 304:
+                    res.raise_for_status()
+    except tenacity.RetryError:
+        logger.exception(f"{plugin_config.preference.log_head}下载商品预览图 - {url} 失败")
+        # 网络请求失败时使用已过期的缓存
+        return _load_thumbnail(thumbnail_file)
+
+    if res.status_code == 304 and (thumbnail := _load_thumbnail(thumbnail_file)) is not None:
+        try:
+            # 刷新缓存时间
+            os.utime(thumbnail_file)
+            os.utime(meta_file)
+        except OSError:
+            pass
+        return thumbnail
+
+    try:
+        loop = asyncio.get_running_loop()
+        thumbnail = await loop.run_in_executor(executor, image_worker.make_thumbnail, res.content, icon_size)
+    except Exception:
+        logger.exception(f"{plugin_config.preference.log_head}商品预览图 - {url} 无法解析")
+        return None
+
+    try:
+        os.makedirs(ICON_CACHE_PATH, exist_ok=True)
+        _write_file_atomic(thumbnail_file, thumbnail)
+        _write_file_atomic(meta_file, json.dumps({
+            "url": url,
+            "etag": res.headers.get("ETag"),
+            "last_modified": res.headers.get("Last-Modified")
+        }).encode())
+    except Exception:
+        logger.exception(f"{plugin_config.preference.log_head}写入商品预览图缓存 - {thumbnail_file} 失败")
+    return thumbnail
+
+
+def good_list_fingerprint(good_list: List[Good]) -> str:
+    """
+    计算商品列表图片的指纹，商品信息（ID、名称、价格、兑换时间、库存、预览图）及图片设置不变时指纹不变
+
+    :param good_list: 商品列表数据
+    """
+    data = {
+        "config": plugin_config.good_list_image_config.json(exclude={"SAVE_PATH", "MULTI_PROCESS"}),
+        "goods": [(good.goods_id, good.general_name, good.price, good.time, good.num, good.icon)
+                  for good in good_list]
+    }
+    return hashlib.sha256(json.dumps(data, ensure_ascii=False).encode()).hexdigest()
+
+
+async def get_font_path() -> Optional[Union[Path, str]]:
+    """
+    获取商品列表图片所用的字体，缺少字体时自动下载，若返回`None`说明下载失败
+    """
+    font_path = plugin_config.good_list_image_config.FONT_PATH
+    if font_path is not None and os.path.isfile(font_path):
+        return font_path
+    if os.path.isfile(FONT_SAVE_PATH):
+        return FONT_SAVE_PATH
+    logger.warning(
+        f"{plugin_config.preference.log_head}商品列表图片生成 - 缺少字体，正在从 "
+        "https://github.com/adobe-fonts/source-han-sans/tree/release "
+        f"下载字体...")
+    content = await get_file(FONT_URL)
+    if content is None:
+        logger.error(
+            f"{plugin_config.preference.log_head}商品列表图片生成 - 字体下载失败，无法继续生成图片")
+        return None
+    try:
+        with zipfile.ZipFile(io.BytesIO(content)) as z:
+            with z.open("OTF/SimplifiedChineseHW/SourceHanSansHWSC-Regular.otf") as zip_font:
+                _write_file_atomic(FONT_SAVE_PATH, zip_font.read())
+    except Exception:
+        logger.exception(f"{plugin_config.preference.log_head}商品列表图片生成 - 无法解压下载的字体")
+        return None
+    logger.info(
+        f"{plugin_config.preference.log_head}商品列表图片生成 - 已完成字体下载 -> {FONT_SAVE_PATH}")
+    return FONT_SAVE_PATH
+
+
+async def game_list_to_image(
+        good_list: List[Good],
+        executor: Optional[Executor] = None,
+        retry: bool = True
+) -> Optional[List[bytes]]:
+    """
+    将商品信息列表转换为图片数据（每 ``PAGE_SIZE`` 个商品一张图片），若返回`None`说明生成失败
+
+    网络请求（商品详情、预览图）都在当前事件循环中进行，只有图片合成与编码交给 ``executor`` 运行。
 
     :param good_list: 商品列表数据
-    :param lock: 进程同步锁，防止多进程同时在下载字体
+    :param executor: 合成图片所用的线程池/进程池，为空则使用事件循环默认的线程池
     :param retry: 是否允许重试
     """
-    # TODO: 暂时会阻塞，目前还找不到更好的解决方案
-    #   回调函数是否适用于 NoneBot Matcher 暂不清楚，
-    #   若适用则可以传入回调函数而不阻塞主进程
     try:
-        if lock is not None:
-            lock.acquire()
+        font_path = await get_font_path()
+        if font_path is None:
+            return None
 
-        font_path = plugin_config.good_list_image_config.FONT_PATH
-        if font_path is None or not os.path.isfile(font_path):
-            if os.path.isfile(FONT_SAVE_PATH):
-                font_path = FONT_SAVE_PATH
-            else:
-                logger.warning(
-                    f"{plugin_config.preference.log_head}商品列表图片生成 - 缺少字体，正在从 "
-                    "https://github.com/adobe-fonts/source-han-sans/tree/release "
-                    f"下载字体...")
-                try:
-                    os.makedirs(os.path.dirname(TEMP_FONT_PATH))
-                except FileExistsError:
-                    pass
-                with open(TEMP_FONT_PATH, "wb") as f:
-                    content = await get_file(FONT_URL)
-                    if content is None:
-                        logger.error(
-                            f"{plugin_config.preference.log_head}商品列表图片生成 - 字体下载失败，无法继续生成图片")
-                        return None
-                    f.write(content)
-                with open(TEMP_FONT_PATH, "rb") as f:
-                    with zipfile.ZipFile(f) as z:
-                        with z.open("OTF/SimplifiedChineseHW/SourceHanSansHWSC-Regular.otf") as zip_font:
-                            with open(FONT_SAVE_PATH, "wb") as fp_font:
-                                fp_font.write(zip_font.read())
-                logger.info(
-                    f"{plugin_config.preference.log_head}商品列表图片生成 - 已完成字体下载 -> {FONT_SAVE_PATH}")
-                try:
-                    os.remove(TEMP_FONT_PATH)
-                except Exception:
-                    logger.exception(
-                        f"{plugin_config.preference.log_head}商品列表图片生成 - 无法清理下载的字体压缩包临时文件")
-                font_path = FONT_SAVE_PATH
-
-        if lock is not None:
-            lock.release()
-
-        font = ImageFont.truetype(
-            str(font_path), plugin_config.good_list_image_config.FONT_SIZE, encoding=plugin_config.preference.encoding)
-
-        size_y = 0
-        '''起始粘贴位置 高'''
-        position: List[Tuple[int, int]] = []
-        '''预览图粘贴的位置'''
-        imgs: List[Image.Image] = []
-        '''商品预览图'''
-
-        for good in good_list:
-            await get_good_detail(good)
-            async for attempt in get_async_retry(retry):
-                with attempt:
-                    async with httpx.AsyncClient() as client:
-                        icon = await client.get(good.icon, timeout=plugin_config.preference.timeout)
-            img = Image.open(io.BytesIO(icon.content))
-            # 调整预览图大小
-            img = img.resize(plugin_config.good_list_image_config.ICON_SIZE)
-            # 记录预览图粘贴位置
-            position.append((0, size_y))
-            # 调整下一个粘贴的位置
-            size_y += plugin_config.good_list_image_config.ICON_SIZE[1] + \
-                      plugin_config.good_list_image_config.PADDING_ICON
-            imgs.append(img)
-
-        preview = Image.new(
-            'RGB', (plugin_config.good_list_image_config.WIDTH, size_y), (255, 255, 255))
-
-        i = 0
-        for img in imgs:
-            preview.paste(img, position[i])
-            i += 1
-
-        draw_y = plugin_config.good_list_image_config.PADDING_TEXT_AND_ICON_Y
-        '''写入文字的起始位置 高'''
-        for good in good_list:
-            draw = ImageDraw.Draw(preview)
-            # 根据预览图高度来确定写入文字的位置，并调整空间
-            draw.text((plugin_config.good_list_image_config.ICON_SIZE[
-                           0] + plugin_config.good_list_image_config.PADDING_TEXT_AND_ICON_X,
-                       draw_y),
-                      f"{good.general_name}\n商品ID: {good.goods_id}\n兑换时间: {good.time_text}\n价格: {good.price} 米游币",
-                      (0, 0, 0), font)
-            draw_y += (plugin_config.good_list_image_config.ICON_SIZE[1] +
-                       plugin_config.good_list_image_config.PADDING_ICON)
-
-        # 导出
-        image_bytes = io.BytesIO()
-        preview.save(image_bytes, format="JPEG")
-        return image_bytes.getvalue()
+        loop = asyncio.get_running_loop()
+        # 以普通数据传给图片合成函数，子进程中无需导入插件的数据模型
+        config = plugin_config.good_list_image_config.dict()
+        semaphore = asyncio.Semaphore(max(1, plugin_config.preference.good_image_concurrency))
+
+        async def get_icon(_good: Good):
+            async with semaphore:
+                await get_good_detail(_good)
+                return await get_good_icon(_good.icon, retry, executor)
+
+        # 逐页获取预览图并生成图片，内存占用只与每页的商品数量有关
+        page_size = config["PAGE_SIZE"] or len(good_list)
+        pages: List[bytes] = []
+        for page_start in range(0, len(good_list), page_size):
+            page_goods = good_list[page_start:page_start + page_size]
+            # 并发获取商品详情和预览图
+            icons = await asyncio.gather(*map(get_icon, page_goods))
+            for good, icon in zip(page_goods, icons):
+                if icon is None:
+                    logger.warning(f"{plugin_config.preference.log_head}商品列表图片生成 - "
+                                   f"商品 {good.goods_id} 的预览图获取失败，使用空白图片代替")
+            texts = [
+                f"{good.general_name}\n商品ID: {good.goods_id}\n兑换时间: {good.time_text}\n价格: {good.price} 米游币"
+                for good in page_goods
+            ]
+            pages.append(await loop.run_in_executor(executor, image_worker.render_good_list_page, texts, icons,
+                                                    str(font_path), plugin_config.preference.encoding, config))
+        return pages
     except Exception:
         logger.exception(f"{plugin_config.preference.log_head}商品列表图片生成 - 无法完成图片生成")
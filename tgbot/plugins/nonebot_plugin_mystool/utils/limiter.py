@@ -0,0 +1,61 @@
+import asyncio
+from contextlib import asynccontextmanager
+from typing import Dict, Optional, AsyncIterator
+
+from ..model import plugin_config, UserAccount
+
+__all__ = ["AccountLimiter"]
+
+
+class AccountLimiter:
+    """
+    账户任务并发限制器
+
+    - 每日自动任务中，同时执行任务的账户数不超过 ``Preference.max_concurrent_accounts``
+    - 同一个米游社账户同一时间只会执行一个任务（如自动任务与手动签到不会同时进行）
+    """
+    _semaphore: Optional[asyncio.Semaphore] = None
+    """全局账户并发信号量"""
+    _semaphore_loop: Optional[asyncio.AbstractEventLoop] = None
+    """全局账户并发信号量所属的事件循环"""
+    _account_locks: Dict[str, asyncio.Lock] = {}
+    """米游社UID与对应的账户锁（只保留正在使用的锁）"""
+    _lock_users: Dict[str, int] = {}
+    """米游社UID与正在使用或等待账户锁的任务数量"""
+
+    @classmethod
+    def _get_semaphore(cls) -> asyncio.Semaphore:
+        """
+        获取当前事件循环下的全局账户并发信号量
+        """
+        loop = asyncio.get_running_loop()
+        if cls._semaphore is None or cls._semaphore_loop is not loop:
+            cls._semaphore = asyncio.Semaphore(max(1, plugin_config.preference.max_concurrent_accounts))
+            cls._semaphore_loop = loop
+        return cls._semaphore
+
+    @classmethod
+    @asynccontextmanager
+    async def account(cls, account: UserAccount, concurrent: bool = True) -> AsyncIterator[None]:
+        """
+        在执行某个账户的任务时占用该账户
+
+        :param account: 米游社账户
+        :param concurrent: 是否计入全局账户并发数（手动执行的命令不计入）
+        """
+        bbs_uid = account.bbs_uid
+        lock = cls._account_locks.setdefault(bbs_uid, asyncio.Lock())
+        cls._lock_users[bbs_uid] = cls._lock_users.get(bbs_uid, 0) + 1
+        try:
+            async with lock:
+                if not concurrent:
+                    yield
+                    return
+                async with cls._get_semaphore():
+                    yield
+        finally:
+            cls._lock_users[bbs_uid] -= 1
+            if not cls._lock_users[bbs_uid]:
+                # 没有其他任务在使用该锁，释放以免随账户数量无限增长
+                del cls._lock_users[bbs_uid]
+                del cls._account_locks[bbs_uid]
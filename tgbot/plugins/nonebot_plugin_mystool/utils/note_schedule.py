@@ -0,0 +1,159 @@
+import heapq
+import time
+from datetime import datetime, timedelta
+from typing import Dict, List, Literal, Optional, Set, Tuple
+
+from ..model import NOTICE_TIME, plugin_config, UserAccount, GenshinNote, StarRailNote
+
+__all__ = ["NotePollScheduler", "NotePollKey", "GENSHIN_RESIN_RECOVERY_SECONDS", "STARRAIL_STAMINA_RECOVERY_SECONDS",
+           "predict_genshin_note_delay", "predict_starrail_note_delay"]
+
+GENSHIN_RESIN_RECOVERY_SECONDS = 8 * 60
+"""原神每恢复 1 点树脂所需时间（单位：秒）"""
+GENSHIN_MAX_RESIN = 200
+"""原神树脂上限"""
+STARRAIL_STAMINA_RECOVERY_SECONDS = 6 * 60
+"""崩铁每恢复 1 点开拓力所需时间（单位：秒）"""
+
+NoteGame = Literal["genshin", "starrail"]
+NotePollKey = Tuple[str, NoteGame]
+"""便笺检查任务的键 (米游社UID, 游戏)"""
+
+
+class NotePollScheduler:
+    """
+    自适应便笺检查调度器
+
+    按预测的体力到达提醒阈值（或回满）的时间安排每个账户下一次检查便笺的时间，
+    定时任务每次运行时只检查已到期的账户。尚未安排过的账户视为立即到期。
+    """
+    _heap: List[Tuple[float, NotePollKey]] = []
+    """按到期时间排序的小根堆 [(到期时间戳, 键)]，其中可能包含已过时的条目"""
+    _due_time: Dict[NotePollKey, float] = {}
+    """各键当前有效的到期时间戳"""
+
+    @classmethod
+    def schedule(cls, key: NotePollKey, delay: float):
+        """
+        安排下一次检查
+
+        :param key: 检查任务的键
+        :param delay: 距离下一次检查的时间（单位：秒）
+        """
+        due_time = time.time() + delay
+        cls._due_time[key] = due_time
+        heapq.heappush(cls._heap, (due_time, key))
+
+    @classmethod
+    def remove(cls, bbs_uid: str):
+        """
+        移除某个账户的检查安排，该账户将在下一次定时任务中被立即检查（如修改了提醒阈值时）
+
+        :param bbs_uid: 米游社UID
+        """
+        for game in "genshin", "starrail":
+            cls._due_time.pop((bbs_uid, game), None)
+
+    @classmethod
+    def pop_due(cls, now: Optional[float] = None) -> Set[NotePollKey]:
+        """
+        取出所有已到期的检查任务
+
+        :param now: 当前时间戳，为空则使用当前时间
+        """
+        now = time.time() if now is None else now
+        due: Set[NotePollKey] = set()
+        while cls._heap and cls._heap[0][0] <= now:
+            due_time, key = heapq.heappop(cls._heap)
+            # 跳过已被重新安排或移除的过时条目
+            if cls._due_time.get(key) == due_time:
+                del cls._due_time[key]
+                due.add(key)
+        return due
+
+    @classmethod
+    def is_scheduled(cls, key: NotePollKey) -> bool:
+        """
+        检查任务是否已安排（未安排的任务应立即检查）
+
+        :param key: 检查任务的键
+        """
+        return key in cls._due_time
+
+
+def _clamp_delay(event_delays: List[float]) -> float:
+    """
+    根据预测的各提醒事件发生时间计算下一次检查的间隔
+
+    :param event_delays: 各提醒事件距今的时间（单位：秒）
+    """
+    preference = plugin_config.preference
+    delay = preference.note_max_interval * 60
+    if event_delays:
+        delay = min(delay, min(event_delays) - preference.note_poll_lead * 60)
+
+    # 保证在每日便笺提醒时间段（见 Preference.notice_time）内至少检查一次
+    now = datetime.now()
+    notice_hour, notice_minute = int(NOTICE_TIME[:2]), int(NOTICE_TIME[3:])
+    window_start = now.replace(hour=notice_hour, minute=notice_minute, second=0, microsecond=0) \
+        - timedelta(minutes=preference.resin_interval)
+    if window_start <= now:
+        window_start += timedelta(days=1)
+    delay = min(delay, (window_start - now).total_seconds())
+
+    return max(delay, preference.note_check_tick * 60)
+
+
+def predict_genshin_note_delay(account: UserAccount, note: GenshinNote) -> float:
+    """
+    预测距离下一次需要检查原神便笺的时间（单位：秒）
+
+    :param account: 米游社账户
+    :param note: 原神实时便笺
+    """
+    event_delays = []
+    if note.current_resin is not None and note.resin_recovery_time is not None:
+        if note.current_resin < account.user_resin_threshold:
+            # resin_recovery_time 为回满所需时间，减去阈值到上限之间的恢复时间即为达到阈值所需时间
+            event_delays.append(
+                note.resin_recovery_time
+                - (GENSHIN_MAX_RESIN - account.user_resin_threshold) * GENSHIN_RESIN_RECOVERY_SECONDS
+            )
+        if note.current_resin < GENSHIN_MAX_RESIN:
+            event_delays.append(note.resin_recovery_time)
+    if note.home_coin_recovery_time and note.current_home_coin != note.max_home_coin:
+        event_delays.append(note.home_coin_recovery_time)
+    try:
+        if note.transformer and note.transformer["obtained"] and not note.transformer["recovery_time"]["reached"]:
+            recovery_time = note.transformer["recovery_time"]
+            event_delays.append(
+                timedelta(
+                    days=recovery_time["Day"],
+                    hours=recovery_time["Hour"],
+                    minutes=recovery_time["Minute"],
+                    seconds=recovery_time.get("Second", 0)
+                ).total_seconds()
+            )
+    except (KeyError, TypeError):
+        pass
+    return _clamp_delay(event_delays)
+
+
+def predict_starrail_note_delay(account: UserAccount, note: StarRailNote) -> float:
+    """
+    预测距离下一次需要检查崩铁便笺的时间（单位：秒）
+
+    :param account: 米游社账户
+    :param note: 崩铁实时便笺
+    """
+    event_delays = []
+    if None not in (note.current_stamina, note.max_stamina, note.stamina_recover_time):
+        if note.current_stamina < account.user_stamina_threshold:
+            # stamina_recover_time 为回满所需时间，减去阈值到上限之间的恢复时间即为达到阈值所需时间
+            event_delays.append(
+                note.stamina_recover_time
+                - (note.max_stamina - account.user_stamina_threshold) * STARRAIL_STAMINA_RECOVERY_SECONDS
+            )
+        if note.current_stamina < note.max_stamina:
+            event_delays.append(note.stamina_recover_time)
+    return _clamp_delay(event_delays)
@@ -0,0 +1,360 @@
+import asyncio
+import itertools
+import time
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from datetime import datetime, timedelta
+from enum import IntEnum
+from typing import AsyncIterator, Dict, List, NamedTuple, Optional, Tuple, Union
+
+import nonebot
+from nonebot import Adapter, Bot
+from nonebot_plugin_saa import MessageSegmentFactory, AggregatedMessageFactory, MessageFactory, Text
+
+from .common import logger, send_private_msg
+from ..model import plugin_config
+
+__all__ = ["MessagePriority", "TokenBucket", "NotificationDigest", "NotificationOutbox"]
+
+QQ_QUOTA_EXCEEDED_CODE = 304049
+"""QQ 频道主动消息次数已达上限的错误码"""
+
+
+class MessagePriority(IntEnum):
+    """
+    通知消息优先级，数值越小越优先发送
+    """
+    HIGH = 0
+    """重要通知（如兑换结果）"""
+    NORMAL = 1
+    """一般通知（如签到、任务结果）"""
+    LOW = 2
+    """可丢弃的通知（如便笺提醒），达到平台消息配额时不再发送"""
+
+
+class TokenBucket:
+    """
+    令牌桶限速器
+    """
+
+    def __init__(self, rate: float, capacity: float):
+        """
+        :param rate: 每秒生成的令牌数
+        :param capacity: 令牌桶容量（允许的突发数量）
+        """
+        self.rate = max(rate, 1e-6)
+        self.capacity = max(capacity, 1)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def try_acquire(self) -> float:
+        """
+        尝试获取一个令牌，不等待
+
+        :return: 获取成功时为 0，否则为距离下一个令牌生成的秒数
+        """
+        self._refill()
+        if self._tokens >= 1:
+            self._tokens -= 1
+            return 0
+        return (1 - self._tokens) / self.rate
+
+    async def acquire(self):
+        """
+        获取一个令牌，令牌不足时等待
+        """
+        while delay := self.try_acquire():
+            await asyncio.sleep(delay)
+
+
+class _OutboxItem(NamedTuple):
+    user_id: str
+    message: Union[str, MessageSegmentFactory, AggregatedMessageFactory]
+    use: Union[Bot, Adapter, None]
+    guild_id: Optional[int]
+    priority: MessagePriority
+    attempt: int
+
+
+class NotificationDigest:
+    """
+    通知汇总
+
+    在 ``NotificationOutbox.digest()`` 范围内放入发件箱的消息会先按接收用户汇总，
+    结束时每个用户只发送一条合并后的消息。
+    """
+
+    def __init__(self):
+        self.items: Dict[Tuple[str, Union[Bot, Adapter, None], Optional[int]], List[_OutboxItem]] = {}
+        """按 (用户ID, Bot或Adapter, 频道ID) 分组的消息"""
+
+    def add(self, item: _OutboxItem):
+        self.items.setdefault((item.user_id, item.use, item.guild_id), []).append(item)
+
+    @staticmethod
+    def merge(items: List[_OutboxItem]) -> List[_OutboxItem]:
+        """
+        将同一接收用户的多条消息合并，合并后的消息使用其中最高的优先级
+
+        :param items: 同一接收用户的消息
+        :return: 合并后需要发送的消息（合并转发消息等无法与其他消息合并的将单独发送）
+        """
+        mergeable, separate = [], []
+        for item in items:
+            if isinstance(item.message, (str, MessageSegmentFactory, MessageFactory)):
+                mergeable.append(item)
+            else:
+                separate.append(item)
+        if len(mergeable) <= 1:
+            return mergeable + separate
+
+        segments: List[MessageSegmentFactory] = []
+        for index, item in enumerate(mergeable):
+            if index:
+                segments.append(Text("\n\n"))
+            if isinstance(item.message, str):
+                segments.append(Text(item.message))
+            elif isinstance(item.message, MessageFactory):
+                segments.extend(item.message)
+            else:
+                segments.append(item.message)
+        merged = mergeable[0]._replace(
+            message=MessageFactory(segments),
+            priority=min(item.priority for item in mergeable)
+        )
+        return [merged] + separate
+
+
+_current_digest: ContextVar[Optional[NotificationDigest]] = ContextVar("_current_digest", default=None)
+"""当前上下文中的通知汇总"""
+
+
+class NotificationOutbox:
+    """
+    异步通知发件箱
+
+    业务代码通过 ``put`` 将消息放入队列后立即返回，由后台的多个发送协程按优先级取出并发送。
+    发送受每个适配器、每个接收用户的令牌桶限速，接收用户的令牌不足时消息会延后重新入队，不占用发送协程；
+    发送失败时按指数退避重试（没有可用的 Bot、缺少频道ID等无法通过重试解决的失败不会重试）；
+    QQ 频道返回消息配额用尽后，当天不再发送该适配器的低优先级消息，其他消息保留到配额恢复后再发送。
+    """
+    _queue: Optional[asyncio.PriorityQueue] = None
+    """待发送的消息队列 [(优先级, 序号, 消息)]"""
+    _loop: Optional[asyncio.AbstractEventLoop] = None
+    """发送协程所属的事件循环"""
+    _workers: List[asyncio.Task] = []
+    """发送协程"""
+    _counter = itertools.count()
+    """消息序号，保证同一优先级的消息按放入顺序发送"""
+    _adapter_buckets: Dict[str, TokenBucket] = {}
+    """适配器名称与对应的令牌桶"""
+    _recipient_buckets: Dict[str, TokenBucket] = {}
+    """用户ID与对应的令牌桶"""
+    _quota_exhausted_until: Dict[str, datetime] = {}
+    """消息配额已用尽的适配器及配额恢复时间"""
+    _deferred: Dict[asyncio.TimerHandle, _OutboxItem] = {}
+    """延后重新入队的消息"""
+
+    @classmethod
+    def _ensure_workers(cls):
+        """
+        在当前事件循环中启动发送协程
+        """
+        loop = asyncio.get_running_loop()
+        if cls._queue is not None and cls._loop is loop:
+            return
+        cls._loop = loop
+        cls._queue = asyncio.PriorityQueue()
+        cls._workers = [
+            loop.create_task(cls._worker())
+            for _ in range(max(1, plugin_config.preference.outbox_workers))
+        ]
+
+    @classmethod
+    def put(
+            cls,
+            user_id: str,
+            message: Union[str, MessageSegmentFactory, AggregatedMessageFactory],
+            use: Union[Bot, Adapter] = None,
+            guild_id: int = None,
+            priority: MessagePriority = MessagePriority.NORMAL
+    ):
+        """
+        将私信消息放入发件箱，不等待发送完成（参数同 ``send_private_msg``）
+
+        :param user_id: 目标用户ID
+        :param message: 消息内容
+        :param use: 使用的Bot或Adapter，为None则使用所有Bot
+        :param guild_id: 用户所在频道ID，为None则从用户数据中获取
+        :param priority: 消息优先级
+        """
+        item = _OutboxItem(user_id, message, use, guild_id, priority, 0)
+        if (digest := _current_digest.get()) is not None:
+            digest.add(item)
+            return
+        cls._ensure_workers()
+        cls._put_item(item)
+
+    @classmethod
+    @asynccontextmanager
+    async def digest(cls) -> AsyncIterator[NotificationDigest]:
+        """
+        在该范围内（包括其中创建的子任务）放入发件箱的消息，会在结束时按接收用户合并后再发送
+        """
+        digest = NotificationDigest()
+        token = _current_digest.set(digest)
+        try:
+            yield digest
+        finally:
+            _current_digest.reset(token)
+            if digest.items:
+                cls._ensure_workers()
+                for items in digest.items.values():
+                    for item in NotificationDigest.merge(items):
+                        cls._put_item(item)
+
+    @classmethod
+    def _put_item(cls, item: _OutboxItem):
+        if cls._queue is None:
+            # 发件箱已关闭
+            return
+        cls._queue.put_nowait((item.priority, next(cls._counter), item))
+
+    @classmethod
+    def _put_later(cls, delay: float, item: _OutboxItem):
+        """
+        在 ``delay`` 秒后将消息重新放入队列
+
+        :param delay: 延后时间（单位：秒）
+        :param item: 消息
+        """
+        def put():
+            cls._deferred.pop(handle, None)
+            cls._put_item(item)
+
+        handle = cls._loop.call_later(delay, put)
+        cls._deferred[handle] = item
+
+    @staticmethod
+    def _get_adapter_name(use: Union[Bot, Adapter, None]) -> str:
+        """
+        获取消息将使用的适配器名称
+        """
+        if isinstance(use, Bot):
+            return use.adapter.get_name()
+        elif isinstance(use, Adapter):
+            return use.get_name()
+        # 与 send_private_msg 一致，未指定时使用第一个 Bot
+        bot = next(iter(nonebot.get_bots().values()), None)
+        return bot.adapter.get_name() if bot else ""
+
+    @classmethod
+    def _quota_reset_delay(cls, adapter_name: str) -> float:
+        """
+        距离适配器消息配额恢复的秒数，配额未用尽时为 0
+        """
+        until = cls._quota_exhausted_until.get(adapter_name)
+        if until is None:
+            return 0
+        if (delay := (until - datetime.now()).total_seconds()) <= 0:
+            del cls._quota_exhausted_until[adapter_name]
+            return 0
+        return delay
+
+    @classmethod
+    async def _worker(cls):
+        queue = cls._queue
+        while True:
+            _, _, item = await queue.get()
+            try:
+                await cls._deliver(item)
+            except Exception:
+                logger.exception(f"{plugin_config.preference.log_head}发件箱 - 向用户 {item.user_id} 发送消息失败")
+            finally:
+                queue.task_done()
+
+    @classmethod
+    async def _deliver(cls, item: _OutboxItem):
+        """
+        发送一条消息，失败时安排重试
+        """
+        preference = plugin_config.preference
+        adapter_name = cls._get_adapter_name(item.use)
+        if quota_reset_delay := cls._quota_reset_delay(adapter_name):
+            if item.priority >= MessagePriority.LOW:
+                logger.info(f"{preference.log_head}发件箱 - 适配器 {adapter_name} 消息配额已用尽，"
+                            f"丢弃发送给用户 {item.user_id} 的低优先级消息")
+            else:
+                cls._put_later(quota_reset_delay, item)
+            return
+
+        # 先获取接收用户的令牌，不足时延后重新入队，避免一个用户积压的消息占住发送协程和适配器令牌
+        if delay := cls._recipient_buckets.setdefault(
+                item.user_id,
+                TokenBucket(preference.outbox_recipient_rate, preference.outbox_recipient_burst)
+        ).try_acquire():
+            cls._put_later(delay, item)
+            return
+        await cls._adapter_buckets.setdefault(
+            adapter_name,
+            TokenBucket(preference.outbox_adapter_rate, preference.outbox_adapter_burst)
+        ).acquire()
+
+        # 没有可用的 Bot 时 send_private_msg 不返回结果
+        success, exception = await send_private_msg(
+            user_id=item.user_id, message=item.message, use=item.use, guild_id=item.guild_id) or (False, None)
+        if success:
+            return
+        if exception is None:
+            # 没有可用的 Bot 或缺少频道ID，重试也无法发送
+            logger.error(f"{preference.log_head}发件箱 - 无法向用户 {item.user_id} 发送消息，不再重试")
+            return
+
+        if getattr(exception, "code", None) == QQ_QUOTA_EXCEEDED_CODE \
+                or str(QQ_QUOTA_EXCEEDED_CODE) in str(exception):
+            # 配额在第二天恢复
+            tomorrow = datetime.now().date() + timedelta(days=1)
+            cls._quota_exhausted_until[adapter_name] = datetime.combine(tomorrow, datetime.min.time())
+            logger.warning(f"{preference.log_head}发件箱 - 适配器 {adapter_name} 消息配额已用尽，"
+                           "今日将不再发送低优先级消息，其他消息将在配额恢复后发送")
+            if item.priority < MessagePriority.LOW:
+                # 保留到配额恢复后发送，不消耗重试次数
+                cls._put_later(cls._quota_reset_delay(adapter_name), item)
+            return
+
+        if item.attempt >= preference.outbox_max_retries:
+            logger.opt(exception=exception).error(
+                f"{preference.log_head}发件箱 - 向用户 {item.user_id} 发送消息失败，已达到最大重试次数")
+            return
+        delay = preference.outbox_retry_delay * 2 ** item.attempt
+        logger.info(f"{preference.log_head}发件箱 - 向用户 {item.user_id} 发送消息失败，将在 {delay} 秒后重试")
+        cls._put_later(delay, item._replace(attempt=item.attempt + 1))
+
+    @classmethod
+    async def close(cls, timeout: float = 5):
+        """
+        等待队列中的消息发送完毕（最多等待 ``timeout`` 秒）并停止发送协程
+
+        :param timeout: 最长等待时间（单位：秒）
+        """
+        if cls._queue is None:
+            return
+        try:
+            await asyncio.wait_for(cls._queue.join(), timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"{plugin_config.preference.log_head}发件箱 - 仍有 {cls._queue.qsize()} 条消息未发送")
+        if cls._deferred:
+            logger.warning(f"{plugin_config.preference.log_head}发件箱 - 有 {len(cls._deferred)} 条等待重试或延后发送的消息未发送")
+            for handle in cls._deferred:
+                handle.cancel()
+            cls._deferred = {}
+        for worker in cls._workers:
+            worker.cancel()
+        cls._workers = []
+        cls._queue = None
+        cls._loop = None